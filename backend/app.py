@@ -1,13 +1,17 @@
+import logging
 from flask import Flask, jsonify
 from config import Config
 from extensions import socketio, cors
 
+logger = logging.getLogger(__name__)
+
 def create_app(config_class=Config):
     app = Flask(__name__, static_folder='../frontend', static_url_path='')
     app.config.from_object(config_class)
 
     # Initialize extensions
-    cors.init_app(app, resources={r"/api/*": {"origins": app.config.get('FRONTEND_URL', '*')}})
+    # ETag exposed so a cross-origin frontend can send If-None-Match on its polls
+    cors.init_app(app, resources={r"/api/*": {"origins": app.config.get('FRONTEND_URL', '*'), "expose_headers": ["ETag", "Last-Modified"]}})
     socketio.init_app(app, cors_allowed_origins="*")
 
     # Register Blueprints
@@ -33,6 +37,43 @@ def create_app(config_class=Config):
     from routes.participant import bp as participant_bp
     app.register_blueprint(participant_bp, url_prefix='/api/participant')
 
+    # Socket.IO leaderboard rooms (leaderboard:<contest>:<level>) and their delta push
+    import utils.leaderboard_push
+
+    # Socket.IO participant rooms (user:<id>, contest:<id>) and their state diffs
+    import utils.participant_push
+
+    # Replay submissions journaled but not yet inserted by a previous run
+    from utils.submission_journal import submission_journal
+    submission_journal.start()
+
+    # Append-only leaderboard history for replays (keyframes + deltas)
+    from utils.history import history_recorder
+    history_recorder.start()
+
+    # Periodic check of the incremental score counters against `submissions`
+    from utils.reconciler import score_reconciler
+    score_reconciler.start()
+
+    # Build the in-memory leaderboards of the current contest up front
+    from utils.cache import get_current_contest_id, get_rounds
+    from utils.leaderboard import leaderboard_engine
+    try:
+        contest_id = get_current_contest_id()
+        leaderboard_engine.warm(contest_id, [r['round_number'] for r in get_rounds(contest_id)])
+    except Exception as e:
+        logger.warning(f"Leaderboard warm-up skipped: {e}")
+
+    @app.after_request
+    def flag_degraded_response(response):
+        # Set by db_connection when a read was answered from the stale-result cache
+        from flask import g
+        age = g.get('db_degraded')
+        if age is not None:
+            response.headers['X-DB-Degraded'] = 'stale'
+            response.headers['X-DB-Stale-Age'] = str(int(age))
+        return response
+
     # Serve Static Files
     @app.route('/')
     def serve_index():
@@ -94,7 +135,35 @@ def create_app(config_class=Config):
 
     @app.route('/api/health')
     def health_check():
-        return jsonify({"status": "healthy"}), 200
+        from db_connection import db_manager
+        from utils.cache import metadata_cache, user_id_cache
+        from utils.counters import level_counters
+        from utils.submission_journal import submission_journal
+        from utils.leaderboard import leaderboard_engine
+        from utils.versions import versions
+        from utils.leaderboard_push import leaderboard_push
+        from utils.participant_push import participant_push
+        from utils.reconciler import score_reconciler
+        from utils.response_cache import response_cache
+        from utils.history import history_recorder
+        breaker = db_manager.breaker_status()
+        return jsonify({
+            # degraded: primary unreachable, serving cached reads and deferring writes
+            "status": "degraded" if breaker['breaker']['state'] in ('open', 'half_open') else "healthy",
+            "db_pool": db_manager.pool_stats(),
+            "db_breaker": breaker,
+            "cache": metadata_cache.stats(),
+            "user_id_cache": user_id_cache.stats(),
+            "counters": level_counters.snapshot_stats(),
+            "submission_journal": submission_journal.snapshot_stats(),
+            "leaderboard": leaderboard_engine.snapshot_stats(),
+            "etags": versions.snapshot_stats(),
+            "leaderboard_push": leaderboard_push.snapshot_stats(),
+            "participant_push": participant_push.snapshot_stats(),
+            "score_reconciler": score_reconciler.snapshot_stats(),
+            "response_cache": response_cache.snapshot_stats(),
+            "history": history_recorder.snapshot_stats()
+        }), 200
 
     return app
 
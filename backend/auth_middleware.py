@@ -1,8 +1,29 @@
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g, has_request_context
 import jwt
 from config import Config
 
+def get_token_claims():
+    """
+    Decoded claims of the request's Bearer token, or None when the request has no
+    valid token. Never rejects the request, decoded once per request.
+    """
+    if not has_request_context():
+        return None
+    if 'token_claims' in g:
+        return g.token_claims
+
+    claims = None
+    auth_header = request.headers.get('Authorization', '')
+    parts = auth_header.split(" ")
+    if len(parts) == 2 and parts[1]:
+        try:
+            claims = jwt.decode(parts[1], Config.SECRET_KEY, algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            claims = None
+    g.token_claims = claims
+    return claims
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -6,7 +6,15 @@ print("-" * 50)
 print("DATABASE CONNECTION STATUS CHECK")
 print("-" * 50)
 
-if USE_SQLITE:
+if getattr(db_manager, 'in_memory', False):
+    print("Application is using in-memory SQLite (DB_MODE=memory).")
+    print(f"Snapshot: {db_manager.snapshot_path}")
+    print(f"Journal: {db_manager.journal_path} (seq {db_manager.seq})")
+    conn = db_manager.get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    print(f"User Count in memory: {count}")
+    conn.close()
+elif USE_SQLITE:
     print("WARNING: Application is using SQLite (Fallback mode).")
     print(f"Database File: {os.path.abspath('debug_marathon.db')}")
 else:
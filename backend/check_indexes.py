@@ -0,0 +1,83 @@
+
+# check_indexes.py
+# EXPLAIN-based check that the hot queries actually use the indexes added by
+# migration 003 (see migrate.py). Exits with status 1 if any query misses its index.
+#
+# Run it against a populated database (e.g. after populate_activity.py), the
+# optimizer may prefer a table scan on near-empty tables.
+
+import sys
+from db_connection import db_manager
+from migrate import run_migrations
+
+# (label, query, params, acceptable index names)
+HOT_QUERIES = [
+    (
+        "duplicate submission check",
+        "SELECT is_correct FROM submissions WHERE user_id=%s AND question_id=%s AND is_correct=1",
+        (1, 1),
+        ('idx_sub_user_question',)
+    ),
+    (
+        "contest solved count",
+        "SELECT COUNT(*) as count FROM submissions WHERE contest_id=%s AND is_correct=1",
+        (1,),
+        ('idx_sub_contest_correct',)
+    ),
+    (
+        "contest violation count",
+        "SELECT COUNT(*) as count FROM violations WHERE contest_id=%s",
+        (1,),
+        # MySQL may keep the implicit FK index instead, both lead with contest_id
+        ('idx_v_contest', 'fk_v_contest')
+    ),
+    (
+        "level leaderboard",
+        "SELECT user_id, level_score FROM participant_level_stats WHERE contest_id=%s AND level=%s ORDER BY level_score DESC",
+        (1, 1),
+        ('idx_pls_contest_level_score',)
+    ),
+    (
+        "active round lookup",
+        "SELECT round_number FROM rounds WHERE contest_id=%s AND status='active' ORDER BY round_number ASC LIMIT 1",
+        (1,),
+        ('idx_rounds_contest_status',)
+    ),
+]
+
+def used_indexes(query, params):
+    """Return (index names used, raw plan rows) for a query on the active backend."""
+    if db_manager.dialect == 'sqlite':
+        plan = db_manager.execute_query(f"EXPLAIN QUERY PLAN {query}", params) or []
+        names = set()
+        for row in plan:
+            detail = row.get('detail', '')
+            for marker in ('USING COVERING INDEX ', 'USING INDEX '):
+                if marker in detail:
+                    names.add(detail.split(marker, 1)[1].split(' ')[0])
+        return names, plan
+
+    plan = db_manager.execute_query(f"EXPLAIN {query}", params) or []
+    return {row['key'] for row in plan if row.get('key')}, plan
+
+def check_indexes():
+    failures = 0
+    for label, query, params, expected in HOT_QUERIES:
+        names, plan = used_indexes(query, params)
+        if names & set(expected):
+            print(f"PASS  {label}: {', '.join(sorted(names))}")
+        else:
+            failures += 1
+            print(f"FAIL  {label}: expected {' or '.join(expected)}, plan used {sorted(names) or 'no index'}")
+            for row in plan:
+                print(f"        {row}")
+    return failures
+
+if __name__ == "__main__":
+    print("-" * 50)
+    print(f"HOT QUERY INDEX CHECK ({db_manager.dialect})")
+    print("-" * 50)
+    run_migrations()
+    failed = check_indexes()
+    print("-" * 50)
+    sys.exit(1 if failed else 0)
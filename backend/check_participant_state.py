@@ -0,0 +1,108 @@
+
+# check_participant_state.py
+# Query-count and latency check of POST /api/contest/participant-state, the
+# endpoint every participant polls. Exits with status 1 if a warm request runs
+# more than MAX_QUERIES queries or the p95 latency is above the target.
+#
+#   python check_participant_state.py [username] [--requests 200] [--p95-ms 25]
+#
+# Contest-wide state (rounds, countdown, release flags) is cached, so a warm
+# request only reads the participant's own rows. Requests are sent without
+# If-None-Match, i.e. this measures the full build, not the 304 path.
+#
+# The query budget is also enforced by tests/test_participant_state.py (pytest,
+# throwaway database); the latency target is only checked here.
+
+import sys
+import time
+import argparse
+from db_connection import db_manager
+from migrate import run_migrations
+
+MAX_QUERIES = 2
+DEFAULT_P95_MS = 25
+
+class QueryCounter:
+    """Counts db_manager.execute_query calls while installed."""
+
+    def __init__(self):
+        self.count = 0
+        self._original = db_manager.execute_query
+
+    def __enter__(self):
+        def counted(*args, **kwargs):
+            self.count += 1
+            return self._original(*args, **kwargs)
+        db_manager.execute_query = counted
+        return self
+
+    def __exit__(self, *exc):
+        db_manager.execute_query = self._original
+
+def pick_participant(username):
+    if username:
+        res = db_manager.execute_query("SELECT user_id, username FROM users WHERE username=%s", (username,))
+    else:
+        res = db_manager.execute_query("SELECT user_id, username FROM users WHERE role='participant' ORDER BY user_id LIMIT 1")
+    return res[0] if res else None
+
+def check(username, requests_count, p95_target):
+    from app import create_app
+    from utils.cache import get_current_contest_id
+
+    user = pick_participant(username)
+    if not user:
+        print("FAIL  no participant found")
+        return 1
+    contest_id = get_current_contest_id()
+    client = create_app().test_client()
+    body = {'user_id': user['user_id'], 'contest_id': contest_id}
+    print(f"Participant {user['username']} (id {user['user_id']}), contest {contest_id}")
+
+    def call():
+        resp = client.post('/api/contest/participant-state', json=body)
+        if resp.status_code != 200:
+            raise RuntimeError(f"participant-state returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+
+    failures = 0
+
+    # Warm the contest-wide caches, then count one request
+    call()
+    with QueryCounter() as counter:
+        call()
+    if counter.count <= MAX_QUERIES:
+        print(f"PASS  queries per request: {counter.count} (max {MAX_QUERIES})")
+    else:
+        failures += 1
+        print(f"FAIL  queries per request: {counter.count} (max {MAX_QUERIES})")
+
+    timings = []
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    summary = f"p50 {p50:.1f} ms, p95 {p95:.1f} ms over {requests_count} requests (target p95 <= {p95_target} ms)"
+    if p95 <= p95_target:
+        print(f"PASS  latency: {summary}")
+    else:
+        failures += 1
+        print(f"FAIL  latency: {summary}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="participant-state query count and latency check")
+    parser.add_argument('username', nargs='?', help="participant to poll as (default: first participant)")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--p95-ms', type=float, default=DEFAULT_P95_MS)
+    args = parser.parse_args()
+
+    print("-" * 50)
+    print(f"PARTICIPANT STATE CHECK ({db_manager.dialect})")
+    print("-" * 50)
+    run_migrations()
+    failures = check(args.username, args.requests, args.p95_ms)
+    print("-" * 50)
+    sys.exit(1 if failures else 0)
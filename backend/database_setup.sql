@@ -88,6 +88,7 @@ CREATE TABLE IF NOT EXISTS `rounds` (
   
   PRIMARY KEY (`round_id`),
   UNIQUE KEY `contest_round` (`contest_id`, `round_number`),
+  KEY `idx_rounds_contest_status` (`contest_id`, `status`, `round_number`),
   CONSTRAINT `fk_rounds_contest` FOREIGN KEY (`contest_id`) REFERENCES `contests` (`contest_id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -137,9 +138,13 @@ CREATE TABLE IF NOT EXISTS `submissions` (
   `status` ENUM('pending', 'evaluated', 'failed') NOT NULL DEFAULT 'pending',
   `time_taken_seconds` INT(11) DEFAULT NULL,
   `submission_timestamp` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  `journal_id` VARCHAR(36) DEFAULT NULL,
   
   PRIMARY KEY (`submission_id`),
+  UNIQUE KEY `idx_sub_journal` (`journal_id`),
   KEY `participant_contest` (`user_id`, `contest_id`),
+  KEY `idx_sub_user_question` (`user_id`, `question_id`, `is_correct`),
+  KEY `idx_sub_contest_correct` (`contest_id`, `is_correct`),
   CONSTRAINT `fk_sub_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE,
   CONSTRAINT `fk_sub_question` FOREIGN KEY (`question_id`) REFERENCES `questions` (`question_id`) ON DELETE CASCADE,
   CONSTRAINT `fk_sub_round` FOREIGN KEY (`round_id`) REFERENCES `rounds` (`round_id`) ON DELETE CASCADE,
@@ -165,7 +170,8 @@ CREATE TABLE IF NOT EXISTS `participant_level_stats` (
   `run_count` INT DEFAULT 0,
   
   PRIMARY KEY (`stat_id`),
-  UNIQUE KEY `user_contest_level` (`user_id`, `contest_id`, `level`)
+  UNIQUE KEY `user_contest_level` (`user_id`, `contest_id`, `level`),
+  KEY `idx_pls_contest_level_score` (`contest_id`, `level`, `level_score`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- --------------------------------------------------------
@@ -271,6 +277,7 @@ CREATE TABLE IF NOT EXISTS `violations` (
   
   PRIMARY KEY (`violation_id`),
   KEY `tracking_index` (`user_id`, `contest_id`),
+  KEY `idx_v_contest` (`contest_id`),
   CONSTRAINT `fk_v_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE,
   CONSTRAINT `fk_v_contest` FOREIGN KEY (`contest_id`) REFERENCES `contests` (`contest_id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -320,15 +327,55 @@ CREATE TABLE IF NOT EXISTS `leaderboard` (
   `questions_correct` INT(11) DEFAULT 0,
   `violations_count` INT(11) DEFAULT 0,
   `current_round` INT(11) DEFAULT 1,
+  `levels_completed` INT(11) DEFAULT 0,
+  
+  -- score desc, levels completed desc, time asc packed into one integer (utils/standings.py)
+  `rank_key` BIGINT DEFAULT NULL,
   
   `last_updated` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   
   PRIMARY KEY (`leaderboard_id`),
   UNIQUE KEY `user_contest_unique` (`user_id`, `contest_id`),
+  KEY `idx_lb_rank` (`contest_id`, `rank_key`, `user_id`, `total_score`, `questions_correct`, `total_time_taken_seconds`),
   CONSTRAINT `fk_lb_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE,
   CONSTRAINT `fk_lb_contest` FOREIGN KEY (`contest_id`) REFERENCES `contests` (`contest_id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- --------------------------------------------------------
+-- 12b. Leaderboard Snapshots (frozen standings of finalized levels)
+-- --------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `leaderboard_snapshots` (
+  `snapshot_id` INT(11) NOT NULL AUTO_INCREMENT,
+  `contest_id` INT(11) NOT NULL,
+  `level` INT(11) NOT NULL,
+  `version` INT(11) NOT NULL,
+  `reason` VARCHAR(50) DEFAULT NULL,
+  `row_count` INT(11) DEFAULT 0,
+  `checksum` CHAR(40) NOT NULL,
+  -- gzipped JSON, never updated once written (utils/snapshots.py)
+  `payload` LONGBLOB NOT NULL,
+  `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`snapshot_id`),
+  UNIQUE KEY `idx_snap_version` (`contest_id`, `level`, `version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- --------------------------------------------------------
+-- 12c. Leaderboard History (keyframes 'K' + deltas 'D', recorded_at in epoch ms), source = recording process
+-- --------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `leaderboard_history` (
+  `event_id` BIGINT NOT NULL AUTO_INCREMENT,
+  `contest_id` INT(11) NOT NULL,
+  `level` INT(11) NOT NULL,
+  `recorded_at` BIGINT NOT NULL,
+  `kind` CHAR(1) NOT NULL,
+  `payload` MEDIUMTEXT NOT NULL,
+  `source` VARCHAR(16) DEFAULT NULL,
+
+  PRIMARY KEY (`event_id`),
+  KEY `idx_hist_time` (`contest_id`, `level`, `recorded_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- --------------------------------------------------------
 -- 13. Admin Key-Value State
 -- --------------------------------------------------------
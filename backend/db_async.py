@@ -0,0 +1,244 @@
+
+# db_async.py
+# Asyncio variant of db_manager for `async def` route handlers and background tasks.
+#
+# Same contract as the blocking managers:
+#   await async_db.execute_query(query, params)   -> list of dicts, None on error
+#   await async_db.execute_update(query, params)  -> {"last_id", "affected"}
+#                                                    (defer=True as in MySQLManager)
+#   await async_db.upsert(table, data, conflict_keys)
+#
+# Backend follows db_manager: aiomysql when db_manager is MySQL, aiosqlite when it
+# fell back to SQLite. If the async driver is not installed the blocking manager
+# runs on a bounded thread pool instead, so callers never need to care.
+#
+# The drivers bind their connections to one event loop, while Flask runs every
+# async view in a fresh loop. All driver work therefore happens on a single
+# long-lived loop thread owned by this module, and callers on any loop await it.
+#
+# Writes never get a connection of their own: SQLite writes are queued on the
+# manager's SQLiteWriter (group commit, one writer), MySQL writes run through the
+# blocking manager on a thread pool so they keep its circuit breaker and the
+# deferred-write queue (db_breaker.py). Reads use the async drivers; MySQL reads
+# go through the blocking manager too while the breaker is not closed.
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from db_connection import db_manager, _mark_request_written
+from db_sqlite import WRITE_TIMEOUT
+from db_breaker import CLOSED
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+logger = logging.getLogger("AsyncDatabaseManager")
+
+class _LoopThread:
+    """Daemon thread running the event loop that owns every async connection."""
+
+    def __init__(self, name="async-db-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def run(self, coro):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+class AsyncMySQLBackend:
+    dialect = 'mysql'
+
+    def __init__(self, sync_manager, pool_size, timeout):
+        self.sync_manager = sync_manager
+        self.connect_config = sync_manager.connect_config
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.pool = None
+        self._pool_lock = None
+        # Writes and breaker-open reads: the blocking manager, off the loop thread
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="async-db-write")
+
+    async def _blocking(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def _get_pool(self):
+        if self.pool is not None:
+            return self.pool
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self.pool is None:
+                cfg = self.connect_config
+                self.pool = await aiomysql.create_pool(
+                    host=cfg.get('host', 'localhost'),
+                    port=int(cfg.get('port', 3306)),
+                    user=cfg.get('user', 'root'),
+                    password=cfg.get('password', ''),
+                    db=cfg.get('database'),
+                    charset=cfg.get('charset', 'utf8mb4'),
+                    minsize=1,
+                    maxsize=self.pool_size,
+                    pool_recycle=1800,
+                    cursorclass=aiomysql.DictCursor,
+                )
+                logger.info(f"aiomysql pool initialized (maxsize={self.pool_size}).")
+        return self.pool
+
+    async def _acquire(self):
+        # Same fail-fast behaviour as HealthCheckedPool: never queue forever
+        pool = await self._get_pool()
+        return pool, await asyncio.wait_for(pool.acquire(), self.timeout)
+
+    async def execute_query(self, query, params=None):
+        if self.sync_manager.breaker.state != CLOSED:
+            # Primary unhealthy: the blocking manager probes it or serves stale results
+            return await self._blocking(self.sync_manager.execute_query, query, params, False, True)
+        try:
+            pool, conn = await self._acquire()
+        except Exception as e:
+            logger.error(f"Failed to get async connection: {e}")
+            return None
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params or ())
+                return list(await cursor.fetchall())
+        except Exception as e:
+            logger.error(f"SELECT Query failed (async): {e}\nQuery: {query}")
+            return None
+        finally:
+            pool.release(conn)
+
+    async def execute_update(self, query, params=None, defer=False):
+        # Breaker, DBBusy/DBUnavailable handling and defer=True all live in MySQLManager
+        return await self._blocking(self.sync_manager.execute_update, query, params, defer)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+class AsyncSQLiteBackend:
+    dialect = 'sqlite'
+
+    def __init__(self, sync_manager, max_connections=32):
+        self.sync_manager = sync_manager
+        self.max_connections = max_connections
+        self._slots = None
+
+    def _sem(self):
+        # One connection (and aiosqlite worker thread) per call, like SQLiteManager: cap them
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._slots
+
+    async def execute_query(self, query, params=None):
+        async with self._sem():
+            try:
+                async with aiosqlite.connect(self.sync_manager.db_path) as conn:
+                    conn.row_factory = aiosqlite.Row
+                    async with conn.execute(self.sync_manager._adapt_query(query), params or ()) as cursor:
+                        return [dict(row) for row in await cursor.fetchall()]
+            except Exception as e:
+                logger.error(f"SELECT Query failed (async SQLite): {e}\nQuery: {query}")
+                return None
+
+    async def execute_update(self, query, params=None, defer=False):
+        # Raises on error, same as SQLiteManager.execute_update. Queued on the
+        # manager's single writer: a second writing connection would bring back
+        # 'database is locked' between it and the group commits.
+        future = self.sync_manager.writer.submit('stmt', (self.sync_manager._adapt_query(query), params))
+        return await asyncio.wait_for(asyncio.wrap_future(future), WRITE_TIMEOUT)
+
+    async def close(self):
+        pass
+
+class ThreadedBackend:
+    """Fallback when no async driver is installed: blocking manager on a bounded thread pool."""
+
+    def __init__(self, sync_manager, max_workers):
+        self.sync_manager = sync_manager
+        self.dialect = sync_manager.dialect
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-db")
+
+    async def execute_query(self, query, params=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.sync_manager.execute_query, query, params)
+
+    async def execute_update(self, query, params=None, defer=False):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self.sync_manager.execute_update, query, params, defer=defer))
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+class AsyncDatabaseManager:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncDatabaseManager, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.sync_manager = db_manager
+        self.dialect = db_manager.dialect
+        self._loop = _LoopThread()
+
+        if self.dialect == 'mysql':
+            settings = getattr(db_manager, 'pool_settings', {})
+            pool_size = settings.get('pool_size', 30)
+            if aiomysql is not None:
+                self.backend = AsyncMySQLBackend(db_manager, pool_size, settings.get('timeout', 2))
+            else:
+                logger.warning("aiomysql not found. Async DB calls will use a thread pool.")
+                self.backend = ThreadedBackend(db_manager, pool_size)
+        else:
+            if getattr(db_manager, 'in_memory', False):
+                # The in-memory database is one locked connection, no file to open
+                self.backend = ThreadedBackend(db_manager, 8)
+            elif aiosqlite is not None:
+                self.backend = AsyncSQLiteBackend(db_manager)
+            else:
+                logger.warning("aiosqlite not found. Async DB calls will use a thread pool.")
+                self.backend = ThreadedBackend(db_manager, 8)
+        logger.info(f"Async DB manager initialized ({self.backend.__class__.__name__}, {self.dialect}).")
+
+    async def execute_query(self, query, params=None):
+        return await self._loop.run(self.backend.execute_query(query, params))
+
+    async def execute_update(self, query, params=None, defer=False):
+        # Keep read-your-writes bookkeeping in the caller's request context
+        _mark_request_written()
+        return await self._loop.run(self.backend.execute_update(query, params, defer))
+
+    async def upsert(self, table, data, conflict_keys):
+        sql, vals = self.sync_manager.upsert_sql(table, data, conflict_keys)
+        return await self.execute_update(sql, vals)
+
+    async def close(self):
+        await self._loop.run(self.backend.close())
+
+async_db_manager = AsyncDatabaseManager()
@@ -0,0 +1,267 @@
+
+# db_breaker.py
+# Circuit breaker and degraded read-only mode for the MySQL primary.
+#
+# - CircuitBreaker trips OPEN when, within DB_BREAKER_WINDOW seconds, the primary
+#   fails DB_BREAKER_FAILURES times (no connection, dropped connection, timeouts)
+#   or answers DB_BREAKER_SLOW_CALLS calls slower than DB_BREAKER_SLOW_MS (and
+#   those are the majority). While OPEN every call fails fast instead of tying
+#   up request workers on a sick server. After DB_BREAKER_RESET seconds a single
+#   probe call is let through (HALF_OPEN); it closes or re-opens the breaker.
+# - StaleResults keeps the last good result of reads flagged stale_ok=True
+#   (contest state, questions, leaderboards) and serves them while the primary
+#   is unreachable.
+# - DeferredWrites queues writes flagged defer=True (violation logs, counters)
+#   that never reached the server, and replays them in order once it is back.
+#
+# SQL errors (syntax, constraint violations) mean the server answered, so they
+# never count against the breaker.
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+
+logger = logging.getLogger("CircuitBreaker")
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class DBUnavailable(Exception):
+    """The statement was not sent: breaker open or no connection to the primary."""
+    pass
+
+class DBBusy(Exception):
+    """
+    The statement was not sent: every pooled connection is in use. Backpressure,
+    not an outage, so it never counts towards the breaker, serves stale reads or
+    defers writes; the caller just fails this one statement.
+    """
+    pass
+
+def breaker_settings():
+    return {
+        "failure_threshold": int(os.getenv('DB_BREAKER_FAILURES', 5)),
+        "slow_ms": float(os.getenv('DB_BREAKER_SLOW_MS', 2000)),
+        "slow_threshold": int(os.getenv('DB_BREAKER_SLOW_CALLS', 20)),
+        "window": float(os.getenv('DB_BREAKER_WINDOW', 10)),
+        "reset_timeout": float(os.getenv('DB_BREAKER_RESET', 15)),
+    }
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, slow_ms=2000, slow_threshold=20, window=10, reset_timeout=15):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_ms = slow_ms
+        self.slow_threshold = slow_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._calls = deque()  # (monotonic time, failed, slow) inside the window
+        self._opened_at = 0
+        self._probe_started = None
+        self._listeners = []
+        self.stats = {'trips': 0, 'rejected': 0, 'failures': 0, 'slow_calls': 0,
+                      'last_error': None, 'last_trip_reason': None, 'last_state_change': None}
+
+    def add_listener(self, fn):
+        """fn(old_state, new_state) runs after every transition (outside the lock)."""
+        self._listeners.append(fn)
+
+    def _set_state(self, new_state):
+        # Caller holds the lock; returns the transition for _notify()
+        old_state, self.state = self.state, new_state
+        self.stats['last_state_change'] = time.time()
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        if new_state != HALF_OPEN:
+            self._probe_started = None
+        if new_state == CLOSED:
+            self._calls.clear()
+        return (old_state, new_state)
+
+    def _notify(self, transition):
+        if not transition or transition[0] == transition[1]:
+            return
+        old_state, new_state = transition
+        log = logger.info if new_state == CLOSED else logger.warning
+        log(f"Breaker '{self.name}' {old_state} -> {new_state}")
+        for fn in self._listeners:
+            try:
+                fn(old_state, new_state)
+            except Exception as e:
+                logger.error(f"Breaker listener failed: {e}")
+
+    def allow(self):
+        """True if a call may go to the database now."""
+        transition = None
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self._opened_at >= self.reset_timeout:
+                transition = self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    allowed = True
+                else:
+                    allowed = False
+            else:
+                allowed = False
+            if not allowed:
+                self.stats['rejected'] += 1
+        self._notify(transition)
+        return allowed
+
+    def release_probe(self):
+        """The allowed call never reached the database (pool busy): let the next one probe."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+
+    def _trim(self, now):
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def record_success(self, elapsed):
+        slow = elapsed * 1000 > self.slow_ms
+        transition = None
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                transition = self._set_state(OPEN if slow else CLOSED)
+                if slow:
+                    self.stats['last_trip_reason'] = f"probe took {elapsed * 1000:.0f}ms"
+            elif self.state == CLOSED:
+                self._calls.append((now, False, slow))
+                if slow:
+                    self.stats['slow_calls'] += 1
+                    self._trim(now)
+                    n_slow = sum(1 for c in self._calls if c[2])
+                    if n_slow >= self.slow_threshold and n_slow * 2 >= len(self._calls):
+                        self.stats['trips'] += 1
+                        self.stats['last_trip_reason'] = f"{n_slow} calls slower than {self.slow_ms:.0f}ms in {self.window:.0f}s"
+                        transition = self._set_state(OPEN)
+        self._notify(transition)
+
+    def record_failure(self, error):
+        transition = None
+        with self._lock:
+            now = time.monotonic()
+            self.stats['failures'] += 1
+            self.stats['last_error'] = str(error)
+            if self.state == HALF_OPEN:
+                self.stats['last_trip_reason'] = f"probe failed: {error}"
+                transition = self._set_state(OPEN)
+            elif self.state == CLOSED:
+                self._calls.append((now, True, False))
+                self._trim(now)
+                n_failed = sum(1 for c in self._calls if c[1])
+                if n_failed >= self.failure_threshold:
+                    self.stats['trips'] += 1
+                    self.stats['last_trip_reason'] = f"{n_failed} failures in {self.window:.0f}s"
+                    transition = self._set_state(OPEN)
+        self._notify(transition)
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats, name=self.name, state=self.state)
+            if self.state != CLOSED:
+                out['retry_in'] = round(max(0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            return out
+
+class StaleResults:
+    """Last good result per (query, params), bounded LRU. Rows are copied both ways."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'served': 0, 'misses': 0}
+
+    @staticmethod
+    def _key(query, params):
+        return (query, tuple(params or ()))
+
+    def put(self, query, params, rows):
+        key = self._key(query, params)
+        snapshot = [dict(r) for r in rows]
+        with self._lock:
+            self._data[key] = (time.time(), snapshot)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, query, params):
+        """(rows, age_seconds) or (None, None)."""
+        with self._lock:
+            entry = self._data.get(self._key(query, params))
+            if entry is None:
+                self.stats['misses'] += 1
+                return None, None
+            self.stats['served'] += 1
+        stored_at, rows = entry
+        return [dict(r) for r in rows], time.time() - stored_at
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._data), maxsize=self.maxsize)
+
+class DeferredWrites:
+    """
+    FIFO of (query, params) that could not be sent to the primary. Only for
+    statements that are safe to apply late; anything relying on the write's
+    result (last_id, read-after-write) must not be deferred. In-memory and per
+    process: a restart during an outage loses the queue.
+    """
+
+    def __init__(self, maxlen=10000):
+        self.maxlen = maxlen
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self.stats = {'deferred': 0, 'replayed': 0, 'dropped': 0}
+
+    def add(self, query, params):
+        with self._lock:
+            if len(self._queue) >= self.maxlen:
+                # Oldest first out: keep the most recent activity
+                self._queue.popleft()
+                self.stats['dropped'] += 1
+            self._queue.append((query, tuple(params or ())))
+            self.stats['deferred'] += 1
+
+    def __len__(self):
+        return len(self._queue)
+
+    def replay(self, write):
+        """
+        Send queued statements in order through write(query, params). Stops at
+        the first DBUnavailable / DBBusy and keeps that statement at the head.
+        """
+        replayed = 0
+        while True:
+            with self._lock:
+                if not self._queue:
+                    break
+                query, params = self._queue[0]
+            try:
+                write(query, params)
+            except (DBUnavailable, DBBusy):
+                break
+            with self._lock:
+                self._queue.popleft()
+                self.stats['replayed'] += 1
+            replayed += 1
+        if replayed:
+            logger.info(f"Replayed {replayed} deferred write(s), {len(self._queue)} still queued.")
+        return replayed
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, queued=len(self._queue), maxlen=self.maxlen)
@@ -3,7 +3,10 @@
 
 import logging
 import os
+import time
+import threading
 import configparser
+from urllib.parse import urlparse, unquote
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,17 +23,73 @@ logger = logging.getLogger("DatabaseManager")
 
 # --- AUTO-DETECTION ---
 USE_SQLITE = False
+# DB_MODE=memory: in-memory SQLite with a durable journal, see db_memory.py
+# DB_MODE=sqlite: SQLite file even when mysql.connector is installed
+DB_MODE = os.getenv('DB_MODE', '').lower()
 
 try:
     import mysql.connector
-    from mysql.connector import pooling, Error
+    from mysql.connector import pooling, Error, errors
+    from db_pool import HealthCheckedPool, PoolExhausted
+    from db_breaker import CircuitBreaker, StaleResults, DeferredWrites, DBUnavailable, DBBusy, breaker_settings, CLOSED
     # Test connection? No, just assume success until retry fails
 except ImportError:
     logger.warning("mysql.connector not found. Falling back to SQLite.")
     USE_SQLITE = True
 
+# --- READ/WRITE SPLITTING ---
+# DB_REPLICAS: comma separated DSNs, e.g.
+#   DB_REPLICAS=mysql://root:@127.0.0.1:3307/debug_marathon_v3
+# Reads issued while handling a request go to a healthy replica until that request
+# writes, after which it reads from the primary (read-your-writes). Scripts and
+# anything outside a request context always use the primary.
+REPLICA_RETRY_SECONDS = int(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+
+def pool_settings(default_size=30):
+    # DB_POOL_TIMEOUT bounds how long a request waits for a free connection
+    return {
+        "pool_size": int(os.getenv('DB_POOL_SIZE', default_size)),
+        "timeout": float(os.getenv('DB_POOL_TIMEOUT', 2)),
+        "ping_interval": int(os.getenv('DB_POOL_PING_INTERVAL', 30)),
+        "recycle": int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
+def parse_dsn(dsn):
+    parts = urlparse(dsn.strip())
+    config = {
+        "host": parts.hostname or 'localhost',
+        "port": parts.port or 3306,
+        "user": unquote(parts.username or 'root'),
+        "password": unquote(parts.password or ''),
+    }
+    if parts.path and parts.path != '/':
+        config["database"] = parts.path.lstrip('/')
+    return config
+
+def _request_has_written():
+    from flask import g, has_request_context
+    # Outside a request there is no consistency boundary, so stay on the primary
+    if not has_request_context():
+        return True
+    return g.get('db_wrote', False)
+
+def _mark_request_written():
+    from flask import g, has_request_context
+    if has_request_context():
+        g.db_wrote = True
+
+def _mark_request_degraded(age):
+    # Picked up by app.after_request to flag the response as served from stale data
+    from flask import g, has_request_context
+    if has_request_context():
+        g.db_degraded = max(g.get('db_degraded', 0), age)
+
+# Seconds between attempts to replay writes deferred while the primary was down
+DEFERRED_REPLAY_INTERVAL = int(os.getenv('DB_DEFERRED_REPLAY_INTERVAL', 5))
+
 class MySQLManager:
     _instance = None
+    dialect = 'mysql'
     
     def __new__(cls):
         if cls._instance is None:
@@ -56,10 +115,12 @@ class MySQLManager:
             # User Task: "Move the database root password... into a .env file... load them."
             # So Env > Ini.
             
+            ini_pool_size = 30
             if os.path.exists(config_path):
                 config.read(config_path)
                 if 'mysql' in config:
                     read_config = dict(config['mysql'])
+                    ini_pool_size = int(read_config.get('pool_size', ini_pool_size))
                     # Filter keys
                     for key in ['pool_name', 'pool_size', 'pool_reset_session']:
                         read_config.pop(key, None)
@@ -80,59 +141,141 @@ class MySQLManager:
             target_db = database or base_config.pop('database', 'debug_marathon_v3')
 
 
+            self.pool_settings = pool_settings(ini_pool_size)
             try:
                 full_config = base_config.copy()
                 full_config['database'] = target_db
-                self.pool = mysql.connector.pooling.MySQLConnectionPool(
+                self.pool = HealthCheckedPool(
                     pool_name="debug_marathon_pool",
-                    pool_size=30,
-                    pool_reset_session=True,
+                    **self.pool_settings,
                     **full_config
                 )
-                logger.info(f"Connection pool initialized with database '{target_db}'.")
+                self.connect_config = full_config
+                logger.info(f"Connection pool initialized with database '{target_db}' ({self.pool_settings}).")
             except Error as e:
                 if e.errno == 1049: # Unknown database
                     logger.warning(f"Database '{target_db}' not found. Connecting to server only.")
                     base_config.pop('database', None)
-                    self.pool = mysql.connector.pooling.MySQLConnectionPool(
+                    self.pool = HealthCheckedPool(
                         pool_name="debug_marathon_pool",
-                        pool_size=30,
-                        pool_reset_session=True,
+                        **self.pool_settings,
                         **base_config
                     )
+                    self.connect_config = base_config.copy()
                 else:
                     raise
+
+            self._initialize_replicas(base_config, target_db)
+            self._initialize_breaker()
         except Error as e:
             logger.error(f"Error initializing connection pool: {e}")
             raise
 
+    def _initialize_replicas(self, base_config, target_db):
+        self.replicas = []
+        self._replica_cursor = 0
+        dsns = [d for d in os.getenv('DB_REPLICAS', '').split(',') if d.strip()]
+        settings = dict(self.pool_settings)
+        settings['pool_size'] = int(os.getenv('DB_REPLICA_POOL_SIZE', settings['pool_size']))
+        
+        for idx, dsn in enumerate(dsns):
+            replica_config = {k: v for k, v in base_config.items() if k in ('charset', 'collation')}
+            replica_config['database'] = target_db
+            replica_config.update(parse_dsn(dsn))
+            name = f"{replica_config['host']}:{replica_config['port']}"
+            try:
+                pool = HealthCheckedPool(
+                    pool_name=f"debug_marathon_replica_{idx}",
+                    **settings,
+                    **replica_config
+                )
+                self.replicas.append({'name': name, 'pool': pool, 'down_until': 0, 'last_error': None})
+                logger.info(f"Replica pool initialized for {name}.")
+            except Error as e:
+                # A missing replica must never stop the app, reads fall back to the primary
+                logger.error(f"Replica {name} unavailable, skipping: {e}")
+
+    def _initialize_breaker(self):
+        self.breaker = CircuitBreaker('primary', **breaker_settings())
+        self.stale = StaleResults(int(os.getenv('DB_STALE_ENTRIES', 1024)))
+        self.deferred = DeferredWrites(int(os.getenv('DB_DEFERRED_MAX', 10000)))
+        self._replay_now = threading.Event()
+        self.breaker.add_listener(lambda old, new: new == CLOSED and self._replay_now.set())
+        self._replayer = threading.Thread(target=self._replay_loop, name="db-deferred-replay", daemon=True)
+        self._replayer.start()
+
+    def _replay_loop(self):
+        while True:
+            self._replay_now.wait(DEFERRED_REPLAY_INTERVAL)
+            self._replay_now.clear()
+            if len(self.deferred) and self.breaker.state == CLOSED:
+                self.deferred.replay(self._write)
+
+    def breaker_status(self):
+        return {
+            'breaker': self.breaker.snapshot(),
+            'stale_reads': self.stale.snapshot_stats(),
+            'deferred_writes': self.deferred.snapshot_stats()
+        }
+
+    def _pick_replica(self):
+        # Round robin over replicas that are not cooling down after a failure
+        now = time.time()
+        for _ in range(len(self.replicas)):
+            self._replica_cursor = (self._replica_cursor + 1) % len(self.replicas)
+            replica = self.replicas[self._replica_cursor]
+            if replica['down_until'] <= now:
+                return replica
+        return None
+
+    def _mark_replica_down(self, replica, error):
+        replica['down_until'] = time.time() + REPLICA_RETRY_SECONDS
+        replica['last_error'] = str(error)
+        logger.warning(f"Replica {replica['name']} unhealthy ({error}). Using primary for {REPLICA_RETRY_SECONDS}s.")
+
+    def _replica_connection(self, replica):
+        try:
+            return replica['pool'].get_connection()
+        except PoolExhausted as e:
+            # Busy, not broken: serve this read from the primary without a cooldown
+            logger.warning(f"{e}. Reading from primary.")
+        except Error as e:
+            self._mark_replica_down(replica, e)
+        return None
+
+    def _read_target(self, primary=False):
+        """Replica to read from, or None for the primary."""
+        if primary or not self.replicas or _request_has_written():
+            return None
+        return self._pick_replica()
+
+    def replica_status(self):
+        now = time.time()
+        return [
+            {'name': r['name'], 'healthy': r['down_until'] <= now, 'last_error': r['last_error']}
+            for r in self.replicas
+        ]
+
+    def pool_stats(self):
+        return {
+            'primary': self.pool.stats(),
+            'replicas': [dict(r['pool'].stats(), **s) for r, s in zip(self.replicas, self.replica_status())]
+        }
+
     def get_connection(self):
+        # No inline ping/reconnect: dead connections are evicted by the pool's
+        # background health check, and checkout fails fast after DB_POOL_TIMEOUT.
         try:
-            conn = self.pool.get_connection()
-            if conn.is_connected():
-                return conn
-            else:
-                try:
-                    conn.reconnect(attempts=3, delay=2)
-                    return conn
-                except:
-                    return None
+            return self.pool.get_connection()
         except Error as e:
             logger.error(f"Failed to get connection from pool: {e}")
             return None
 
-    def execute_query(self, query, params=None):
-        conn = self.get_connection()
-        if not conn: return None
-        
+    def _fetch_all(self, conn, query, params):
         cursor = conn.cursor(dictionary=True)
         try:
             cursor.execute(query, params or ())
-            result = cursor.fetchall()
-            return result
-        except Error as e:
-            logger.error(f"SELECT Query failed: {e}\nQuery: {query}")
-            return None
+            return cursor.fetchall()
         finally:
             if cursor:
                 try: cursor.close()
@@ -141,17 +284,156 @@ class MySQLManager:
                 try: conn.close()
                 except: pass
 
-    def execute_update(self, query, params=None):
-        conn = self.get_connection()
-        if not conn: return False
+    def _primary_connection(self):
+        # Raises DBUnavailable instead of waiting on a primary the breaker gave up on
+        if not self.breaker.allow():
+            raise DBUnavailable(f"circuit breaker {self.breaker.state}")
+        try:
+            return self.pool.get_connection()
+        except PoolExhausted as e:
+            # Busy, not broken (as for replicas): the breaker only counts real connect failures
+            logger.warning(f"{e}. Statement not sent.")
+            self.breaker.release_probe()
+            raise DBBusy(str(e))
+        except Error as e:
+            logger.error(f"Failed to get connection from pool: {e}")
+            self.breaker.record_failure(e)
+            raise DBUnavailable(f"no connection to primary ({e})")
+
+    def _degraded_read(self, query, params, stale_ok, reason):
+        if stale_ok:
+            rows, age = self.stale.get(query, params)
+            if rows is not None:
+                _mark_request_degraded(age)
+                logger.warning(f"Primary unavailable ({reason}), serving {age:.0f}s old result.")
+                return rows
+        logger.error(f"SELECT Query failed: primary unavailable ({reason})\nQuery: {query}")
+        return None
+
+    def execute_query(self, query, params=None, primary=False, stale_ok=False):
+        """
+        stale_ok=True: remember the result and, while the primary is unreachable,
+        return the last good one instead of None (read-only degraded mode).
+        """
+        replica = self._read_target(primary)
+        if replica:
+            conn = self._replica_connection(replica)
+            if conn:
+                try:
+                    rows = self._fetch_all(conn, query, params)
+                    if stale_ok: self.stale.put(query, params, rows)
+                    return rows
+                except (errors.OperationalError, errors.InterfaceError) as e:
+                    # Replica dropped mid-query: retry once on the primary below
+                    self._mark_replica_down(replica, e)
+                except Error as e:
+                    logger.error(f"SELECT Query failed on replica {replica['name']}: {e}\nQuery: {query}")
+                    return None
         
-        cursor = conn.cursor()
+        try:
+            conn = self._primary_connection()
+        except DBUnavailable as e:
+            return self._degraded_read(query, params, stale_ok, e)
+        except DBBusy as e:
+            logger.error(f"SELECT Query failed: {e}\nQuery: {query}")
+            return None
+        
+        started = time.monotonic()
+        try:
+            rows = self._fetch_all(conn, query, params)
+        except (errors.OperationalError, errors.InterfaceError) as e:
+            self.breaker.record_failure(e)
+            return self._degraded_read(query, params, stale_ok, e)
+        except Error as e:
+            self.breaker.record_success(time.monotonic() - started)
+            logger.error(f"SELECT Query failed: {e}\nQuery: {query}")
+            return None
+        self.breaker.record_success(time.monotonic() - started)
+        if stale_ok: self.stale.put(query, params, rows)
+        return rows
+
+    def stream_query(self, query, params=None, batch_size=500):
+        """
+        Yield result rows one at a time from an unbuffered (server-side) cursor.
+        Memory stays constant regardless of row count; the pooled connection is
+        held until the generator is exhausted or closed.
+        """
+        replica = self._read_target()
+        conn = self._replica_connection(replica) if replica else None
+        if not conn:
+            try:
+                conn = self._primary_connection()
+            except DBUnavailable as e:
+                logger.error(f"Streaming Query failed: primary unavailable ({e})\nQuery: {query}")
+                return
+            except DBBusy as e:
+                logger.error(f"Streaming Query failed: {e}\nQuery: {query}")
+                return
+        
+        cursor = conn.cursor(dictionary=True, buffered=False)
         try:
             cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows: break
+                for row in rows:
+                    yield row
+        except Error as e:
+            logger.error(f"Streaming Query failed: {e}\nQuery: {query}")
+        finally:
+            # Consumer may stop early (client disconnect): drain the unread
+            # result so the connection can go back to the pool cleanly.
+            try: conn.consume_results()
+            except: pass
+            try: cursor.close()
+            except: pass
+            try: conn.close()
+            except: pass
+
+    def execute_update(self, query, params=None, defer=False):
+        """
+        defer=True: if the primary is unreachable, queue the statement for replay
+        and return {"last_id": None, "affected": 0, "deferred": True}.
+        """
+        # Pin the rest of this request to the primary (read-your-writes)
+        _mark_request_written()
+        try:
+            return self._write(query, params)
+        except DBUnavailable as e:
+            if defer:
+                self.deferred.add(query, params)
+                logger.warning(f"Primary unavailable ({e}), write deferred.")
+                return {"last_id": None, "affected": 0, "deferred": True}
+            logger.error(f"UPDATE Query failed: primary unavailable ({e})\nQuery: {query}")
+            return False
+        except DBBusy as e:
+            logger.error(f"UPDATE Query failed: {e}\nQuery: {query}")
+            return False
+
+    def _write(self, query, params):
+        # DBUnavailable only when the statement certainly did not run, so a
+        # deferred write is applied at most once. A commit that fails is unknown
+        # and reported as a plain failure.
+        conn = self._primary_connection()
+        started = time.monotonic()
+        cursor = None
+        try:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params or ())
+            except (errors.OperationalError, errors.InterfaceError) as e:
+                self.breaker.record_failure(e)
+                raise DBUnavailable(str(e))
             conn.commit()
+            self.breaker.record_success(time.monotonic() - started)
             return {"last_id": cursor.lastrowid, "affected": cursor.rowcount}
         except Error as e:
-            conn.rollback()
+            try: conn.rollback()
+            except: pass
+            if isinstance(e, (errors.OperationalError, errors.InterfaceError)):
+                self.breaker.record_failure(e)
+            else:
+                self.breaker.record_success(time.monotonic() - started)
             logger.error(f"UPDATE Query failed: {e}\nQuery: {query}")
             return False
         finally:
@@ -162,6 +444,44 @@ class MySQLManager:
                 try: conn.close()
                 except: pass
 
+    def execute_transaction(self, queries_list):
+        """Run [(query, params), ...] atomically. True on commit, False after rollback."""
+        _mark_request_written()
+        try:
+            conn = self._primary_connection()
+        except DBUnavailable as e:
+            logger.error(f"Transaction failed: primary unavailable ({e})")
+            return False
+        except DBBusy as e:
+            logger.error(f"Transaction failed: {e}")
+            return False
+        
+        started = time.monotonic()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            for query, params in queries_list:
+                cursor.execute(query, params or ())
+            conn.commit()
+            self.breaker.record_success(time.monotonic() - started)
+            return True
+        except Error as e:
+            try: conn.rollback()
+            except: pass
+            if isinstance(e, (errors.OperationalError, errors.InterfaceError)):
+                self.breaker.record_failure(e)
+            else:
+                self.breaker.record_success(time.monotonic() - started)
+            logger.error(f"Transaction failed: {e}")
+            return False
+        finally:
+            if cursor:
+                try: cursor.close()
+                except: pass
+            if conn:
+                try: conn.close()
+                except: pass
+
     def init_database(self, schema_file):
         if not os.path.exists(schema_file):
             logger.error(f"Schema file not found: {schema_file}")
@@ -191,6 +511,11 @@ class MySQLManager:
     def upsert(self, table, data, conflict_keys):
         # Default MySQL implementation using ON DUPLICATE KEY UPDATE (manual Construction)
         # This is a fallback helper
+        sql, vals = self.upsert_sql(table, data, conflict_keys)
+        return self.execute_update(sql, vals)
+
+    def upsert_sql(self, table, data, conflict_keys):
+        """(sql, params) for upsert(), shared with the async manager."""
         keys = list(data.keys())
         columns = ', '.join(keys)
         placeholders = ', '.join(['%s'] * len(keys))
@@ -203,17 +528,23 @@ class MySQLManager:
         else:
             sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {update_clause}"
         
-        vals = tuple(data.values())
-        return self.execute_update(sql, vals)
+        return sql, tuple(data.values())
 
 # --- FACTORY ---
 
-try:
-    # Try initializing MySQL Manager
-    if not USE_SQLITE:
-        _temp = MySQLManager()
-    db_manager = _temp
-except Exception as e:
-    logger.warning(f"MySQL Connection Failed ({e}). Switching to SQLite.")
-    from db_sqlite import sqlite_manager
-    db_manager = sqlite_manager
+if DB_MODE == 'memory':
+    USE_SQLITE = True
+    from db_memory import memory_manager
+    db_manager = memory_manager
+else:
+    try:
+        # Try initializing MySQL Manager
+        if DB_MODE == 'sqlite':
+            USE_SQLITE = True
+        if not USE_SQLITE:
+            _temp = MySQLManager()
+        db_manager = _temp
+    except Exception as e:
+        logger.warning(f"MySQL Connection Failed ({e}). Switching to SQLite.")
+        from db_sqlite import sqlite_manager
+        db_manager = sqlite_manager
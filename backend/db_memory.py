@@ -0,0 +1,270 @@
+
+# db_memory.py
+# In-memory SQLite manager with a durable write journal (DB_MODE=memory).
+#
+# Meant for rehearsals and local load tests: one process, no MySQL server.
+# - The working set lives in a single in-memory SQLite connection, so reads never
+#   touch the disk.
+# - Every successful write is appended to a JSONL journal (fsync'd) BEFORE it is
+#   committed and acknowledged.
+# - A background thread checkpoints the whole database into a snapshot file and
+#   truncates the journal.
+# - On startup the snapshot is loaded and the journal replayed on top of it.
+#
+# Non-deterministic SQL (CURRENT_TIMESTAMP, random()) is re-evaluated on replay,
+# pass such values as parameters when exact replay matters.
+
+import os
+import json
+import time
+import atexit
+import base64
+import sqlite3
+import datetime
+import threading
+import logging
+from db_sqlite import SQLiteManager
+
+logger = logging.getLogger("MemorySQLiteManager")
+
+BASE_DIR = os.path.dirname(__file__)
+
+def _encode_param(value):
+    if isinstance(value, datetime.datetime):
+        return {'$dt': value.isoformat(sep=' ')}
+    if isinstance(value, datetime.date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {'$b64': base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f"Cannot journal parameter of type {type(value).__name__}")
+
+def _decode_param(obj):
+    # sqlite3 stores datetimes as ISO text, so replay binds the same text
+    if '$dt' in obj: return obj['$dt']
+    if '$date' in obj: return obj['$date']
+    if '$b64' in obj: return base64.b64decode(obj['$b64'])
+    return obj
+
+class MemorySQLiteManager(SQLiteManager):
+    _instance = None
+    in_memory = True
+
+    def _initialize(self):
+        self.snapshot_path = os.path.join(BASE_DIR, os.getenv('DB_MEMORY_SNAPSHOT', 'debug_marathon.snapshot.db'))
+        self.journal_path = os.path.join(BASE_DIR, os.getenv('DB_MEMORY_JOURNAL', 'debug_marathon.journal'))
+        self.snapshot_interval = int(os.getenv('DB_SNAPSHOT_INTERVAL', 60))
+        self.fsync = os.getenv('DB_JOURNAL_FSYNC', '1') != '0'
+        # Shown by setup/status scripts, no file backs the live database
+        self.db_path = ':memory:'
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.seq = 0
+        self.stats = {'journaled': 0, 'replayed': 0, 'checkpoints': 0, 'last_checkpoint_at': None}
+
+        self._load_snapshot()
+        self._replay_journal()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+        self._stop = threading.Event()
+        self._checkpointer = threading.Thread(target=self._checkpoint_loop, name="memdb-checkpoint", daemon=True)
+        self._checkpointer.start()
+        atexit.register(self.close)
+        logger.info(f"In-memory SQLite ready (seq {self.seq}). Snapshot: {self.snapshot_path}, journal: {self.journal_path}")
+
+    # --- RECOVERY ---
+
+    def _load_snapshot(self):
+        source = self.snapshot_path
+        if not os.path.exists(source):
+            # First run: start from the on-disk SQLite database if there is one
+            source = os.path.join(BASE_DIR, SQLiteManager.DB_FILE)
+            if not os.path.exists(source):
+                return
+        src = sqlite3.connect(source)
+        try:
+            src.backup(self.conn)
+        finally:
+            src.close()
+
+        row = None
+        try:
+            row = self.conn.execute("SELECT seq FROM _memdb_checkpoint").fetchone()
+            self.conn.execute("DROP TABLE _memdb_checkpoint")
+            self.conn.commit()
+        except sqlite3.Error:
+            pass
+        self.seq = row['seq'] if row else 0
+        logger.info(f"Loaded {os.path.basename(source)} (checkpoint seq {self.seq}).")
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_path, 'rb') as f:
+            for raw in f:
+                try:
+                    entry = json.loads(raw, object_hook=_decode_param)
+                except ValueError:
+                    # Torn last line from a crash mid-append: never acknowledged, drop it
+                    logger.warning("Journal ends with an incomplete entry, truncating it.")
+                    break
+                valid_bytes += len(raw)
+                if entry['seq'] <= self.seq:
+                    continue
+                try:
+                    if entry.get('script'):
+                        self.conn.executescript(entry['sql'])
+                    else:
+                        for sql, params in entry['stmts']:
+                            self.conn.execute(sql, params)
+                    self.conn.commit()
+                except sqlite3.Error as e:
+                    self.conn.rollback()
+                    logger.error(f"Journal replay failed at seq {entry['seq']}: {e}")
+                self.seq = entry['seq']
+                replayed += 1
+        if valid_bytes != os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        self.stats['replayed'] = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} journal entries (seq {self.seq}).")
+
+    # --- JOURNAL / CHECKPOINT ---
+
+    def _append_journal(self, entry):
+        # Caller holds self._lock, so journal order == commit order
+        entry['seq'] = self.seq + 1
+        self._journal.write(json.dumps(entry, default=_encode_param) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.seq += 1
+        self.stats['journaled'] += 1
+
+    def checkpoint(self):
+        """Write the whole database to the snapshot file and truncate the journal."""
+        tmp_path = self.snapshot_path + '.tmp'
+        with self._lock:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            dst = sqlite3.connect(tmp_path)
+            try:
+                self.conn.backup(dst)
+                dst.execute("CREATE TABLE _memdb_checkpoint (seq INTEGER)")
+                dst.execute("INSERT INTO _memdb_checkpoint (seq) VALUES (?)", (self.seq,))
+                dst.commit()
+            finally:
+                dst.close()
+            os.replace(tmp_path, self.snapshot_path)
+            # Entries up to self.seq are in the snapshot; replay skips them anyway,
+            # so a crash between replace() and truncate() is harmless.
+            self._journal.truncate(0)
+            self._journal.seek(0)
+            self.stats['checkpoints'] += 1
+            self.stats['last_checkpoint_at'] = datetime.datetime.utcnow().isoformat()
+
+    def _checkpoint_loop(self):
+        last_seq = self.seq
+        while not self._stop.wait(self.snapshot_interval):
+            if self.seq == last_seq:
+                continue
+            try:
+                started = time.monotonic()
+                self.checkpoint()
+                last_seq = self.seq
+                logger.info(f"Checkpoint at seq {last_seq} took {(time.monotonic() - started) * 1000:.1f}ms")
+            except Exception as e:
+                logger.error(f"Checkpoint failed: {e}")
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        try:
+            self.checkpoint()
+        except Exception as e:
+            logger.error(f"Final checkpoint failed: {e}")
+        self._journal.close()
+
+    # --- QUERY API (same contract as SQLiteManager) ---
+
+    def get_connection(self):
+        """
+        A private point-in-time copy of the database, for scripts that want a raw
+        DB-API connection (check_db_status.py). Callers may close it. The copy is
+        read-only: writes through it would never reach the live database or the
+        journal, so they raise sqlite3.OperationalError instead of being lost.
+        Write through execute_update / execute_transaction.
+        """
+        copy = sqlite3.connect(':memory:', check_same_thread=False)
+        with self._lock:
+            self.conn.backup(copy)
+        copy.execute("PRAGMA query_only=ON")
+        copy.row_factory = sqlite3.Row
+        return copy
+
+    def pool_stats(self):
+        return {
+            'primary': dict(self.stats, name='memory', dialect=self.dialect, seq=self.seq, journal=self.journal_path),
+            'replicas': []
+        }
+
+    def execute_query(self, query, params=None, primary=False, stale_ok=False):
+        with self._lock:
+            try:
+                cursor = self.conn.execute(self._adapt_query(query), params or ())
+                return [dict(row) for row in cursor.fetchall()]
+            except sqlite3.Error as e:
+                logger.error(f"SELECT Query failed (memory): {e}\nQuery: {query}")
+                return None
+
+    def stream_query(self, query, params=None, batch_size=500):
+        # Rows are already in memory; materialise under the lock rather than
+        # blocking writers for as long as the consumer takes to read them.
+        rows = self.execute_query(query, params)
+        for row in rows or []:
+            yield row
+
+    def execute_update(self, query, params=None, is_script=False, defer=False):
+        if 'ON DUPLICATE KEY UPDATE' in query:
+            logger.warning("ON DUPLICATE KEY UPDATE detected in SQLite adapter. This may fail unless query is manually adapted.")
+        adapted_query = self._adapt_query(query)
+        params = tuple(params or ())
+
+        with self._lock:
+            try:
+                if is_script:
+                    # executescript commits on its own, journal it first
+                    self._append_journal({'script': True, 'sql': adapted_query})
+                    self.conn.executescript(adapted_query)
+                    return {"last_id": None, "affected": -1}
+
+                cursor = self.conn.execute(adapted_query, params)
+                self._append_journal({'stmts': [[adapted_query, params]]})
+                self.conn.commit()
+                return {"last_id": cursor.lastrowid, "affected": cursor.rowcount}
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def execute_transaction(self, queries_list):
+        with self._lock:
+            stmts = []
+            try:
+                for query, params in queries_list:
+                    adapted_query = self._adapt_query(query)
+                    self.conn.execute(adapted_query, params or ())
+                    stmts.append([adapted_query, tuple(params or ())])
+                self._append_journal({'stmts': stmts})
+                self.conn.commit()
+                return True
+            except Exception as e:
+                self.conn.rollback()
+                logger.error(f"Transaction failed: {e}")
+                return False
+
+memory_manager = MemorySQLiteManager()
@@ -0,0 +1,207 @@
+
+# db_pool.py
+# Connection pool with background health checks for MySQLManager.
+#
+# - Checkout never pings or reconnects inline: dead connections are found by a
+#   background thread that pre-pings idle connections and evicts them.
+# - When every connection is busy, checkout waits at most `timeout` seconds and
+#   then fails fast with PoolExhausted instead of hanging the request worker.
+# - Checkout wait time, in-use count and exhaustion events are tracked in stats().
+
+import time
+import logging
+import threading
+from collections import deque
+import mysql.connector
+from mysql.connector import errors
+
+logger = logging.getLogger("DatabasePool")
+
+class PoolExhausted(errors.PoolError):
+    pass
+
+class _Slot:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+class PooledConnection:
+    """Proxy handed to callers. close() returns the connection to the pool."""
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+
+    def __getattr__(self, name):
+        return getattr(self._slot.conn, name)
+
+    def close(self):
+        if self._slot is None:
+            return
+        slot, self._slot = self._slot, None
+        self._pool._release(slot)
+
+class HealthCheckedPool:
+    def __init__(self, pool_name, pool_size=30, timeout=2.0, ping_interval=30, recycle=1800, **connect_kwargs):
+        self.name = pool_name
+        self.size = pool_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.recycle = recycle
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = deque()  # right end = most recently used
+        self._open = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._metrics = {
+            'checkouts': 0,
+            'exhausted': 0,
+            'evicted': 0,
+            'wait_ms_total': 0.0,
+            'wait_ms_max': 0.0,
+        }
+
+        # Eager first connection so bad credentials / unknown database surface at startup
+        self._idle.append(self._connect())
+        self._open = 1
+
+        self._stop = threading.Event()
+        self._checker = threading.Thread(target=self._health_loop, name=f"{pool_name}-health", daemon=True)
+        self._checker.start()
+
+    def _connect(self):
+        return _Slot(mysql.connector.connect(**self.connect_kwargs))
+
+    def _expired(self, slot, now):
+        return self.recycle and now - slot.created_at > self.recycle
+
+    def _discard(self, slot):
+        try: slot.conn.close()
+        except: pass
+
+    def get_connection(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        slot = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    slot = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['exhausted'] += 1
+                    raise PoolExhausted(msg=f"Pool '{self.name}' exhausted ({self.size} connections in use, waited {self.timeout}s)")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        if slot is None:
+            try:
+                slot = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        waited_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self._metrics['checkouts'] += 1
+            self._metrics['wait_ms_total'] += waited_ms
+            self._metrics['wait_ms_max'] = max(self._metrics['wait_ms_max'], waited_ms)
+        return PooledConnection(self, slot)
+
+    def _release(self, slot):
+        # Reset session state before reuse; a failure here means the connection is dead
+        healthy = True
+        try:
+            slot.conn.reset_session()
+        except Exception:
+            healthy = False
+
+        now = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not self._expired(slot, now):
+                slot.last_used = now
+                self._idle.append(slot)
+                slot = None
+            else:
+                self._open -= 1
+                self._metrics['evicted'] += 1
+            self._cond.notify()
+
+        if slot is not None:
+            self._discard(slot)
+
+    def _health_loop(self):
+        while not self._stop.wait(self.ping_interval):
+            try:
+                self.check_idle()
+            except Exception as e:
+                logger.error(f"Pool '{self.name}' health check failed: {e}")
+
+    def check_idle(self):
+        """Pre-ping idle connections that sat unused for a full interval and evict dead/expired ones."""
+        now = time.monotonic()
+        with self._cond:
+            stale = [s for s in self._idle if now - s.last_used >= self.ping_interval or self._expired(s, now)]
+            for s in stale:
+                self._idle.remove(s)
+            # Checked-out slots are counted as in use while we ping them
+            self._in_use += len(stale)
+
+        alive, dead = [], []
+        for slot in stale:
+            try:
+                if self._expired(slot, now):
+                    raise errors.InterfaceError(msg="recycled")
+                slot.conn.ping(reconnect=False)
+                alive.append(slot)
+            except Exception:
+                dead.append(slot)
+
+        with self._cond:
+            self._in_use -= len(stale)
+            # Pinged connections go to the cold end so warm ones are reused first
+            self._idle.extendleft(alive)
+            self._open -= len(dead)
+            self._metrics['evicted'] += len(dead)
+            self._cond.notify_all()
+
+        for slot in dead:
+            self._discard(slot)
+        if dead:
+            logger.warning(f"Pool '{self.name}' evicted {len(dead)} dead/expired connection(s).")
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._metrics['checkouts']
+            return {
+                'name': self.name,
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': checkouts,
+                'exhausted': self._metrics['exhausted'],
+                'evicted': self._metrics['evicted'],
+                'wait_ms_avg': round(self._metrics['wait_ms_total'] / checkouts, 3) if checkouts else 0.0,
+                'wait_ms_max': round(self._metrics['wait_ms_max'], 3),
+            }
+
+    def close(self):
+        self._stop.set()
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for slot in idle:
+            self._discard(slot)
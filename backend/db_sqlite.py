@@ -3,6 +3,10 @@ import sqlite3
 import logging
 import os
 import re
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 
 # Configure Logging
 logging.basicConfig(
@@ -11,9 +15,155 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SQLiteManager")
 
+# Group commit: the writer keeps collecting queued writes for up to this many
+# milliseconds (or MAX_BATCH writes) and commits them in one transaction.
+GROUP_COMMIT_MS = float(os.getenv('DB_SQLITE_GROUP_MS', 3))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv('DB_SQLITE_GROUP_MAX', 256))
+BUSY_TIMEOUT_MS = 5000
+# Seconds a request thread waits for its write before giving up. A write that
+# times out may still be committed later by the writer.
+WRITE_TIMEOUT = float(os.getenv('DB_SQLITE_WRITE_TIMEOUT', 30))
+# Seconds between attempts to reopen the write connection after a failure
+RECONNECT_DELAY = 1
+
+class SQLiteWriter:
+    """
+    Single thread that owns the only write connection. Request threads enqueue
+    writes and block on a Future; the writer commits whatever is queued as one
+    transaction, with a SAVEPOINT per write so one failing statement does not
+    roll back its neighbours. Readers use their own WAL connections.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {'writes': 0, 'batches': 0, 'failed': 0, 'max_batch': 0}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, kind, payload):
+        """kind: 'stmt' (sql, params), 'tx' [(sql, params)...] or 'script' sql."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((kind, payload, future))
+        return future
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + GROUP_COMMIT_MS / 1000
+        while len(batch) < GROUP_COMMIT_MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _fail(self, batch, error):
+        # Waiting request threads get the error instead of blocking forever
+        for _, _, future in batch:
+            if not future.done():
+                self.stats['failed'] += 1
+                future.set_exception(error)
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = self._next_batch()
+            try:
+                if conn is None:
+                    conn = self._connect()
+                group = []
+                for item in batch:
+                    if item[0] == 'script':
+                        # executescript() commits on its own: run it between groups
+                        self._commit_group(conn, group)
+                        group = []
+                        self._run_script(conn, item)
+                    else:
+                        group.append(item)
+                self._commit_group(conn, group)
+            except Exception as e:
+                # Could not open the connection, or it broke: fail what is left
+                # of the batch and reconnect for the next one
+                logger.error(f"SQLite writer failed, reconnecting: {e}")
+                self._fail(batch, e)
+                if conn is not None:
+                    try: conn.close()
+                    except sqlite3.Error: pass
+                conn = None
+                time.sleep(RECONNECT_DELAY)
+
+    def _run_script(self, conn, item):
+        _, sql, future = item
+        try:
+            conn.executescript(sql)
+            future.set_result({"last_id": None, "affected": -1})
+        except Exception as e:
+            self.stats['failed'] += 1
+            future.set_exception(e)
+
+    def _commit_group(self, conn, group):
+        if not group:
+            return
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for kind, payload, future in group:
+                statements = [payload] if kind == 'stmt' else payload
+                conn.execute("SAVEPOINT write_item")
+                try:
+                    cursor = None
+                    for sql, params in statements:
+                        cursor = conn.execute(sql, params or ())
+                    conn.execute("RELEASE write_item")
+                    if kind == 'stmt':
+                        results.append((future, {"last_id": cursor.lastrowid, "affected": cursor.rowcount}, None))
+                    else:
+                        results.append((future, True, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_item")
+                    conn.execute("RELEASE write_item")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Commit itself failed: nothing in this group is durable
+            try: conn.execute("ROLLBACK")
+            except sqlite3.Error: pass
+            logger.error(f"Group commit of {len(group)} writes failed: {e}")
+            results = [(future, None, e) for _, _, future in group]
+
+        self.stats['batches'] += 1
+        self.stats['writes'] += len(group)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(group))
+        for future, result, error in results:
+            if error is not None:
+                self.stats['failed'] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
 class SQLiteManager:
     _instance = None
     DB_FILE = 'debug_marathon.db'
+    dialect = 'sqlite'
 
     def __new__(cls):
         if cls._instance is None:
@@ -23,18 +173,31 @@ class SQLiteManager:
 
     def _initialize(self):
         """Initialize the SQLite DB"""
-        self.db_path = os.path.join(os.path.dirname(__file__), self.DB_FILE)
+        # DB_SQLITE_PATH: another database file (the test suite uses a temporary one)
+        self.db_path = os.getenv('DB_SQLITE_PATH') or os.path.join(os.path.dirname(__file__), self.DB_FILE)
+        self.writer = SQLiteWriter(self.db_path)
         logger.info(f"SQLite Manager initialized. DB Path: {self.db_path}")
 
     def get_connection(self):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
             conn.row_factory = sqlite3.Row  # Access columns by name
             return conn
         except sqlite3.Error as e:
             logger.error(f"Failed to connect to SQLite: {e}")
             return None
 
+    def pool_stats(self):
+        # No pool: every read opens its own connection, writes go through the writer thread
+        writer = dict(self.writer.stats, queued=self.writer._queue.qsize())
+        if writer['batches']:
+            writer['avg_batch'] = round(writer['writes'] / writer['batches'], 2)
+        return {'primary': {'name': self.db_path, 'dialect': self.dialect, 'writer': writer}, 'replicas': []}
+
+    def breaker_status(self):
+        # No circuit breaker in front of a local file (see db_breaker.py)
+        return {'breaker': {'name': 'primary', 'state': 'disabled'}}
+
     def _adapt_query(self, query):
         """
         Adapt MySQL query to SQLite.
@@ -46,7 +209,8 @@ class SQLiteManager:
         # Replace %s with ?
         return query.replace('%s', '?')
 
-    def execute_query(self, query, params=None):
+    def execute_query(self, query, params=None, primary=False, stale_ok=False):
+        # Single file database: `primary` and `stale_ok` are accepted for parity with MySQLManager
         conn = self.get_connection()
         if not conn: return None
         
@@ -62,55 +226,52 @@ class SQLiteManager:
         finally:
             if conn: conn.close()
 
-    def execute_update(self, query, params=None, is_script=False):
+    def stream_query(self, query, params=None, batch_size=500):
+        """Yield result rows one at a time by iterating the cursor (constant memory)."""
         conn = self.get_connection()
-        if not conn: return False
+        if not conn: return
         
         cursor = conn.cursor()
         try:
-            if 'ON DUPLICATE KEY UPDATE' in query:
-                # We cannot automatically convert this reliably.
-                # Caller should have used .upsert() or provided compatible SQL.
-                # However, for 'setup_db' we might just let it fail if not handled?
-                # Actually, our code uses it heavily.
-                # We will attempt a crude regex fix if possible, OR log critical warning.
-                 logger.warning("ON DUPLICATE KEY UPDATE detected in SQLite adapter. This may fail unless query is manually adapted.")
-            
-            adapted_query = self._adapt_query(query)
-            
-            if is_script:
-                cursor.executescript(adapted_query)
-                affected = -1
-            else:
-                cursor.execute(adapted_query, params or ())
-                affected = cursor.rowcount
-                
-            conn.commit()
-            last_id = cursor.lastrowid
-            return {"last_id": last_id, "affected": affected}
+            cursor.execute(self._adapt_query(query), params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows: break
+                for row in rows:
+                    yield dict(row)
         except sqlite3.Error as e:
-            # logger.error(f"UPDATE Query failed (SQLite): {e}\nQuery: {query}")
-            # Raise so we can catch it
-            raise e
+            logger.error(f"Streaming Query failed (SQLite): {e}\nQuery: {query}")
         finally:
             if conn: conn.close()
 
-    def execute_transaction(self, queries_list):
-        conn = self.get_connection()
-        if not conn: return False
+    def execute_update(self, query, params=None, is_script=False, defer=False):
+        # `defer` is accepted for parity with MySQLManager: a local file is never unreachable
+        if 'ON DUPLICATE KEY UPDATE' in query:
+            # We cannot automatically convert this reliably.
+            # Caller should have used .upsert() or provided compatible SQL.
+            # However, for 'setup_db' we might just let it fail if not handled?
+            # Actually, our code uses it heavily.
+            # We will attempt a crude regex fix if possible, OR log critical warning.
+             logger.warning("ON DUPLICATE KEY UPDATE detected in SQLite adapter. This may fail unless query is manually adapted.")
         
-        cursor = conn.cursor()
+        adapted_query = self._adapt_query(query)
+        
+        # Single writer thread: no 'database is locked' between request threads.
+        # Blocks until the group containing this write is committed.
+        if is_script:
+            future = self.writer.submit('script', adapted_query)
+        else:
+            future = self.writer.submit('stmt', (adapted_query, params))
+        # Raise so we can catch it
+        return future.result(timeout=WRITE_TIMEOUT)
+
+    def execute_transaction(self, queries_list):
+        statements = [(self._adapt_query(query), params) for query, params in queries_list]
         try:
-            for query, params in queries_list:
-                cursor.execute(self._adapt_query(query), params or ())
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            conn.rollback()
+            return self.writer.submit('tx', statements).result(timeout=WRITE_TIMEOUT)
+        except (sqlite3.Error, FutureTimeout) as e:
             logger.error(f"Transaction failed: {e}")
             return False
-        finally:
-            if conn: conn.close()
 
     def init_database(self, schema_file):
         # Override to use sqlite_schema.sql if provided, or caller handles it
@@ -136,6 +297,11 @@ class SQLiteManager:
         :param data: Dictionary of col:val
         :param conflict_keys: List of columns that form the unique key
         """
+        sql, vals = self.upsert_sql(table, data, conflict_keys)
+        return self.execute_update(sql, vals)
+
+    def upsert_sql(self, table, data, conflict_keys):
+        """(sql, params) for upsert(), shared with the async manager."""
         keys = list(data.keys())
         placeholders = ', '.join(['?'] * len(keys))
         columns = ', '.join(keys)
@@ -158,7 +324,6 @@ class SQLiteManager:
                 ON CONFLICT({conflict_target}) DO UPDATE SET {update_set}
             """
         
-        vals = tuple(data.values())
-        return self.execute_update(sql, vals)
+        return sql, tuple(data.values())
 
 sqlite_manager = SQLiteManager()
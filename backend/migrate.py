@@ -0,0 +1,252 @@
+
+# migrate.py
+# Versioned schema migrations for both MySQL and SQLite.
+#
+# Every migration has a version number and a list of idempotent steps. Applied
+# versions are recorded in `schema_migrations`, so running this script again only
+# applies what is missing. Add new schema changes here instead of ad hoc ALTERs.
+#
+# Usage:
+#   python migrate.py            -> apply pending migrations
+#   python migrate.py --status   -> list applied / pending versions
+
+import sys
+import logging
+from db_connection import db_manager
+
+logger = logging.getLogger("Migrations")
+
+# --- STEP HELPERS ---
+
+def _column_exists(table, column):
+    if db_manager.dialect == 'sqlite':
+        rows = db_manager.execute_query(f"PRAGMA table_info({table})") or []
+        return any(r['name'] == column for r in rows)
+    rows = db_manager.execute_query(
+        "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s",
+        (table, column)
+    )
+    return bool(rows)
+
+def _index_exists(table, index_name):
+    if db_manager.dialect == 'sqlite':
+        rows = db_manager.execute_query(f"PRAGMA index_list({table})") or []
+        return any(r['name'] == index_name for r in rows)
+    rows = db_manager.execute_query(
+        "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND INDEX_NAME=%s LIMIT 1",
+        (table, index_name)
+    )
+    return bool(rows)
+
+def _run(sql, params=None):
+    # MySQLManager swallows errors and returns False, SQLiteManager raises.
+    res = db_manager.execute_update(sql, params)
+    if not res:
+        raise RuntimeError(f"Migration statement failed: {sql}")
+    return res
+
+def add_column(table, column, mysql_def, sqlite_def=None):
+    def step():
+        if _column_exists(table, column):
+            return
+        col_def = mysql_def if db_manager.dialect == 'mysql' else (sqlite_def or mysql_def)
+        _run(f"ALTER TABLE {table} ADD COLUMN {column} {col_def}")
+    step.__doc__ = f"add column {table}.{column}"
+    return step
+
+def modify_column(table, column, mysql_def):
+    # SQLite columns are loosely typed, only MySQL needs the widening.
+    def step():
+        if db_manager.dialect != 'mysql':
+            return
+        _run(f"ALTER TABLE {table} MODIFY {column} {mysql_def}")
+    step.__doc__ = f"modify column {table}.{column}"
+    return step
+
+def create_index(table, index_name, columns, unique=False):
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    def step():
+        if _index_exists(table, index_name):
+            return
+        _run(f"CREATE {kind} {index_name} ON {table} ({', '.join(columns)})")
+    step.__doc__ = f"create {kind.lower()} {index_name} on {table}({', '.join(columns)})"
+    return step
+
+def create_table(table, mysql_sql, sqlite_sql):
+    def step():
+        _run(mysql_sql if db_manager.dialect == 'mysql' else sqlite_sql)
+    step.__doc__ = f"create table {table}"
+    return step
+
+def backfill_leaderboard():
+    def step():
+        from utils.standings import rebuild_leaderboard
+        for row in db_manager.execute_query("SELECT contest_id FROM contests") or []:
+            rebuild_leaderboard(row['contest_id'], recalc_levels=False)
+    step.__doc__ = "backfill leaderboard rows from participant_level_stats"
+    return step
+
+# --- TABLE DEFINITIONS (same as database_setup.sql / sqlite_schema.sql) ---
+
+SNAPSHOTS_TABLE_MYSQL = """
+CREATE TABLE IF NOT EXISTS `leaderboard_snapshots` (
+  `snapshot_id` INT(11) NOT NULL AUTO_INCREMENT,
+  `contest_id` INT(11) NOT NULL,
+  `level` INT(11) NOT NULL,
+  `version` INT(11) NOT NULL,
+  `reason` VARCHAR(50) DEFAULT NULL,
+  `row_count` INT(11) DEFAULT 0,
+  `checksum` CHAR(40) NOT NULL,
+  `payload` LONGBLOB NOT NULL,
+  `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (`snapshot_id`),
+  UNIQUE KEY `idx_snap_version` (`contest_id`, `level`, `version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+SNAPSHOTS_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS leaderboard_snapshots (
+  snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  contest_id INTEGER NOT NULL,
+  level INTEGER NOT NULL,
+  version INTEGER NOT NULL,
+  reason TEXT,
+  row_count INTEGER DEFAULT 0,
+  checksum TEXT NOT NULL,
+  payload BLOB NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE(contest_id, level, version)
+)
+"""
+
+HISTORY_TABLE_MYSQL = """
+CREATE TABLE IF NOT EXISTS `leaderboard_history` (
+  `event_id` BIGINT NOT NULL AUTO_INCREMENT,
+  `contest_id` INT(11) NOT NULL,
+  `level` INT(11) NOT NULL,
+  `recorded_at` BIGINT NOT NULL,
+  `kind` CHAR(1) NOT NULL,
+  `payload` MEDIUMTEXT NOT NULL,
+
+  PRIMARY KEY (`event_id`),
+  KEY `idx_hist_time` (`contest_id`, `level`, `recorded_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+HISTORY_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS leaderboard_history (
+  event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  contest_id INTEGER NOT NULL,
+  level INTEGER NOT NULL,
+  recorded_at INTEGER NOT NULL,
+  kind TEXT NOT NULL,
+  payload TEXT NOT NULL
+)
+"""
+
+# --- MIGRATIONS ---
+# (version, description, [steps]). Never edit an applied migration, append a new one.
+
+MIGRATIONS = [
+    (1, "Language restriction per round", [
+        add_column('rounds', 'allowed_language', "VARCHAR(50) DEFAULT 'python'", "TEXT DEFAULT 'python'"),
+    ]),
+    (2, "Wider participant profile columns and phone", [
+        modify_column('users', 'full_name', "VARCHAR(255) DEFAULT NULL"),
+        modify_column('users', 'department', "VARCHAR(255) DEFAULT NULL"),
+        modify_column('users', 'college', "VARCHAR(255) DEFAULT NULL"),
+        modify_column('users', 'email', "VARCHAR(255) NOT NULL"),
+        add_column('users', 'phone', "VARCHAR(50) DEFAULT NULL", "TEXT"),
+    ]),
+    (3, "Hot-path indexes for submissions, violations, level stats and rounds", [
+        create_index('submissions', 'idx_sub_user_question', ['user_id', 'question_id', 'is_correct']),
+        create_index('submissions', 'idx_sub_contest_correct', ['contest_id', 'is_correct']),
+        create_index('violations', 'idx_v_contest', ['contest_id']),
+        create_index('participant_level_stats', 'idx_pls_contest_level_score', ['contest_id', 'level', 'level_score']),
+        create_index('rounds', 'idx_rounds_contest_status', ['contest_id', 'status', 'round_number']),
+    ]),
+    (4, "Submission journal id for idempotent journal replay", [
+        add_column('submissions', 'journal_id', "VARCHAR(36) DEFAULT NULL", "TEXT"),
+        create_index('submissions', 'idx_sub_journal', ['journal_id'], unique=True),
+    ]),
+    (5, "Maintained contest leaderboard with rank key", [
+        add_column('leaderboard', 'levels_completed', "INT(11) DEFAULT 0", "INTEGER DEFAULT 0"),
+        add_column('leaderboard', 'rank_key', "BIGINT DEFAULT NULL", "INTEGER"),
+        create_index('leaderboard', 'idx_lb_rank',
+                     ['contest_id', 'rank_key', 'user_id', 'total_score', 'questions_correct', 'total_time_taken_seconds']),
+        backfill_leaderboard(),
+    ]),
+    (6, "Frozen leaderboard snapshots per finalized level", [
+        create_table('leaderboard_snapshots', SNAPSHOTS_TABLE_MYSQL, SNAPSHOTS_TABLE_SQLITE),
+    ]),
+    (7, "Append-only leaderboard history (keyframes + deltas)", [
+        create_table('leaderboard_history', HISTORY_TABLE_MYSQL, HISTORY_TABLE_SQLITE),
+        create_index('leaderboard_history', 'idx_hist_time', ['contest_id', 'level', 'recorded_at']),
+    ]),
+    (8, "Recording process of each leaderboard history row", [
+        add_column('leaderboard_history', 'source', "VARCHAR(16) DEFAULT NULL", "TEXT"),
+    ]),
+]
+
+# --- RUNNER ---
+
+def _ensure_version_table():
+    if db_manager.dialect == 'sqlite':
+        sql = """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+    else:
+        sql = """
+            CREATE TABLE IF NOT EXISTS `schema_migrations` (
+                `version` INT(11) NOT NULL PRIMARY KEY,
+                `description` VARCHAR(255) DEFAULT NULL,
+                `applied_at` DATETIME DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """
+    _run(sql)
+
+def applied_versions():
+    _ensure_version_table()
+    rows = db_manager.execute_query("SELECT version FROM schema_migrations") or []
+    return {r['version'] for r in rows}
+
+def current_version():
+    applied = applied_versions()
+    return max(applied) if applied else 0
+
+def run_migrations():
+    """Apply every pending migration in order. Returns the list of applied versions."""
+    done = applied_versions()
+    newly_applied = []
+    for version, description, steps in MIGRATIONS:
+        if version in done:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        for step in steps:
+            logger.info(f"  - {step.__doc__}")
+            step()
+        _run("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)", (version, description))
+        newly_applied.append(version)
+
+    if not newly_applied:
+        logger.info(f"Schema is up to date (version {current_version()}).")
+    return newly_applied
+
+def print_status():
+    done = applied_versions()
+    print(f"Database Manager: {db_manager.__class__.__name__} ({db_manager.dialect})")
+    for version, description, _ in MIGRATIONS:
+        state = "applied" if version in done else "PENDING"
+        print(f"  [{state:>7}] {version:03d} {description}")
+
+if __name__ == "__main__":
+    if '--status' in sys.argv:
+        print_status()
+    else:
+        applied = run_migrations()
+        print(f"Applied migrations: {applied or 'none'}")
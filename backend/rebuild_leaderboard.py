@@ -0,0 +1,51 @@
+
+# rebuild_leaderboard.py
+# Reconcile the `leaderboard` table from `submissions`. The app keeps it current
+# on every submission; run this after manual data fixes, imports or restores.
+#
+# Usage:
+#   python rebuild_leaderboard.py                  -> every contest
+#   python rebuild_leaderboard.py --contest 1      -> one contest
+#   python rebuild_leaderboard.py --no-recalc      -> keep participant_level_stats scores as they are
+#   python rebuild_leaderboard.py --check          -> only report per-level counters that drifted from submissions
+
+import sys
+from db_connection import db_manager
+from migrate import run_migrations
+from utils.standings import rebuild_leaderboard, ranked_rows, find_level_stats_drift
+
+if __name__ == "__main__":
+    print("-" * 50)
+    print(f"LEADERBOARD REBUILD ({db_manager.dialect})")
+    print("-" * 50)
+
+    # rank_key column and index come from migration 005
+    run_migrations()
+
+    if '--contest' in sys.argv:
+        contest_ids = [int(sys.argv[sys.argv.index('--contest') + 1])]
+    else:
+        contest_ids = [r['contest_id'] for r in db_manager.execute_query("SELECT contest_id FROM contests ORDER BY contest_id") or []]
+    recalc = '--no-recalc' not in sys.argv
+
+    if '--check' in sys.argv:
+        total = 0
+        for contest_id in contest_ids:
+            drifted = find_level_stats_drift(contest_id)
+            total += len(drifted)
+            print(f"Contest {contest_id}: {len(drifted)} drifted level row(s)")
+            for r in drifted:
+                print(f"  user={r['user_id']} level={r['level']} solved {r['questions_solved']} (expected {r['expected_solved']}) "
+                      f"score {r['level_score']} (expected {r['expected_score']})")
+        sys.exit(1 if total else 0)
+
+    for contest_id in contest_ids:
+        try:
+            count = rebuild_leaderboard(contest_id, recalc_levels=recalc)
+        except RuntimeError as e:
+            print(f"Contest {contest_id}: FAILED ({e})")
+            sys.exit(1)
+        print(f"Contest {contest_id}: {count} leaderboard row(s)")
+        for idx, row in enumerate(ranked_rows(contest_id, limit=5)):
+            print(f"  {idx + 1}. {row['username']:<12} score={float(row['total_score'] or 0):<8} solved={row['questions_correct']} time={row['total_time_taken_seconds']}s")
+    print("Done.")
@@ -0,0 +1,52 @@
+
+# replay_submissions.py
+# Push submissions that are still only in the local submission journal into the
+# database, without starting the web server. The app does the same on startup.
+#
+# Usage:
+#   python replay_submissions.py            -> insert pending submissions, then exit
+#   python replay_submissions.py --status   -> list pending submissions only
+#   python replay_submissions.py --dead     -> list dead-lettered submissions (never inserted)
+
+import sys
+from db_connection import db_manager
+from migrate import run_migrations
+from utils.submission_journal import submission_journal
+
+def print_pending(entries):
+    for e in entries:
+        r = e['row']
+        print(f"  {e['journal_id']}  user={r['user_id']} question={r['question_id']} correct={r['is_correct']} at={r['submission_timestamp']}")
+
+if __name__ == "__main__":
+    print("-" * 50)
+    print(f"SUBMISSION JOURNAL REPLAY ({db_manager.dialect})")
+    print(f"Journal: {submission_journal.path}")
+    print("-" * 50)
+
+    if '--dead' in sys.argv:
+        dead = submission_journal.dead_letters()
+        print(f"Dead-lettered submissions ({submission_journal.dead_letter_path}): {len(dead)}")
+        for e in dead:
+            print_pending([e])
+            print(f"      error: {e['error']}")
+        sys.exit(0)
+
+    if '--status' in sys.argv:
+        pending = submission_journal._load_unacked()
+        print(f"Pending submissions: {len(pending)}")
+        print_pending(pending)
+        sys.exit(0)
+
+    # journal_id column (migration 004) is required for idempotent replay
+    run_migrations()
+    submission_journal.start()
+    pending = submission_journal.pending()
+    print(f"Pending submissions: {len(pending)}")
+    print_pending(pending)
+
+    if submission_journal.drain(timeout=60):
+        print(f"Done. {submission_journal.snapshot_stats()['persisted']} submission(s) persisted.")
+        sys.exit(0)
+    print(f"Timed out, still pending: {len(submission_journal.pending())}. Last error: {submission_journal.stats['last_error']}")
+    sys.exit(1)
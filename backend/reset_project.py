@@ -9,18 +9,16 @@ import hashlib
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from db_connection import db_manager
+from migrate import run_migrations
 
 def reset_database():
     print(">>> STARTING PROJECT RESET <<<")
     report = []
 
-    # 0. UPDATE SCHEMA (Ensure allowed_language exists)
+    # 0. UPDATE SCHEMA (Versioned migrations, see migrate.py)
     print("... Updating Schema ...")
-    try:
-        db_manager.execute_update("ALTER TABLE rounds ADD COLUMN allowed_language VARCHAR(50) DEFAULT 'python'")
-    except Exception as e:
-        # Ignore if exists (Duplicate column name)
-        pass
+    applied = run_migrations()
+    report.append(f"Schema Migrations Applied: {applied or 'none'}")
 
     # 1. CLEANUP DATA
     print("... Cleaning Tables ...")
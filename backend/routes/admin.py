@@ -4,6 +4,10 @@ import uuid
 from auth_middleware import admin_required
 from werkzeug.security import generate_password_hash
 from utils.contest_service import create_question_logic
+from utils.cache import invalidate_user, invalidate_question_counts, resolve_user_id
+from utils.leaderboard import leaderboard_engine
+from utils.counters import level_counters
+from utils.versions import bump_user, bump_contests
 
 bp = Blueprint('admin', __name__)
 
@@ -33,7 +37,8 @@ def get_stats():
 def get_participants():
     # Fetch participants with detailed info
     query = """
-        SELECT u.user_id, u.username, u.full_name, u.email, u.phone, u.college, u.department, u.status, COALESCE(SUM(s.score_awarded), 0) as score
+        SELECT u.user_id, u.username, u.full_name, u.email, u.phone, u.college, u.department, u.status, COALESCE(SUM(s.score_awarded), 0) as score,
+               (SELECT COALESCE(SUM(pls.run_count), 0) FROM participant_level_stats pls WHERE pls.user_id = u.user_id) as run_count
         FROM users u
         LEFT JOIN submissions s ON u.user_id = s.user_id
         WHERE u.role = 'participant'
@@ -41,6 +46,8 @@ def get_participants():
         ORDER BY score DESC
     """
     res = db_manager.execute_query(query)
+    # Include increments not yet flushed by the write-behind counters
+    unflushed = level_counters.pending_by('user_id')
     
     participants = []
     if res:
@@ -54,7 +61,8 @@ def get_participants():
                 'college': r.get('college'),
                 'department': r.get('department'),
                 'status': r['status'],
-                'score': float(r['score'])
+                'score': float(r['score']),
+                'run_count': int(r['run_count'] or 0) + unflushed.get(r['user_id'], {}).get('run_count', 0)
             })
         
     return jsonify({'participants': participants})
@@ -131,6 +139,12 @@ def create_participant():
                     update_q = f"UPDATE users SET {', '.join(update_cols)} WHERE username=%s"
                     update_vals.append(username)
                     db_manager.execute_update(update_q, tuple(update_vals))
+                    invalidate_user(username)
+                    # Names/colleges show on the boards and in the participant's own responses.
+                    # invalidate() only bumps boards that were loaded: 'contests' is in every board's ETag
+                    leaderboard_engine.invalidate()
+                    bump_user(chk[0]['user_id'])
+                    bump_contests()
                     return jsonify({'success': True, 'participant': new_user, 'status': 'updated'})
                 else:
                     return jsonify({'success': True, 'participant': new_user, 'status': 'no_changes'})
@@ -171,7 +185,13 @@ def create_participant():
 @admin_required
 def delete_participant(pid):
     # pid is username key in frontend 
+    uid = resolve_user_id(pid)
     db_manager.execute_update("DELETE FROM users WHERE username=%s", (pid,))
+    invalidate_user(pid, uid)
+    # Their stats rows are gone with the user: reload the boards
+    leaderboard_engine.invalidate()
+    bump_user(uid)
+    bump_contests()
     return jsonify({'success': True})
 
 
@@ -314,6 +334,8 @@ def update_question(qid):
     query = f"UPDATE questions SET {', '.join(fields)} WHERE question_id=%s"
     try:
         db_manager.execute_update(query, tuple(params))
+        # round_id may have moved it to another level
+        invalidate_question_counts()
         return jsonify({'success': True, 'message': 'Question updated successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -322,6 +344,7 @@ def update_question(qid):
 @admin_required
 def delete_question(qid):
     db_manager.execute_update("DELETE FROM questions WHERE question_id=%s", (qid,))
+    invalidate_question_counts()
     return jsonify({'success': True})
 
 
@@ -401,5 +424,8 @@ def create_leader():
 @bp.route('/leaders/<lid>', methods=['DELETE'])
 @admin_required
 def delete_leader(lid):
+    uid = resolve_user_id(lid)
     db_manager.execute_update("DELETE FROM users WHERE username=%s AND role='leader'", (lid,))
+    invalidate_user(lid, uid)
+    bump_user(uid)
     return jsonify({'success': True})
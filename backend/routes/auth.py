@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from db_connection import db_manager
 from auth_middleware import admin_required
+from utils.cache import get_live_contest_id, get_active_level, remember_user_id
 import jwt
 import datetime
 from config import Config
@@ -9,13 +10,16 @@ import uuid
 
 bp = Blueprint('auth', __name__)
 
-def create_token(user_id, role='participant'):
+def create_token(user_id, role='participant', uid=None):
     payload = {
         'sub': user_id,
         'role': role,
         'iat': datetime.datetime.utcnow(),
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
     }
+    # Numeric users.user_id, lets protected endpoints skip the username lookup
+    if uid is not None:
+        payload['uid'] = uid
     return jwt.encode(payload, Config.SECRET_KEY, algorithm='HS256')
 
 @bp.route('/participant/login', methods=['POST'])
@@ -52,19 +56,15 @@ def participant_login():
         if user.get('status') == 'held':
             return jsonify({'error': 'Your status is currently on hold. You have not qualified for the next level.'}), 403
 
-        token = create_token(user['username'], 'participant')
+        token = create_token(user['username'], 'participant', uid=user['user_id'])
+        remember_user_id(user['username'], user['user_id'])
         
         # --- PROCTORING INIT ---
         try:
             # Strict Qualification Check
             # 1. Get Global Active Level
-            c_query = "SELECT contest_id FROM contests WHERE status='live' LIMIT 1"
-            c_res = db_manager.execute_query(c_query)
-            active_contest_id = c_res[0]['contest_id'] if c_res else 1
-            
-            gl_query = "SELECT round_number FROM rounds WHERE contest_id=%s AND status='active' ORDER BY round_number ASC LIMIT 1"
-            gl_res = db_manager.execute_query(gl_query, (active_contest_id,))
-            global_active_level = gl_res[0]['round_number'] if gl_res else 1
+            active_contest_id = get_live_contest_id() or 1
+            global_active_level = get_active_level(active_contest_id) or 1
             
             # 2. If Global Level > 1, User MUST be in shortlisted_participants with is_allowed=1
             if global_active_level > 1:
@@ -7,13 +7,24 @@ import traceback
 from db_connection import db_manager
 from auth_middleware import admin_required
 from utils.logic import execute_code_internal
-from utils.contest_service import activate_level_logic, complete_level_logic, advance_level_logic
+from utils.contest_service import activate_level_logic, complete_level_logic, advance_level_logic, participant_state_logic
+from utils.counters import level_counters
+from utils.submission_journal import submission_journal
+from utils.leaderboard import leaderboard_engine
+from utils.standings import leaderboard_upsert_sql, level_stats_increment_sql, refresh_leaderboard
+from utils.versions import conditional, bump_contests, bump_user, bump_standings
+from utils.snapshots import freeze_level
+from utils.cache import (
+    get_live_contest_id, get_round, get_rounds, get_active_level, get_admin_state,
+    invalidate_contests, invalidate_rounds, invalidate_admin_state, resolve_user_id
+)
 
 bp = Blueprint('contest', __name__)
 
 # === Contest Management (Admin) ===
 
 @bp.route('/', methods=['GET'])
+@conditional(lambda: [('contests',)])
 def get_contests():
     query = "SELECT contest_id as id, contest_name as title, description, start_datetime, end_datetime, status, max_violations_allowed FROM contests ORDER BY start_datetime DESC"
     res = db_manager.execute_query(query)
@@ -46,6 +57,7 @@ def create_contest():
     )
     try:
         res = db_manager.execute_update(query, params)
+        invalidate_contests()
         return jsonify({'success': True, 'message': "Contest Created"}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -88,6 +100,7 @@ def update_contest(contest_id):
     params.append(contest_id)
     query = f"UPDATE contests SET {', '.join(fields)} WHERE contest_id=%s"
     db_manager.execute_update(query, tuple(params))
+    invalidate_contests()
     
     from extensions import socketio
     socketio.emit('contest:updated', {'contest_id': contest_id, 'data': data})
@@ -115,6 +128,7 @@ def manage_countdown(contest_id):
                 "INSERT INTO admin_state (key_name, value) VALUES (%s, %s) ON DUPLICATE KEY UPDATE value=%s",
                 (key_name, val, val)
             )
+            invalidate_admin_state(key_name)
             socketio.emit('contest:countdown', {'contest_id': contest_id, 'active': True, 'end_time': end_time.isoformat(), 'duration': duration, 'target_level': target_level})
             
         elif action == 'stop':
@@ -123,15 +137,16 @@ def manage_countdown(contest_id):
                 "INSERT INTO admin_state (key_name, value) VALUES (%s, %s) ON DUPLICATE KEY UPDATE value=%s",
                 (key_name, val, val)
             )
+            invalidate_admin_state(key_name)
             socketio.emit('contest:countdown', {'contest_id': contest_id, 'active': False})
             
         return jsonify({'success': True})
     else:
         key_name = f"contest_{contest_id}_countdown"
-        res = db_manager.execute_query("SELECT value FROM admin_state WHERE key_name=%s", (key_name,))
-        if res:
+        value = get_admin_state(key_name)
+        if value:
              try:
-                 return jsonify(json.loads(res[0]['value']))
+                 return jsonify(json.loads(value))
              except: pass
         return jsonify({'active': False})
 
@@ -143,6 +158,7 @@ def start_contest(contest_id):
     # Set status to live and update start time
     query = "UPDATE contests SET status='live', start_datetime=NOW() WHERE contest_id=%s"
     db_manager.execute_update(query, (contest_id,))
+    invalidate_contests()
     
     from extensions import socketio
     socketio.emit('contest:started', {
@@ -158,6 +174,7 @@ def start_contest(contest_id):
 def pause_contest(contest_id):
     query = "UPDATE contests SET status='paused' WHERE contest_id=%s"
     db_manager.execute_update(query, (contest_id,))
+    invalidate_contests()
     from extensions import socketio
     socketio.emit('contest:paused', {'contest_id': contest_id})
     socketio.emit('contest:stats_update', {'contest_id': contest_id})
@@ -168,6 +185,7 @@ def pause_contest(contest_id):
 def end_contest(contest_id):
     query = "UPDATE contests SET status='ended', end_datetime=NOW() WHERE contest_id=%s"
     db_manager.execute_update(query, (contest_id,))
+    invalidate_contests()
     from extensions import socketio
     socketio.emit('contest:ended', {'contest_id': contest_id})
     socketio.emit('contest:stats_update', {'contest_id': contest_id})
@@ -194,6 +212,7 @@ def activate_level_admin(contest_id, level_number):
         else:
             # Set target to active
             db_manager.execute_update("UPDATE rounds SET status='active' WHERE contest_id=%s AND round_number=%s", (contest_id, level_number))
+        invalidate_rounds(contest_id)
         
         from extensions import socketio
         socketio.emit('level:activated', {'contest_id': contest_id, 'level': level_number})
@@ -209,6 +228,7 @@ def activate_level_admin(contest_id, level_number):
 @admin_required
 def pause_level_admin(contest_id, level_number):
     db_manager.execute_update("UPDATE rounds SET status='paused' WHERE contest_id=%s AND round_number=%s", (contest_id, level_number))
+    invalidate_rounds(contest_id)
     from extensions import socketio
     socketio.emit('level:paused', {'contest_id': contest_id, 'level': level_number})
     # Also broadcast generic contest update
@@ -218,13 +238,14 @@ def pause_level_admin(contest_id, level_number):
 @bp.route('/<contest_id>/level/<int:level_number>/complete', methods=['POST'])
 @admin_required
 def complete_level_admin(contest_id, level_number):
-    # Set to completed
-    db_manager.execute_update("UPDATE rounds SET status='completed' WHERE contest_id=%s AND round_number=%s", (contest_id, level_number))
+    # Set to completed and freeze the level's standings (utils/snapshots.py)
+    result = complete_level_logic(contest_id, level_number)
     
     from extensions import socketio
     socketio.emit('level:completed', {'contest_id': contest_id, 'level': level_number})
+    socketio.emit('contest:updated', {'contest_id': contest_id})
     
-    return jsonify({'success': True})
+    return jsonify({'success': True, 'snapshot_version': result['snapshot_version']})
 
 @bp.route('/<contest_id>/rounds/<int:round_number>', methods=['PUT'])
 @admin_required
@@ -255,6 +276,7 @@ def update_round(contest_id, round_number):
                  (q['number'], q['id'])
              )
 
+    invalidate_rounds(contest_id)
     return jsonify({'success': True})
 
 
@@ -286,20 +308,15 @@ def get_questions():
 
     # Robustness: If contest_id is missing, find the LIVE one
     if not contest_id or contest_id == 'null' or contest_id == 'undefined':
-        l_res = db_manager.execute_query("SELECT contest_id FROM contests WHERE status='live' LIMIT 1")
-        if l_res:
-            contest_id = l_res[0]['contest_id']
-        else:
-            # Fallback to id=1
-            contest_id = 1
+        # Fallback to id=1
+        contest_id = get_live_contest_id() or 1
 
     # 1. Fetch Round Config strictly first (for Language)
-    round_query = "SELECT allowed_language, time_limit_minutes FROM rounds WHERE contest_id=%s AND round_number=%s"
-    r_res = db_manager.execute_query(round_query, (contest_id, level))
+    round_cfg = get_round(contest_id, level)
     
     allowed_lang = 'python' # Global Default
-    if r_res and r_res[0].get('allowed_language'):
-        allowed_lang = r_res[0]['allowed_language']
+    if round_cfg and round_cfg.get('allowed_language'):
+        allowed_lang = round_cfg['allowed_language']
 
     # 2. Fetch Questions
     query = """
@@ -310,11 +327,12 @@ def get_questions():
         ORDER BY q.question_number ASC
     """
     
-    res = db_manager.execute_query(query, (contest_id, level))
+    # Last good copy is served while the database is unreachable
+    res = db_manager.execute_query(query, (contest_id, level), stale_ok=True)
     
     questions = []
     
-    for q in res:
+    for q in res or []:
         # Construct useful object for frontend
         tcs = []
         try:
@@ -416,20 +434,13 @@ def run_code():
         print(f"WARN: No inputs found for QID {question_id}, running with empty input.")
 
     # 2. Track Execution (Run Count)
+    # Write-behind: counted in memory, flushed to participant_level_stats in bulk
     if user_id:
-        uid = user_id
-        if isinstance(user_id, str) and not user_id.isdigit():
-             u_res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (user_id,))
-             if u_res: uid = u_res[0]['user_id']
-        
+        uid = resolve_user_id(user_id)
         try:
-            track_query = """
-                INSERT INTO participant_level_stats (user_id, contest_id, level, run_count)
-                VALUES (%s, %s, %s, 1)
-                ON DUPLICATE KEY UPDATE run_count = run_count + 1
-            """
-            db_manager.execute_update(track_query, (uid, contest_id, level))
-        except: pass
+            if uid:
+                level_counters.incr((uid, int(contest_id), int(level)), 'run_count')
+        except (TypeError, ValueError): pass
 
     # 3. Execute Code (Sandbox Interface)
     test_results = []
@@ -495,15 +506,12 @@ def submit_question():
     if code is None: return jsonify({'error': 'Code missing'}), 400
 
     # User ID Resolution
-    uid = user_id
-    if isinstance(user_id, str) and not user_id.isdigit():
-         u_res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (user_id,))
-         if u_res: uid = u_res[0]['user_id']
-         else: return jsonify({'error': 'User not found'}), 404
+    uid = resolve_user_id(user_id)
+    if not uid: return jsonify({'error': 'User not found'}), 404
 
     # 1. Authoritative Question Lookup (Left Join to be safe)
     query = """
-        SELECT q.question_id, q.round_id, q.test_input, q.expected_output, q.test_cases, q.points, r.allowed_language
+        SELECT q.question_id, q.round_id, q.test_input, q.expected_output, q.test_cases, q.points, r.allowed_language, r.round_number, r.contest_id
         FROM questions q
         LEFT JOIN rounds r ON q.round_id = r.round_id
         WHERE q.question_id = %s
@@ -524,11 +532,21 @@ def submit_question():
         return jsonify({'error': f'Question {question_id} not found in database'}), 404
         
     question = q_res[0]
+    # The journal inserts asynchronously: anything the row's foreign keys would
+    # reject has to be refused here, not after the client was told it succeeded
+    if question.get('contest_id') is None:
+        return jsonify({'error': f'Question {question_id} is not attached to a level'}), 500
+    try:
+        if int(contest_id) != question['contest_id']:
+            return jsonify({'error': f'Question {question_id} does not belong to contest {contest_id}'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid contest_id'}), 400
+    contest_id = question['contest_id']
     
     # 2. Check for Duplicate Submission (Success Only)
     check_query = "SELECT is_correct FROM submissions WHERE user_id=%s AND question_id=%s AND is_correct=1"
     check_res = db_manager.execute_query(check_query, (uid, question['question_id']))
-    if check_res:
+    if check_res or submission_journal.has_pending_correct(uid, question['question_id']):
          return jsonify({'error': 'Already submitted successfully', 'submitted': True}), 400
 
     # 3. Language Handling
@@ -602,53 +620,24 @@ def submit_question():
     warnings = list(set([r['warnings'] for r in test_results if r.get('warnings')]))
     warnings_str = "\n".join(warnings) if warnings else None
 
-    save_query = """
-        INSERT INTO submissions 
-        (user_id, contest_id, round_id, question_id, submitted_code, status, is_correct, test_results, score_awarded, time_taken_seconds)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    
     # Use Authoritative Question Data
     final_round_id = question.get('round_id')
     final_qid = question['question_id']
+    # Level the score counts towards: the question's round, not what the client says
+    final_level = question.get('round_number') or data.get('level', 1)
     
+    # Write-ahead: the judged submission is fsync'd to the local journal before we
+    # answer; the background flusher inserts it into `submissions` (with retries)
+    # and then runs the level stats update below.
     try:
-        insert_res = db_manager.execute_update(save_query, (
-            uid, contest_id, final_round_id, final_qid, code, status, is_correct, json.dumps(test_results), score, execution_duration
-        ))
-        
-        if not insert_res:
-            print(f"SUBMIT DATA LOSS: Insert returned False for UID {uid} QID {final_qid}")
-            # Try to fetch last error from db manager if possible, or just fail hard.
-            return jsonify({'error': 'Database Error: Submission could not be saved. Please retry.'}), 500
-            
+        submission_journal.record({
+            'user_id': uid, 'contest_id': contest_id, 'round_id': final_round_id, 'question_id': final_qid,
+            'submitted_code': code, 'status': status, 'is_correct': is_correct,
+            'test_results': json.dumps(test_results), 'score_awarded': score, 'time_taken_seconds': execution_duration
+        }, meta={'level': final_level, 'username': user_id, 'question_ref': question_id})
     except Exception as e:
         print(f"SUBMIT EXCEPTION: {e}")
         return jsonify({'error': f'Submission Persistence Failed: {str(e)}'}), 500
-
-    # 7. Level Stats Update
-    if all_passed:
-        level = data.get('level', 1)
-        # Update Participant Stats
-        recalc_query = """
-            UPDATE participant_level_stats ps
-            SET 
-                questions_solved = (SELECT COUNT(*) FROM submissions s WHERE s.user_id=ps.user_id AND s.is_correct=1),
-                level_score = (SELECT SUM(score_awarded) FROM submissions s WHERE s.user_id=ps.user_id)
-            WHERE ps.user_id=%s AND ps.contest_id=%s AND ps.level=%s
-        """
-        db_manager.execute_update("INSERT IGNORE INTO participant_level_stats (user_id, contest_id, level) VALUES (%s, %s, %s)", (uid, contest_id, level))
-        db_manager.execute_update(recalc_query, (uid, contest_id, level))
-
-        # Real-time Broadcast
-        from extensions import socketio
-        socketio.emit('admin:stats_update', {'user_id': uid, 'contest_id': contest_id})
-        socketio.emit('participant:submitted', {
-            'participant_id': uid,
-            'name': user_id,
-            'question': f"Q{question_id}",
-            'contest_id': contest_id
-        })
         
     return jsonify({
         'success': all_passed,
@@ -659,6 +648,45 @@ def submit_question():
         'execution_time': f"{execution_duration}s"
     })
 
+def _submission_statements(entry):
+    # 7. Level Stats + Leaderboard Update, committed in the same transaction as
+    # the submission insert (journal write hook)
+    row, meta = entry['row'], entry['meta']
+    if not row['is_correct']:
+        return []
+    uid, contest_id, level = row['user_id'], row['contest_id'], meta.get('level', 1)
+    
+    # Incremental: +1 solved / +score on the (user, contest, level) row, skipped when
+    # the question already had a correct submission (see utils/standings.py).
+    # upsert_sql() with only key columns -> INSERT IGNORE / INSERT OR IGNORE per backend
+    return [
+        db_manager.upsert_sql('participant_level_stats', {'user_id': uid, 'contest_id': contest_id, 'level': level}, ['user_id', 'contest_id', 'level']),
+        level_stats_increment_sql(row, level, entry['journal_id']),
+        leaderboard_upsert_sql(contest_id, uid),
+    ]
+
+def _after_submission_persisted(entry):
+    # Runs on the journal flusher once the transaction above is committed
+    row, meta = entry['row'], entry['meta']
+    if not row['is_correct']:
+        return
+    uid, contest_id, level = row['user_id'], row['contest_id'], meta.get('level', 1)
+    leaderboard_engine.refresh_user(contest_id, level, uid)
+    bump_user(uid)
+
+    # Real-time Broadcast
+    from extensions import socketio
+    socketio.emit('admin:stats_update', {'user_id': uid, 'contest_id': contest_id})
+    socketio.emit('participant:submitted', {
+        'participant_id': uid,
+        'name': meta.get('username'),
+        'question': f"Q{meta.get('question_ref', row['question_id'])}",
+        'contest_id': contest_id
+    })
+
+submission_journal.add_write_hook(_submission_statements)
+submission_journal.add_listener(_after_submission_persisted)
+
 def execute_code_secure(code, language, input_data):
     ext_map = {'python': '.py', 'javascript': '.js'}
     ext = ext_map.get(language, '.txt')
@@ -696,163 +724,28 @@ def execute_code_secure(code, language, input_data):
         if os.path.exists(f_name):
             os.remove(f_name)
 
+def _participant_state_scopes():
+    # Contest-wide state (rounds, countdown, shortlists, release flags) + the user's own rows
+    data = request.get_json(silent=True) or {}
+    uid = resolve_user_id(data.get('user_id'))
+    if not uid:
+        return None
+    return [('contests',), ('user', uid)]
+
 @bp.route('/participant-state', methods=['POST'])
+@conditional(_participant_state_scopes)
 def get_participant_state():
     try:
-        # Persistent State Fetch
+        # Persistent State Fetch (two queries, see check_participant_state.py).
+        # The same state is pushed to the user:<id> / contest:<id> Socket.IO rooms (utils/participant_push.py)
         data = request.get_json()
         user_id = data.get('user_id')
         contest_id = data.get('contest_id', 1)
         
-        uid = user_id
-        if isinstance(user_id, str) and not user_id.isdigit():
-             u_res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (user_id,))
-             if u_res: uid = u_res[0]['user_id']
-             else: return jsonify({'error': 'User not found'}), 404
-             
-        # Fetch latest level
-        query = "SELECT level, violation_count, questions_solved, start_time, status FROM participant_level_stats WHERE user_id=%s AND contest_id=%s ORDER BY level DESC LIMIT 1"
-        res = db_manager.execute_query(query, (uid, contest_id))
-
-        # Fetch ALL Round Statuses (Single Source of Truth)
-        rounds_query = "SELECT round_number, status FROM rounds WHERE contest_id=%s ORDER BY round_number ASC"
-        rounds_res = db_manager.execute_query(rounds_query, (contest_id,))
-        rounds_map = {r['round_number']: r['status'] for r in rounds_res} if rounds_res else {}
-        
-        if rounds_map.get(1) == 'pending' or 1 not in rounds_map:
-             rounds_map[1] = 'active'
+        uid = resolve_user_id(user_id)
+        if not uid: return jsonify({'error': 'User not found'}), 404
 
-        # Fetch Global Active Level
-        gl_query = "SELECT round_number, status FROM rounds WHERE contest_id=%s AND status='active' ORDER BY round_number ASC LIMIT 1"
-        gl_res = db_manager.execute_query(gl_query, (contest_id,))
-        global_active_level = gl_res[0]['round_number'] if gl_res else 1
-        
-        current_state = res[0] if res else None
-        
-        # CLAMP: Ensure user cannot be ahead of the global active round
-        if current_state and current_state['level'] > global_active_level:
-            current_state['level'] = global_active_level
-            # Reset status for this view to avoid confusion
-            current_state['status'] = 'NOT_STARTED' # Force them to 'enter' again if needed
-        
-        # QUALIFICATION CHECK:
-        # If the global active level is > 1, we must verify if the user is in the 'shortlisted_participants' for this level.
-        # This handles the case where a user completed Level X but was not selected for Level X+1.
-        if global_active_level > 1:
-            # Check if user is allowed for this level
-            q_check = "SELECT is_allowed FROM shortlisted_participants WHERE contest_id=%s AND level=%s AND user_id=%s AND is_allowed=1"
-            q_res = db_manager.execute_query(q_check, (contest_id, global_active_level, uid))
-            
-            if not q_res:
-                # User is NOT Shortlisted for this Active Level.
-                # However, we must be careful:
-                # If they are currently playing Level < Global Level, that's fine (maybe they are lagging behind?) 
-                # BUT the user request implies strict "if not select for next level block that id".
-                # Usually, if Level 3 is Active, everyone who passed Level 2 should have been shortlisted OR eliminated.
-                
-                # Check if they have completed the PREVIOUS level
-                prev_completed = False
-                if current_state:
-                     # If they are seemingly on the previous level completed?
-                     if current_state['level'] == global_active_level - 1 and current_state['status'] == 'COMPLETED':
-                         prev_completed = True
-                     # Or if they are on global level but not started yet?
-                     elif current_state['level'] == global_active_level:
-                         prev_completed = True # They reached it somehow?
-                
-                # If they are "at the door" of the global active level but not allowed:
-                is_disqualified_state = True
-                disq_reason = f"Not selected for Level {global_active_level}"
-
-        # RESTORE: Needed for JSON response
-        global_level_data = {'round_number': global_active_level, 'status': 'active'}
-        
-        cd_key = f"contest_{contest_id}_countdown"
-        cd_res = db_manager.execute_query("SELECT value FROM admin_state WHERE key_name=%s", (cd_key,))
-
-
-        
-        # 1. Fetch TOTAL Violations and Disqualification Status using USER_ID (Int)
-        # This matches the source of truth set in proctoring.py
-        pr_query = "SELECT total_violations, is_disqualified, disqualification_reason FROM participant_proctoring WHERE user_id=%s AND contest_id=%s"
-        p_res = db_manager.execute_query(pr_query, (uid, contest_id))
-        
-        total_violations = 0
-        is_disqualified_state = False
-        disq_reason = None
-        
-        if p_res:
-             total_violations = p_res[0]['total_violations'] if p_res[0]['total_violations'] is not None else 0
-             is_disqualified_state = bool(p_res[0]['is_disqualified'])
-             disq_reason = p_res[0]['disqualification_reason']
-
-        # 2. Get Duration (With Strict Defaults + Admin Override)
-        def get_default_duration(l):
-            if l <= 3: return 20
-            if l == 4: return 30
-            if l == 5: return 45
-            return 45
-
-        level_duration = get_default_duration(current_state['level'] if current_state else 1)
-        if current_state:
-            lvl = current_state['level']
-            rd_res = db_manager.execute_query("SELECT time_limit_minutes FROM rounds WHERE contest_id=%s AND round_number=%s", (contest_id, lvl))
-            if rd_res and rd_res[0]['time_limit_minutes'] and rd_res[0]['time_limit_minutes'] > 0:
-                 level_duration = rd_res[0]['time_limit_minutes']
-
-        # 3. Decode Countdown State
-        countdown_data = {'active': False}
-        if cd_res:
-             try:
-                 countdown_data = json.loads(cd_res[0]['value'])
-             except: pass
-
-        # 4. Solved Question IDs
-        s_query = "SELECT question_id FROM submissions WHERE user_id=%s AND contest_id=%s AND is_correct=1"
-        s_res = db_manager.execute_query(s_query, (uid, contest_id))
-        solved_ids = [str(r['question_id']) for r in s_res] if s_res else []
-
-        # 5. Format Start Time (Strict UTC with Z to prevent browser drift)
-        def format_utc(dt):
-            if not dt: return None
-            # Ensure it's treated as UTC. 
-            # If the DB returned a naive object, we just add Z.
-            return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        # 6. Check Results Released State
-        # Logic: If I am in Level 1, and Level 1 Results are released, I need to know if I am in Level 2 Shortlist.
-        current_level_num = current_state['level'] if current_state else 1
-        key = f"contest_{contest_id}_level_{current_level_num}_released"
-        rel_res = db_manager.execute_query("SELECT value FROM admin_state WHERE key_name=%s", (key,))
-        results_released = rel_res and rel_res[0]['value'] == 'true'
-        
-        is_shortlisted_next = False
-        if results_released:
-            next_lvl = current_level_num + 1
-            # Check if allowed in next level
-            # shortlisted_participants stores "level" as the level they are allowed INTO.
-            sl_q = "SELECT 1 FROM shortlisted_participants WHERE contest_id=%s AND level=%s AND user_id=%s AND is_allowed=1"
-            sl_chk = db_manager.execute_query(sl_q, (contest_id, next_lvl, uid))
-            is_shortlisted_next = bool(sl_chk)
-
-        return jsonify({
-            'success': True,
-            'level': current_state['level'] if current_state else 1,
-            'level_duration_minutes': level_duration,
-            'violations': total_violations,
-            'solved': current_state['questions_solved'] if current_state else 0,
-            'solved_ids': solved_ids,
-            'status': current_state['status'] or 'NOT_STARTED' if current_state else 'NOT_STARTED',
-            'start_time': format_utc(current_state['start_time']) if current_state else None,
-            'global_level': global_level_data['round_number'],
-            'global_level_status': global_level_data['status'],
-            'rounds_map': rounds_map,
-            'countdown': countdown_data,
-            'is_eliminated': is_disqualified_state,
-            'disqualification_reason': disq_reason,
-            'results_released': results_released,
-            'is_shortlisted_next': is_shortlisted_next
-        })
+        return jsonify(participant_state_logic(contest_id, uid))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -871,11 +764,8 @@ def start_level():
         if not user_id or not level: return jsonify({'error': 'Missing fields'}), 400
         
         # 1. Resolve User ID
-        uid = user_id
-        if isinstance(user_id, str) and not user_id.isdigit():
-             u_res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (user_id,))
-             if u_res: uid = u_res[0]['user_id']
-             else: return jsonify({'error': f'User {user_id} not found'}), 404
+        uid = resolve_user_id(user_id)
+        if not uid: return jsonify({'error': f'User {user_id} not found'}), 404
         
         # 2. Ensure Row Exists
         # Use Python UTC time for consistency across systems
@@ -887,10 +777,14 @@ def start_level():
         )
         
         # 3. Start Level (Update Status & Time ONLY if new)
-        db_manager.execute_update(
-            "UPDATE participant_level_stats SET start_time = %s, status = 'IN_PROGRESS' WHERE user_id=%s AND contest_id=%s AND level=%s AND (status='NOT_STARTED' OR status IS NULL OR status='PAUSED')",
-            (now_utc, uid, contest_id, level)
-        )
+        # A started level puts the participant on the contest leaderboard: update both together
+        db_manager.execute_transaction([
+            ("UPDATE participant_level_stats SET start_time = %s, status = 'IN_PROGRESS' WHERE user_id=%s AND contest_id=%s AND level=%s AND (status='NOT_STARTED' OR status IS NULL OR status='PAUSED')",
+             (now_utc, uid, contest_id, level)),
+            leaderboard_upsert_sql(contest_id, uid),
+        ])
+        leaderboard_engine.refresh_user(contest_id, level, uid)
+        bump_user(uid)
         
         # 4. Fetch Actual Start Time & Duration
         stats_query = "SELECT start_time FROM participant_level_stats WHERE user_id=%s AND contest_id=%s AND level=%s"
@@ -898,8 +792,7 @@ def start_level():
         # Ensure UTC suffix
         start_time = stats_res[0]['start_time'] if stats_res and stats_res[0]['start_time'] else now_utc
 
-        dur_query = "SELECT time_limit_minutes FROM rounds WHERE contest_id=%s AND round_number=%s"
-        dur_res = db_manager.execute_query(dur_query, (contest_id, level))
+        round_cfg = get_round(contest_id, level)
         
         # Requested Defaults
         def get_default_duration(l):
@@ -909,8 +802,8 @@ def start_level():
             return 45
 
         duration = get_default_duration(level)
-        if dur_res and dur_res[0]['time_limit_minutes'] and dur_res[0]['time_limit_minutes'] > 0:
-            duration = dur_res[0]['time_limit_minutes']
+        if round_cfg and round_cfg['time_limit_minutes'] and round_cfg['time_limit_minutes'] > 0:
+            duration = round_cfg['time_limit_minutes']
         
         from extensions import socketio
         socketio.emit('admin:stats_update', {'contest_id': contest_id})
@@ -939,18 +832,20 @@ def submit_level():
     if not user_id: return jsonify({'success': True})
 
     # Get User INT ID
-    uid = user_id
-    if isinstance(user_id, str) and not user_id.isdigit():
-         u_res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (user_id,))
-         if u_res: uid = u_res[0]['user_id']
+    uid = resolve_user_id(user_id)
+    if not uid: return jsonify({'error': 'User not found'}), 404
     
     # 1. Update Status to COMPLETED
     # Set completion time
     now_utc = datetime.datetime.utcnow()
-    db_manager.execute_update(
-        "UPDATE participant_level_stats SET status='COMPLETED', completed_at=%s WHERE user_id=%s AND contest_id=%s AND level=%s", 
-        (now_utc, uid, contest_id, level)
-    )
+    # Completion time feeds the contest leaderboard row: update both together
+    db_manager.execute_transaction([
+        ("UPDATE participant_level_stats SET status='COMPLETED', completed_at=%s WHERE user_id=%s AND contest_id=%s AND level=%s", 
+         (now_utc, uid, contest_id, level)),
+        leaderboard_upsert_sql(contest_id, uid),
+    ])
+    leaderboard_engine.refresh_user(contest_id, level, uid)
+    bump_user(uid)
     
     # Fetch Updated Stats for Broadccast
     stats_q = "SELECT level_score, violation_count, completed_at, start_time FROM participant_level_stats WHERE user_id=%s AND contest_id=%s AND level=%s"
@@ -981,12 +876,13 @@ def submit_level():
     next_level = int(level) + 1
     
     # Check if next level exists in Rounds
-    r_check = db_manager.execute_query("SELECT round_id FROM rounds WHERE contest_id=%s AND round_number=%s", (contest_id, next_level))
-    if r_check:
+    if get_round(contest_id, next_level):
         db_manager.execute_update(
             "INSERT IGNORE INTO participant_level_stats (user_id, contest_id, level, status) VALUES (%s, %s, %s, 'NOT_STARTED')",
             (uid, contest_id, next_level)
         )
+        leaderboard_engine.refresh_user(contest_id, next_level, uid)
+        bump_user(uid)
     
     return jsonify({
         "success": True,
@@ -1012,6 +908,11 @@ def qualify_participants(contest_id):
          # Need better logic: find NEXT level. For now, try manual or default
          level = 2 
 
+    # Previously selected users: their shortlist flags change too (participant push)
+    previous = db_manager.execute_query(
+        "SELECT user_id FROM shortlisted_participants WHERE contest_id=%s AND level=%s AND is_allowed=1", (contest_id, level)) or []
+    changed = {r['user_id'] for r in previous}
+
     # 1. Reset selection for this level (Requirement: Uncheck others)
     # We set all is_allowed=0 for this contest+level first
     db_manager.execute_update("UPDATE shortlisted_participants SET is_allowed=0 WHERE contest_id=%s AND level=%s", (contest_id, level))
@@ -1019,16 +920,23 @@ def qualify_participants(contest_id):
     count = 0
     for pid in participant_ids:
         # pid could be int or string
-        uid = pid
-        if isinstance(pid, str) and not pid.isdigit():
-             res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (pid,))
-             if res: uid = res[0]['user_id']
+        uid = resolve_user_id(pid)
+        if not uid:
+            continue
         
         db_manager.execute_update(
             "INSERT INTO shortlisted_participants (contest_id, level, user_id, is_allowed) VALUES (%s, %s, %s, 1) ON DUPLICATE KEY UPDATE is_allowed=1",
             (contest_id, level, uid)
         )
+        changed.add(uid)
         count += 1
+    # Selection is made from the Overall standings: bring every leaderboard row of
+    # the contest up to date once (one INSERT ... SELECT)
+    refresh_leaderboard(contest_id)
+    bump_standings(contest_id)
+    for uid in changed:
+        bump_user(uid)
+    bump_contests()
 
     return jsonify({'success': True, 'count': count})
 
@@ -1054,10 +962,14 @@ def notify_progression(contest_id):
     # Note: User requirements say "When Admin clicks Notify All in Selection section".
     # We'll infer it from the global state or keep it simple.
     
-    # Let's find global active level
-    q = "SELECT round_number FROM rounds WHERE contest_id=%s AND status='active' ORDER BY round_number DESC LIMIT 1"
-    res = db_manager.execute_query(q, (contest_id,))
-    active_level = res[0]['round_number'] if res else 1
+    # Released level: ?level= from the body, else the highest active level, else
+    # the last completed one (a completed level is no longer active)
+    data = request.get_json(silent=True) or {}
+    active_level = data.get('level') or get_active_level(contest_id, highest=True)
+    if not active_level:
+        completed = [r['round_number'] for r in get_rounds(contest_id) if r['status'] == 'completed']
+        active_level = max(completed) if completed else 1
+    active_level = int(active_level)
     
     # 2. Persist "Results Released" State
     key = f"contest_{contest_id}_level_{active_level}_released"
@@ -1065,6 +977,11 @@ def notify_progression(contest_id):
         "INSERT INTO admin_state (key_name, value) VALUES (%s, 'true') ON DUPLICATE KEY UPDATE value='true'",
         (key,)
     )
+    invalidate_admin_state(key)
+    # Snapshots are immutable: only a completed level's standings are final
+    round_cfg = get_round(contest_id, active_level)
+    if round_cfg and round_cfg['status'] == 'completed':
+        freeze_level(contest_id, active_level, 'results_released')
 
     from extensions import socketio
     socketio.emit('contest:results_released', {'contest_id': contest_id, 'level': active_level})
@@ -1100,17 +1017,6 @@ def activate_specific_level(contest_id, level):
     socketio.emit('contest:updated', {'contest_id': contest_id})
     return jsonify({'success': True})
 
-@bp.route('/<contest_id>/level/<int:level>/complete', methods=['POST'])
-@admin_required
-def complete_specific_level(contest_id, level):
-    complete_level_logic(contest_id, level)
-    
-    from extensions import socketio
-    socketio.emit('level:completed', {'level': level})
-    socketio.emit('contest:updated', {'contest_id': contest_id})
-    return jsonify({'success': True})
-
-
 
 @bp.route('/<contest_id>/finalize-round', methods=['POST'])
 @admin_required
@@ -1125,6 +1031,8 @@ def finalize_round(contest_id):
         # 2. Update to completed
         u_q = "UPDATE rounds SET status='completed' WHERE contest_id=%s AND round_number=%s"
         db_manager.execute_update(u_q, (contest_id, r_num))
+        invalidate_rounds(contest_id)
+        freeze_level(contest_id, r_num, 'finalize_round')
         
         # 3. Notify
         from extensions import socketio
@@ -1168,9 +1076,7 @@ def get_contest_stats(contest_id):
     solved = s_res[0]['count'] if s_res else 0
     
     # Get Configured Wait Time + Countdown Status
-    cd_key = f"contest_{contest_id}_countdown"
-    cd_res = db_manager.execute_query("SELECT value FROM admin_state WHERE key_name=%s", (cd_key,))
-    countdown_state = cd_res[0]['value'] if cd_res else 'stopped'
+    countdown_state = get_admin_state(f"contest_{contest_id}_countdown") or 'stopped'
 
     return jsonify({
         'total_participants': total,
@@ -1,89 +1,93 @@
 from flask import Blueprint, jsonify, request, Response
 from utils.db import get_db
+from utils.export import csv_response
+from utils.cache import get_current_contest_id, get_question_count
+from utils.leaderboard import leaderboard_engine, page_window, page_info, format_board_row, MAX_PAGE_SIZE, decode_cursor, board_cursor
+from utils.versions import conditional
+from utils.history import replay, parse_timestamp, format_timestamp, history_bounds, series_times
 import datetime
-import io
-import csv
 
 bp = Blueprint('leaderboard', __name__)
 
+def _board_scopes():
+    level = request.args.get('level', 1, type=int)
+    contest_id = request.args.get('contest_id', type=int) or get_current_contest_id()
+    # 'contests' covers the current contest and total_questions (question edits)
+    return [('contests',), ('board', contest_id, level)]
+
 @bp.route('/', methods=['GET'])
+@conditional(_board_scopes, shared=True)
 def get_leaderboard():
-    db = get_db()
     level = request.args.get('level', 1, type=int) # Default to Level 1
+    contest_id = request.args.get('contest_id', type=int) or get_current_contest_id()
+    if not leaderboard_engine.has_level(contest_id, level):
+        return jsonify({'error': 'Unknown contest level', 'leaderboard': [], 'level': level}), 404
     
-    # Check if we are querying for a specific level
-    # Use participant_level_stats
-    query = """
-        SELECT 
-            u.username as participant_id, 
-            u.full_name, 
-            u.department, 
-            u.college,
-            pls.level_score as total_score,
-            pls.questions_solved,
-            pls.status,
-            pls.start_time, 
-            pls.completed_at,
-            TIMESTAMPDIFF(SECOND, pls.start_time, pls.completed_at) as time_taken_sec
-        FROM participant_level_stats pls
-        JOIN users u ON pls.user_id = u.user_id
-        WHERE u.role = 'participant' AND pls.level = %s
-        ORDER BY pls.level_score DESC, 
-                 CASE WHEN pls.status = 'COMPLETED' THEN 0 ELSE 1 END ASC,
-                 time_taken_sec ASC
-    """
-    
-    # We use db_manager via get_db() which returns the bridge or manager
-    # execute_query supports params
-    res = db.execute_query(query, (level,))
-    
-    data = []
-    if res:
-        for idx, row in enumerate(res):
-            # Format time
-            seconds = row.get('time_taken_sec')
-            if seconds is not None:
-                m, s = divmod(int(seconds), 60)
-                h, m = divmod(m, 60)
-                time_str = "{:02d}:{:02d}:{:02d}".format(h, m, s)
-            else:
-                # If not completed or calculated, show -- or duration so far?
-                # Usually leaderboard shows finalized time.
-                time_str = "--:--:--"
-                if row.get('status') == 'IN_PROGRESS' and row.get('start_time'):
-                    # Optional: Could show current running time, but cache implications.
-                    # Let's keep it simple: -- for incomplete.
-                    pass
-
-            data.append({
-                'id': row['participant_id'],
-                'rank': idx + 1,
-                'name': row['full_name'],
-                'department': row.get('department'),
-                'college': row.get('college'),
-                'score': float(row['total_score']),
-                'time': time_str,
-                'solved': row['questions_solved'],
-                'status': row['status']
-            })
+    # Served from the in-memory board (utils/leaderboard.py), kept current by
+    # the submission/level events: no query per poll.
+    # Paging: ?top=10 for the projector, ?limit=&offset= or ?limit=&after=<page.next> otherwise
+    offset, limit, after = page_window(request.args)
+    cursor = decode_cursor(after, 4) if after else None
+    if after and cursor is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    standings, total = leaderboard_engine.standings(contest_id, level, offset, limit, cursor)
+    data = [format_board_row(rank, entry) for rank, entry in standings]
+    offset = standings[0][0] - 1 if standings else offset
             
     # Fetch Total Questions for this level
-    q_count_query = """
-        SELECT COUNT(*) as count 
-        FROM questions q
-        JOIN rounds r ON q.round_id = r.round_id
-        WHERE r.round_number = %s
-    """
-    total_q_res = db.execute_query(q_count_query, (level,))
-    total_questions = total_q_res[0]['count'] if total_q_res else 0
+    total_questions = get_question_count(contest_id, level)
 
     return jsonify({
         "leaderboard": data,
         "level": level,
         "total_questions": total_questions,
+        "page": page_info(offset, limit, len(data), total, board_cursor(standings[-1][1]) if standings else None),
         "generated_at": datetime.datetime.utcnow().isoformat()
     })
 
+@bp.route('/history', methods=['GET'])
+@conditional(_board_scopes, shared=True)
+def leaderboard_history():
+    """
+    Replay of a level's standings from the history log (utils/history.py).
+      ?at=<ISO or epoch>                        -> standings at that moment
+      ?from=&to=&points=60&top=10               -> downsampled series for the projector
+    Without at/from/to: the series over the whole recorded history.
+    Public, so the response is shared per board version and query string: a
+    replay runs once per change of the board, not once per request.
+    """
+    level = request.args.get('level', 1, type=int)
+    contest_id = request.args.get('contest_id', type=int) or get_current_contest_id()
+    top = request.args.get('top', type=int)
+    if top is not None:
+        top = max(1, min(top, MAX_PAGE_SIZE))
+    if not leaderboard_engine.has_level(contest_id, level):
+        return jsonify({'error': 'Unknown contest level', 'level': level}), 404
+
+    at = parse_timestamp(request.args.get('at'))
+    if at is not None:
+        [(t, standings)] = replay(contest_id, level, [at], top)
+        return jsonify({
+            'level': level,
+            'at': format_timestamp(t),
+            'leaderboard': [format_board_row(rank, entry) for rank, entry in standings]
+        })
+
+    first, last = history_bounds(contest_id, level)
+    if first is None:
+        return jsonify({'level': level, 'series': []})
+    start = parse_timestamp(request.args.get('from')) or first
+    end = parse_timestamp(request.args.get('to')) or last
+    times = series_times(start, end, request.args.get('points', 60, type=int))
+    series = replay(contest_id, level, times, top or 10)
+    return jsonify({
+        'level': level,
+        'from': format_timestamp(times[0]),
+        'to': format_timestamp(times[-1]),
+        'series': [{'t': format_timestamp(t), 'leaderboard': [format_board_row(rank, entry) for rank, entry in standings]}
+                   for t, standings in series]
+    })
+
 @bp.route('/report', methods=['GET'])
 def download_leaderboard_report():
     db = get_db()
@@ -106,42 +110,37 @@ def download_leaderboard_report():
                  CASE WHEN pls.status = 'COMPLETED' THEN 0 ELSE 1 END ASC,
                  time_taken_sec ASC
     """
-    res = db.execute_query(query, (level,))
-    
-    data = []
-    if res:
-        for idx, row in enumerate(res):
-            seconds = row.get('time_taken_sec')
-            if seconds is not None:
-                m, s = divmod(int(seconds), 60)
-                h, m = divmod(m, 60)
-                time_str = "{:02d}:{:02d}:{:02d}".format(h, m, s)
-            else:
-                time_str = "In Progress"
-            
-            data.append({
-                'rank': idx + 1,
-                'id': row['participant_id'],
-                'name': row['full_name'],
-                'department': row.get('department', ''),
-                'college': row.get('college', ''),
-                'score': float(row['total_score']),
-                'time': time_str,
-                'solved': row['questions_solved']
-            })
-    
     export_format = request.args.get('format', 'json')
     
     if export_format == 'csv':
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=['rank', 'id', 'name', 'department', 'college', 'score', 'time', 'solved'])
-        writer.writeheader()
-        writer.writerows(data)
-        
-        return Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-disposition": f"attachment; filename=leaderboard_level_{level}.csv"}
+        # Stream rows straight from the cursor into the CSV response
+        fields = ['rank', 'id', 'name', 'department', 'college', 'score', 'time', 'solved']
+        rows = (
+            [report[f] for f in fields]
+            for report in (_format_report_row(idx, row) for idx, row in enumerate(db.stream_query(query, (level,))))
         )
+        return csv_response(f"leaderboard_level_{level}.csv", fields, rows)
     
+    res = db.execute_query(query, (level,))
+    data = [_format_report_row(idx, row) for idx, row in enumerate(res or [])]
     return jsonify({"report": data})
+
+def _format_report_row(idx, row):
+    seconds = row.get('time_taken_sec')
+    if seconds is not None:
+        m, s = divmod(int(seconds), 60)
+        h, m = divmod(m, 60)
+        time_str = "{:02d}:{:02d}:{:02d}".format(h, m, s)
+    else:
+        time_str = "In Progress"
+    
+    return {
+        'rank': idx + 1,
+        'id': row['participant_id'],
+        'name': row['full_name'],
+        'department': row.get('department', ''),
+        'college': row.get('college', ''),
+        'score': float(row['total_score']),
+        'time': time_str,
+        'solved': row['questions_solved']
+    }
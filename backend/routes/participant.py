@@ -1,5 +1,9 @@
 from flask import Blueprint, jsonify, request
 from utils.db import get_db
+from utils.cache import get_rounds, get_round, resolve_user_id
+from utils.leaderboard import leaderboard_engine
+from utils.standings import refresh_leaderboard
+from utils.versions import bump_user
 import datetime
 from extensions import socketio
 
@@ -16,18 +20,12 @@ def get_participant_levels(participant_id):
 
     try:
         # 1. Resolve User ID
-        user_id = None
-        username = participant_id
-        
-        u_res = db.execute_query("SELECT user_id, username FROM users WHERE username=%s OR user_id=%s", (username, username))
-        if u_res:
-             user_id = u_res[0]['user_id']
-        else:
+        user_id = resolve_user_id(participant_id)
+        if not user_id:
             return jsonify({'error': 'User not found'}), 404
 
         # 2. Get Rounds & Stats
-        rounds_query = "SELECT round_number, round_name, status, is_locked FROM rounds WHERE contest_id=%s ORDER BY round_number ASC"
-        rounds = db.execute_query(rounds_query, (contest_id,)) or []
+        rounds = get_rounds(contest_id)
         
         stats_query = "SELECT level, status, questions_solved FROM participant_level_stats WHERE user_id=%s AND contest_id=%s"
         stats = db.execute_query(stats_query, (user_id, contest_id))
@@ -81,11 +79,8 @@ def unlock_level_logic(data):
     db = get_db()
     try:
         # Resolve ID
-        user_id = None
-        u_res = db.execute_query("SELECT user_id FROM users WHERE username=%s OR user_id=%s", (participant_id, participant_id))
-        if u_res:
-             user_id = u_res[0]['user_id']
-        else:
+        user_id = resolve_user_id(participant_id)
+        if not user_id:
              return jsonify({'error': 'User not found'}), 404
              
         now_iso = datetime.datetime.utcnow().isoformat()
@@ -113,12 +108,16 @@ def unlock_level_logic(data):
                 "INSERT INTO participant_level_stats (user_id, contest_id, level, status, start_time) VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE status='IN_PROGRESS', start_time=VALUES(start_time)",
                 (user_id, contest_id, level, 'IN_PROGRESS', now_iso)
             )
+        # Started level -> contest leaderboard row (Overall standings)
+        refresh_leaderboard(contest_id, user_id)
+        leaderboard_engine.refresh_user(contest_id, level, user_id)
+        bump_user(user_id)
         
         # Fetch Duration
-        d_res = db.execute_query("SELECT time_limit_minutes FROM rounds WHERE contest_id=%s AND round_number=%s", (contest_id, level))
+        round_cfg = get_round(contest_id, level)
         duration = 45
-        if d_res and d_res[0]['time_limit_minutes']:
-             duration = d_res[0]['time_limit_minutes']
+        if round_cfg and round_cfg['time_limit_minutes']:
+             duration = round_cfg['time_limit_minutes']
         
         # Notify Admin
         socketio.emit('admin:stats_update', {'contest_id': contest_id})
@@ -1,6 +1,9 @@
 
 from flask import Blueprint, jsonify, request
 from db_connection import db_manager
+from utils.cache import get_proctoring_config as cached_proctoring_config, invalidate_proctoring_config, resolve_user_id
+from utils.versions import bump_user, bump_standings
+from utils.standings import refresh_leaderboard
 import datetime
 import uuid
 
@@ -9,9 +12,8 @@ bp = Blueprint('proctoring', __name__)
 # --- HELPERS ---
 
 def get_config(contest_id):
-    query = "SELECT * FROM proctoring_config WHERE contest_id = %s"
-    result = db_manager.execute_query(query, (contest_id,))
-    if result: return result[0]
+    config = cached_proctoring_config(contest_id)
+    if config: return config
     return {
         "enabled": False, 
         "max_violations": 20, 
@@ -76,6 +78,7 @@ def update_proctoring_config(contest_id):
         )
         db_manager.execute_update(query, params)
         
+    invalidate_proctoring_config(contest_id)
     return jsonify({'success': True})
 
 @bp.route('/stats/<int:contest_id>', methods=['GET'])
@@ -151,12 +154,11 @@ def report_violation():
     level = data.get('level')
     
     # 1. Resolve User ID
-    u_res = db_manager.execute_query("SELECT user_id, username FROM users WHERE username=%s", (participant_id_str,))
-    if not u_res:
+    user_id = resolve_user_id(participant_id_str)
+    if not user_id:
         return jsonify({'error': 'User not found'}), 404
         
-    user_id = u_res[0]['user_id']
-    username = u_res[0]['username']
+    username = participant_id_str
     
     # 2. Log Raw Violation (Source of Truth for Audit)
     query_log = """
@@ -164,7 +166,8 @@ def report_violation():
         (user_id, contest_id, round_id, violation_type, description, severity, penalty_points, level, timestamp)
         VALUES (%s, %s, %s, %s, %s, 'medium', 1, %s, %s)
     """
-    db_manager.execute_update(query_log, (user_id, contest_id, None, violation_type, description, level, datetime.datetime.utcnow()))
+    # defer=True: while the database is unreachable the log entry is queued and replayed later
+    logged = db_manager.execute_update(query_log, (user_id, contest_id, None, violation_type, description, level, datetime.datetime.utcnow()), defer=True)
     
     # 3. Determine Field Updates based on Type
     field_map = {
@@ -179,6 +182,23 @@ def report_violation():
     
     inc_field = field_map.get(violation_type)
     
+    if logged and logged.get('deferred'):
+        # Degraded mode: queue the counter bump as one upsert (only MySQL defers writes).
+        # Risk level and auto-disqualification catch up on the next violation.
+        extra_col = f", {inc_field}" if inc_field else ""
+        extra_val = ", 1" if inc_field else ""
+        extra_upd = f", {inc_field} = {inc_field} + 1" if inc_field else ""
+        deferred_q = f"""
+            INSERT INTO participant_proctoring
+            (id, participant_id, user_id, contest_id, total_violations, risk_level, last_violation_at{extra_col})
+            VALUES (%s, %s, %s, %s, 1, 'low', %s{extra_val})
+            ON DUPLICATE KEY UPDATE total_violations = total_violations + 1,
+                last_violation_at = VALUES(last_violation_at){extra_upd}
+        """
+        db_manager.execute_update(deferred_q, (str(uuid.uuid4()), username, user_id, contest_id, datetime.datetime.utcnow()), defer=True)
+        refresh_leaderboard(contest_id, user_id, defer=True)
+        return jsonify({'success': True, 'disqualified': False, 'deferred': True})
+
     # 4. Upsert Participant Stats (Single Source of Truth for State)
     # Check existence
     check_pp = "SELECT total_violations FROM participant_proctoring WHERE user_id=%s AND contest_id=%s"
@@ -222,6 +242,11 @@ def report_violation():
             inc_val_map['screenshot_attempts']
         ))
         current_violations = 1
+    # violations_count of the contest leaderboard row
+    refresh_leaderboard(contest_id, user_id)
+    bump_standings(contest_id)
+    # participant-state polls see the new count (ETag)
+    bump_user(user_id)
 
     # 5. Check Thresholds & Enforce Disqualification (Backend Driver)
     config = get_config(contest_id)
@@ -246,15 +271,14 @@ def report_violation():
                 WHERE user_id=%s AND contest_id=%s AND (is_disqualified=0 OR is_disqualified IS NULL)
              """
              db_manager.execute_update(dq_q, (dq_reason, user_id, contest_id))
+             bump_user(user_id)
              return jsonify({'success': True, 'disqualified': True, 'reason': dq_reason})
 
     return jsonify({'success': True, 'disqualified': False})
 
 @bp.route('/export/<int:contest_id>', methods=['GET'])
 def export_proctoring_report(contest_id):
-    import io
-    import csv
-    from flask import Response
+    from utils.export import csv_response
     
     level = request.args.get('level')
     
@@ -300,32 +324,27 @@ def export_proctoring_report(contest_id):
         """
         params.append(level)
         
-    results = db_manager.execute_query(query, tuple(params))
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(['Participant ID', 'Username', 'Full Name', 'Risk Level', 'Total Violations', 'Tab Switches', 'Copy Attempts', 'Screenshots', 'Focus Lost', 'Disqualified?', 'Reason', 'Last Violation Time'])
+    # Stream rows as they are fetched (unbuffered cursor on MySQL)
+    rows = (
+        [
+            row['participant_id'],
+            row['username'],
+            row['full_name'],
+            row['risk_level'],
+            row['total_violations'],
+            row['tab_switches'],
+            row['copy_attempts'],
+            row['screenshot_attempts'],
+            row['focus_losses'],
+            'Yes' if row['is_disqualified'] else 'No',
+            row['disqualification_reason'] or '',
+            row['last_violation_at']
+        ]
+        for row in db_manager.stream_query(query, tuple(params))
+    )
     
-    if results:
-        for row in results:
-            writer.writerow([
-                row['participant_id'],
-                row['username'],
-                row['full_name'],
-                row['risk_level'],
-                row['total_violations'],
-                row['tab_switches'],
-                row['copy_attempts'],
-                row['screenshot_attempts'],
-                row['focus_losses'],
-                'Yes' if row['is_disqualified'] else 'No',
-                row['disqualification_reason'] or '',
-                row['last_violation_at']
-            ])
-            
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-disposition": f"attachment; filename=proctoring_report_contest_{contest_id}.csv"}
+    return csv_response(
+        f"proctoring_report_contest_{contest_id}.csv",
+        ['Participant ID', 'Username', 'Full Name', 'Risk Level', 'Total Violations', 'Tab Switches', 'Copy Attempts', 'Screenshots', 'Focus Lost', 'Disqualified?', 'Reason', 'Last Violation Time'],
+        rows
     )
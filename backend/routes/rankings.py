@@ -1,29 +1,25 @@
 
-from flask import Blueprint, jsonify, request
-from db_connection import db_manager
-import datetime
+from flask import Blueprint, jsonify, request, make_response
+from utils.cache import get_current_contest_id, get_rounds, resolve_user_id
+from utils.leaderboard import leaderboard_engine, page_window, page_info, MAX_PAGE_SIZE, decode_cursor, encode_cursor, board_cursor
+from utils.versions import conditional
+from utils.standings import ranked_rows, ranked_count, ranked_before, rank_in_contest, level_scores
+from utils.snapshots import get_snapshot, snapshot_versions, snapshot_entries
 
 bp = Blueprint('rankings', __name__)
 
 @bp.route('/levels', methods=['GET'])
+@conditional(lambda: [('contests',)], shared=True)
 def get_levels():
     # Fetch all rounds/levels for the active or latest contest
     # We prioritize live contests, then the most recent one.
-    c_query = "SELECT contest_id FROM contests WHERE status='live' LIMIT 1"
-    c_res = db_manager.execute_query(c_query)
-    
-    contest_id = 1
-    if c_res:
-        contest_id = c_res[0]['contest_id']
-    else:
-        # Fallback to most recent
-        c_res = db_manager.execute_query("SELECT contest_id FROM contests ORDER BY contest_id DESC LIMIT 1")
-        if c_res: contest_id = c_res[0]['contest_id']
+    contest_id = get_current_contest_id()
 
     # Fetch levels
     # The user wants "Data for all time", so we show all levels defined in the rounds table
-    query = "SELECT round_number, round_name, status FROM rounds WHERE contest_id=%s ORDER BY round_number ASC"
-    rows = db_manager.execute_query(query, (contest_id,))
+    rows = get_rounds(contest_id)
+    # Finalized levels have frozen standings (utils/snapshots.py)
+    frozen = snapshot_versions(contest_id)
     
     levels = []
     if rows:
@@ -31,71 +27,160 @@ def get_levels():
             levels.append({
                 'level': r['round_number'],
                 'title': r['round_name'] or f"Level {r['round_number']}",
-                'status': r['status']
+                'status': r['status'],
+                'snapshot_version': frozen.get(r['round_number'])
             })
             
-    return jsonify({'levels': levels})
+    return jsonify({'levels': levels, 'contest_id': contest_id})
 
 @bp.route('/view', methods=['GET'])
+@conditional(lambda: [('contests',), ('board', get_current_contest_id(), request.args.get('level', 1, type=int))], shared=True)
 def view_rankings():
-    level = request.args.get('level', 1)
+    level = request.args.get('level', 1, type=int)
     
     # Identify Contest
-    c_query = "SELECT contest_id FROM contests WHERE status='live' LIMIT 1"
-    c_res = db_manager.execute_query(c_query)
-    contest_id = 1
-    if c_res:
-        contest_id = c_res[0]['contest_id']
+    contest_id = get_current_contest_id()
+    if not leaderboard_engine.has_level(contest_id, level):
+        return jsonify({'error': 'Unknown level', 'rankings': []}), 404
+
+    # Ranked in memory by utils/leaderboard.py (score, completed first, time).
+    # Optional paging: ?top=, ?limit=&offset=, ?limit=&after=<page.next>
+    offset, limit, after = page_window(request.args)
+    cursor = decode_cursor(after, 4) if after else None
+    if after and cursor is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    standings, total = leaderboard_engine.standings(contest_id, level, offset, limit, cursor)
+    rankings = [_format_ranking(rank, entry) for rank, entry in standings]
+    offset = standings[0][0] - 1 if standings else offset
+    next_cursor = board_cursor(standings[-1][1]) if standings else None
+            
+    return jsonify({'rankings': rankings, 'page': page_info(offset, limit, len(rankings), total, next_cursor)})
+
+@bp.route('/snapshot/<int:contest_id>/<int:level>', methods=['GET'])
+@bp.route('/snapshot/<int:contest_id>/<int:level>/<int:version>', methods=['GET'])
+def view_snapshot(contest_id, level, version=None):
+    """
+    Frozen standings of a finalized level. A versioned URL never changes and is
+    cacheable for a year; without a version the latest one is served with a
+    short max-age.
+    """
+    etag = f"snap-{contest_id}-{level}-{version}"
+    if version is not None and request.if_none_match.contains(etag):
+        resp = make_response('', 304)
     else:
-         c_res = db_manager.execute_query("SELECT contest_id FROM contests ORDER BY contest_id DESC LIMIT 1")
-         if c_res: contest_id = c_res[0]['contest_id']
+        payload = get_snapshot(contest_id, level, version)
+        if payload is None:
+            return jsonify({'error': 'No snapshot for this level', 'rankings': []}), 404
+        etag = f"snap-{contest_id}-{level}-{payload['version']}"
+        resp = make_response(jsonify({
+            'rankings': [_format_ranking(rank, entry) for rank, entry in snapshot_entries(payload)],
+            'level': level,
+            'version': payload['version'],
+            'frozen_at': payload['frozen_at'],
+            'reason': payload['reason']
+        }))
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable' if version is not None else 'public, max-age=60'
+    return resp
+
+@bp.route('/around/<participant_id>', methods=['GET'])
+def rankings_around(participant_id):
+    """The participant's row plus `n` rows above and below it (default 5)."""
+    level = request.args.get('level', 1, type=int)
+    n = max(0, min(request.args.get('n', 5, type=int), MAX_PAGE_SIZE // 2))
+    contest_id = get_current_contest_id()
+    if not leaderboard_engine.has_level(contest_id, level):
+        return jsonify({'error': 'Unknown level', 'rankings': []}), 404
+
+    uid = resolve_user_id(participant_id)
+    if not uid:
+        return jsonify({'error': 'User not found'}), 404
 
-    # Query Stats
-    query = """
-        SELECT 
-            u.username,
-            u.full_name,
-            u.department, 
-            u.college,
-            pls.level_score,
-            pls.questions_solved,
-            pls.status,
-            pls.start_time, 
-            pls.completed_at,
-            TIMESTAMPDIFF(SECOND, pls.start_time, pls.completed_at) as time_taken_sec
-        FROM participant_level_stats pls
-        JOIN users u ON pls.user_id = u.user_id
-        WHERE pls.contest_id = %s AND pls.level = %s AND u.role = 'participant'
-        ORDER BY pls.level_score DESC, 
-                 CASE WHEN pls.status = 'COMPLETED' THEN 0 ELSE 1 END ASC,
-                 time_taken_sec ASC
+    # O(log n) rank lookup on the in-memory board, no full sort per request
+    rows, rank, total = leaderboard_engine.around(contest_id, level, uid, n)
+    return jsonify({
+        'rankings': [_format_ranking(r, entry) for r, entry in rows],
+        'rank': rank,
+        'total': total,
+        'level': level
+    })
+
+@bp.route('/overall', methods=['GET'])
+@conditional(lambda: [('contests',), ('standings', request.args.get('contest_id', type=int) or get_current_contest_id())])
+def overall_rankings():
     """
-    
-    res = db_manager.execute_query(query, (contest_id, level))
-    
+    Contest-wide ranking across all levels: total score, then levels completed,
+    then total completion time. Read from the `leaderboard` table, which the
+    submission and level writes keep current, along its rank_key index.
+    Paging as in /view (?after=<page.next> continues along the index, with
+    ?after_rank= the rank of that row so the page is numbered without a count);
+    ?participant_id= adds that participant's own rank.
+    """
+    contest_id = request.args.get('contest_id', type=int) or get_current_contest_id()
+    offset, limit, after = page_window(request.args)
+    cursor = decode_cursor(after, 2) if after else None
+    if after and cursor is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    if cursor is not None and request.args.get('after_rank', type=int) is None:
+        offset = ranked_before(contest_id, cursor)
+    rows = ranked_rows(contest_id, offset, limit or MAX_PAGE_SIZE, cursor)
+    total = ranked_count(contest_id)
+    per_level = level_scores(contest_id, [r['user_id'] for r in rows])
+
     rankings = []
-    if res:
-        for idx, row in enumerate(res):
-            # Time Format
-            seconds = row.get('time_taken_sec')
-            if seconds is not None and row.get('status') == 'COMPLETED':
-                m, s = divmod(int(seconds), 60)
-                h, m = divmod(m, 60)
-                time_str = "{:02d}:{:02d}:{:02d}".format(h, m, s)
-            elif row.get('status') == 'IN_PROGRESS':
-                time_str = "In Progress"
-            else:
-                time_str = "--"
-            
-            rankings.append({
-                'rank': idx + 1,
-                'name': row['full_name'] or row['username'],
-                'id': row['username'],
-                'department': row.get('department'),
-                'college': row.get('college'),
-                'score': float(row['level_score'] or 0),
-                'time': time_str,
-                'solved': row['questions_solved']
-            })
-            
-    return jsonify({'rankings': rankings})
+    for idx, row in enumerate(rows):
+        ranking = _format_overall(offset + idx + 1, row)
+        ranking['levels'] = per_level.get(row['user_id'], {})
+        rankings.append(ranking)
+
+    response = {
+        'rankings': rankings,
+        'contest_id': contest_id,
+        'page': page_info(offset, limit or MAX_PAGE_SIZE, len(rankings), total,
+                          encode_cursor((rows[-1]['rank_key'], rows[-1]['user_id'])) if rows else None)
+    }
+    participant_id = request.args.get('participant_id')
+    if participant_id:
+        uid = resolve_user_id(participant_id)
+        response['participant_rank'] = rank_in_contest(contest_id, uid) if uid else None
+    return jsonify(response)
+
+def _format_overall(rank, row):
+    seconds = int(row['total_time_taken_seconds'] or 0)
+    m, s = divmod(seconds, 60)
+    h, m = divmod(m, 60)
+    return {
+        'rank': rank,
+        'name': row['full_name'] or row['username'],
+        'id': row['username'],
+        'department': row['department'],
+        'college': row['college'],
+        'score': float(row['total_score'] or 0),
+        'time': "{:02d}:{:02d}:{:02d}".format(h, m, s) if row['levels_completed'] else "--",
+        'solved': row['questions_correct'] or 0,
+        'levels_completed': row['levels_completed'] or 0,
+        'current_round': row['current_round']
+    }
+
+def _format_ranking(rank, entry):
+    # Time Format
+    seconds = entry['time_taken_sec']
+    if seconds is not None and entry['status'] == 'COMPLETED':
+        m, s = divmod(int(seconds), 60)
+        h, m = divmod(m, 60)
+        time_str = "{:02d}:{:02d}:{:02d}".format(h, m, s)
+    elif entry['status'] == 'IN_PROGRESS':
+        time_str = "In Progress"
+    else:
+        time_str = "--"
+    
+    return {
+        'rank': rank,
+        'name': entry['full_name'] or entry['username'],
+        'id': entry['username'],
+        'department': entry['department'],
+        'college': entry['college'],
+        'score': entry['score'],
+        'time': time_str,
+        'solved': entry['solved']
+    }
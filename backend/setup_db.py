@@ -1,6 +1,7 @@
 
 from db_connection import db_manager
 from seed_data import seed_data
+from migrate import run_migrations
 import os
 
 def setup():
@@ -18,6 +19,8 @@ def setup():
     print(f"Initializing Database from {os.path.basename(schema_path)}...")
     if db_manager.init_database(schema_path):
         print("Database initialized.")
+        applied = run_migrations()
+        print(f"Schema migrations applied: {applied or 'none'}")
         try:
             seed_data()
             print("Seeding complete.")
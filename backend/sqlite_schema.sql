@@ -80,7 +80,8 @@ CREATE TABLE IF NOT EXISTS submissions (
   test_results JSON,
   status TEXT DEFAULT 'pending',
   time_taken_seconds INTEGER,
-  submission_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+  submission_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+  journal_id TEXT
 );
 
 CREATE TABLE IF NOT EXISTS participant_level_stats (
@@ -186,10 +187,35 @@ CREATE TABLE IF NOT EXISTS leaderboard (
   questions_correct INTEGER DEFAULT 0,
   violations_count INTEGER DEFAULT 0,
   current_round INTEGER DEFAULT 1,
+  levels_completed INTEGER DEFAULT 0,
+  rank_key INTEGER,
   last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
   UNIQUE(user_id, contest_id)
 );
 
+CREATE TABLE IF NOT EXISTS leaderboard_snapshots (
+  snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  contest_id INTEGER NOT NULL,
+  level INTEGER NOT NULL,
+  version INTEGER NOT NULL,
+  reason TEXT,
+  row_count INTEGER DEFAULT 0,
+  checksum TEXT NOT NULL,
+  payload BLOB NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE(contest_id, level, version)
+);
+
+CREATE TABLE IF NOT EXISTS leaderboard_history (
+  event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  contest_id INTEGER NOT NULL,
+  level INTEGER NOT NULL,
+  recorded_at INTEGER NOT NULL,
+  kind TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  source TEXT
+);
+
 CREATE TABLE IF NOT EXISTS admin_state (
     key_name TEXT PRIMARY KEY,
     value TEXT,
@@ -207,3 +233,16 @@ CREATE TABLE IF NOT EXISTS proctoring_alerts (
   read_at DATETIME,
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
+
+-- Hot-path indexes (kept in sync with migration 003 in migrate.py)
+CREATE INDEX IF NOT EXISTS idx_sub_user_question ON submissions (user_id, question_id, is_correct);
+CREATE INDEX IF NOT EXISTS idx_sub_contest_correct ON submissions (contest_id, is_correct);
+CREATE INDEX IF NOT EXISTS idx_v_contest ON violations (contest_id);
+CREATE INDEX IF NOT EXISTS idx_pls_contest_level_score ON participant_level_stats (contest_id, level, level_score);
+CREATE INDEX IF NOT EXISTS idx_rounds_contest_status ON rounds (contest_id, status, round_number);
+
+-- Leaderboard rank scan (migration 005)
+CREATE INDEX IF NOT EXISTS idx_lb_rank ON leaderboard (contest_id, rank_key, user_id, total_score, questions_correct, total_time_taken_seconds);
+
+-- Leaderboard history lookups (migration 007)
+CREATE INDEX IF NOT EXISTS idx_hist_time ON leaderboard_history (contest_id, level, recorded_at);
@@ -0,0 +1,74 @@
+
+# Shared fixtures: every test session runs against a throwaway SQLite database
+# (sqlite_schema.sql + migrations + seed_data), never debug_marathon.db.
+#
+#   cd backend && python -m pytest -q
+
+import os
+import sys
+import uuid
+import tempfile
+import pytest
+
+# Must be set before anything imports db_connection / the journal
+_TMP = tempfile.mkdtemp(prefix='debug-marathon-tests-')
+os.environ['DB_MODE'] = 'sqlite'
+os.environ['DB_SQLITE_PATH'] = os.path.join(_TMP, 'test.db')
+os.environ['SUBMISSION_JOURNAL'] = os.path.join(_TMP, 'submissions.journal')
+os.environ['SUBMISSION_DEAD_LETTER'] = os.path.join(_TMP, 'submissions.deadletter')
+# No background history recorder / reconciler: tests call flush() / run_once()
+os.environ['HISTORY_TICK'] = '0'
+os.environ['SCORE_RECONCILE_INTERVAL'] = '0'
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+@pytest.fixture(scope='session')
+def db():
+    from db_connection import db_manager
+    from migrate import run_migrations
+    from seed_data import seed_data
+
+    assert db_manager.db_path == os.environ['DB_SQLITE_PATH']
+    assert db_manager.init_database(os.path.join(BACKEND_DIR, 'sqlite_schema.sql'))
+    run_migrations()
+    seed_data()
+    return db_manager
+
+@pytest.fixture(scope='session')
+def contest_id(db):
+    return db.execute_query("SELECT contest_id FROM contests ORDER BY contest_id LIMIT 1")[0]['contest_id']
+
+@pytest.fixture
+def level_questions(db, contest_id):
+    """Level 1 questions of the seeded contest: [{question_id, round_id, points}]"""
+    return db.execute_query("""
+        SELECT q.question_id, q.round_id, q.points FROM questions q
+        JOIN rounds r ON r.round_id = q.round_id
+        WHERE r.contest_id = %s AND r.round_number = 1
+        ORDER BY q.question_number
+    """, (contest_id,))
+
+@pytest.fixture
+def participant(db):
+    """A fresh participant per test, so tests never share score rows. Returns user_id."""
+    name = f"test-{uuid.uuid4().hex[:10]}"
+    db.execute_update(
+        "INSERT INTO users (username, email, password_hash, full_name, role, status) VALUES (%s, %s, %s, %s, 'participant', 'active')",
+        (name, f"{name}@example.com", 'x', name))
+    return db.execute_query("SELECT user_id FROM users WHERE username=%s", (name,))[0]['user_id']
+
+@pytest.fixture(scope='session')
+def app(db):
+    from app import create_app
+    return create_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='session')
+def admin_headers(db):
+    from routes.auth import create_token
+    return {'Authorization': f"Bearer {create_token('admin', role='admin')}"}
@@ -0,0 +1,30 @@
+# Async manager (db_async.py): writes must share the blocking manager's write path.
+
+import asyncio
+import pytest
+
+aiosqlite = pytest.importorskip('aiosqlite')
+
+def test_async_sqlite_write_goes_through_writer(db, monkeypatch):
+    from db_async import AsyncSQLiteBackend
+
+    kinds = []
+    submit = db.writer.submit
+
+    def spy(kind, payload):
+        kinds.append(kind)
+        return submit(kind, payload)
+
+    monkeypatch.setattr(db.writer, 'submit', spy)
+    backend = AsyncSQLiteBackend(db)
+
+    result = asyncio.run(backend.execute_update(
+        "INSERT INTO users (username, email, password_hash, full_name, role, status) VALUES (%s, %s, %s, %s, 'participant', 'active')",
+        ('async-writer', 'async-writer@example.com', 'x', 'async-writer')))
+    assert kinds == ['stmt']
+    assert result['affected'] == 1
+    assert db.execute_query("SELECT user_id FROM users WHERE username=%s", ('async-writer',))[0]['user_id'] == result['last_id']
+
+    # Errors still raise, like SQLiteManager.execute_update
+    with pytest.raises(Exception):
+        asyncio.run(backend.execute_update("INSERT INTO no_such_table VALUES (%s)", (1,)))
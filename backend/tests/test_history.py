@@ -0,0 +1,75 @@
+
+# Leaderboard history replay (utils/history.py) over the log of two workers.
+
+import json
+import pytest
+
+CONTEST, LEVEL = 9001, 1
+
+def row(user_id, score):
+    return [user_id, f"u{user_id}", f"User {user_id}", score, 1, 'IN_PROGRESS', None]
+
+@pytest.fixture(scope='module')
+def log(db):
+    events = [
+        (1000, 'K', [row(1, 10), row(2, 5)], 'a'),
+        (2000, 'K', [row(1, 10), row(2, 5)], 'b'),
+        (3000, 'D', [row(2, 20)], 'a'),          # worker a saw u2 move first
+        (4000, 'D', [row(3, 1)], 'b'),
+        (5000, 'K', [row(1, 10), row(2, 20), row(3, 1)], 'a'),
+        (6000, 'D', [[1]], 'a'),                 # u1 left the board
+    ]
+    for recorded_at, kind, payload, source in events:
+        db.execute_update(
+            "INSERT INTO leaderboard_history (contest_id, level, recorded_at, kind, payload, source) VALUES (%s, %s, %s, %s, %s, %s)",
+            (CONTEST, LEVEL, recorded_at, kind, json.dumps(payload), source))
+    return events
+
+def scores(standings):
+    return [(rank, entry['user_id'], entry['score']) for rank, entry in standings]
+
+def test_replay_follows_one_source(log):
+    from utils.history import replay
+
+    out = replay(CONTEST, LEVEL, [500, 1500, 3500, 4500, 5500, 6500])
+    assert [t for t, _ in out] == [500, 1500, 3500, 4500, 5500, 6500]
+    standings = [scores(s) for _, s in out]
+    assert standings[0] == []
+    assert standings[1] == [(1, 1, 10), (2, 2, 5)]
+    # Latest keyframe is b's: a's delta does not apply to it
+    assert standings[2] == [(1, 1, 10), (2, 2, 5)]
+    assert standings[3] == [(1, 1, 10), (2, 2, 5), (3, 3, 1)]
+    # a's keyframe switches the source back
+    assert standings[4] == [(1, 2, 20), (2, 1, 10), (3, 3, 1)]
+    assert standings[5] == [(1, 2, 20), (2, 3, 1)]
+
+def test_replay_top(log):
+    from utils.history import replay
+
+    [(t, standings)] = replay(CONTEST, LEVEL, [5500], top=1)
+    assert scores(standings) == [(1, 2, 20)]
+
+def test_recorder_skips_unknown_and_empty_boards(db, contest_id):
+    from utils.history import HistoryRecorder
+
+    def history_rows(c, l):
+        return db.execute_query("SELECT COUNT(*) AS n FROM leaderboard_history WHERE contest_id=%s AND level=%s", (c, l))[0]['n']
+
+    recorder = HistoryRecorder(tick=0)
+    recorder.mark_dirty(987654, 1)     # no such contest
+    recorder.mark_dirty(contest_id, 77)  # no such level
+    recorder.mark_dirty(contest_id, 4)   # real level, nobody on it
+    assert recorder.flush() == 0
+    assert history_rows(987654, 1) == 0
+    assert history_rows(contest_id, 77) == 0
+    assert history_rows(contest_id, 4) == 0
+    assert recorder.snapshot_stats()['skipped'] == 3
+
+    # A board with participants still gets its keyframe
+    db.execute_update(
+        "INSERT INTO participant_level_stats (user_id, contest_id, level, status) VALUES (1, %s, 4, 'IN_PROGRESS')", (contest_id,))
+    from utils.leaderboard import leaderboard_engine
+    leaderboard_engine.invalidate(contest_id, 4)
+    recorder.mark_dirty(contest_id, 4)
+    assert recorder.flush() == 1
+    assert history_rows(contest_id, 4) == 1
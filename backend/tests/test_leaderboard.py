@@ -0,0 +1,69 @@
+
+# In-memory leaderboards (utils/leaderboard.py) behind the public board routes.
+
+import pytest
+
+@pytest.mark.parametrize('url', [
+    '/api/leaderboard/?contest_id=987654&level=1',
+    '/api/leaderboard/?level=77',
+    '/api/leaderboard/history?contest_id=987654&level=3',
+    '/api/rankings/view?level=77',
+    '/api/rankings/around/1?level=77',
+])
+def test_unknown_level_creates_no_board(client, url):
+    from utils.leaderboard import leaderboard_engine
+
+    before = set(leaderboard_engine.snapshot_stats()['boards'])
+    resp = client.get(url)
+    assert resp.status_code == 404
+    assert set(leaderboard_engine.snapshot_stats()['boards']) == before
+
+def test_known_level_is_served(client, contest_id):
+    from utils.leaderboard import leaderboard_engine
+
+    resp = client.get(f'/api/leaderboard/?contest_id={contest_id}&level=1')
+    assert resp.status_code == 200
+    assert f"{contest_id}:1" in leaderboard_engine.snapshot_stats()['boards']
+
+@pytest.fixture
+def ranked_participants(db, contest_id):
+    """Five participants on level 2 (board and contest leaderboard rows), two of them tied."""
+    from utils.standings import refresh_leaderboard
+    from utils.leaderboard import leaderboard_engine
+
+    for i, score in enumerate([50, 40, 40, 30, 20]):
+        name = f"ranked-{i}-{id(db)}"
+        db.execute_update(
+            "INSERT OR IGNORE INTO users (username, email, password_hash, full_name, role, status) VALUES (%s, %s, 'x', %s, 'participant', 'active')",
+            (name, f"{name}@example.com", name))
+        uid = db.execute_query("SELECT user_id FROM users WHERE username=%s", (name,))[0]['user_id']
+        db.execute_update(
+            "INSERT OR IGNORE INTO participant_level_stats (user_id, contest_id, level, status, level_score) VALUES (%s, %s, 2, 'IN_PROGRESS', %s)",
+            (uid, contest_id, score))
+    refresh_leaderboard(contest_id)
+    leaderboard_engine.invalidate(contest_id, 2)
+
+def follow_pages(client, url, key):
+    rows, query = [], 'limit=2'
+    while query:
+        body = client.get(f"{url}{'&' if '?' in url else '?'}{query}").get_json()
+        rows += body[key]
+        page = body['page']
+        query = f"limit=2&after={page['next']}" if page['next'] else None
+    return rows
+
+@pytest.mark.parametrize('url, key', [
+    ('/api/rankings/overall', 'rankings'),
+    ('/api/rankings/view?level=2', 'rankings'),
+    ('/api/leaderboard/?level=2', 'leaderboard'),
+])
+def test_cursor_pages_match_the_full_ranking(client, ranked_participants, url, key):
+    full = client.get(url).get_json()[key]
+    assert len(full) >= 5
+    paged = follow_pages(client, url, key)
+    assert paged == full
+    assert [r['rank'] for r in paged] == list(range(1, len(full) + 1))
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/api/rankings/overall?after=abc').status_code == 400
+    assert client.get('/api/leaderboard/?level=1&after=1,2').status_code == 400
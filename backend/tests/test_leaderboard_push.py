@@ -0,0 +1,67 @@
+# Leaderboard push (utils/leaderboard_push.py): deltas carry changed rows without
+# their rank, plus the new order when it moved.
+
+import pytest
+
+KEY = (4242, 1)
+
+def entry(username, score):
+    return {'username': username, 'full_name': username.upper(), 'department': None, 'college': None,
+            'score': score, 'time_taken_sec': None, 'solved': score // 10, 'status': 'IN_PROGRESS'}
+
+class FakeEngine:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def standings(self, contest_id, level):
+        ranked = sorted(self.entries, key=lambda e: (-e['score'], e['username']))
+        return list(enumerate(ranked, start=1)), len(ranked)
+
+@pytest.fixture
+def push(monkeypatch):
+    import utils.leaderboard_push as module
+
+    engine = FakeEngine([entry(f"u{i}", 100 - i * 10) for i in range(6)])
+    monkeypatch.setattr(module, 'leaderboard_engine', engine)
+    emitted = []
+    monkeypatch.setattr(module.socketio, 'emit', lambda event, payload, to=None: emitted.append((event, payload, to)))
+    push = module.LeaderboardPush()
+    push._started = True
+    push.engine, push.emitted = engine, emitted
+    snapshot = push.subscribe('sid-a', *KEY)
+    assert [row['rank'] for row in snapshot['rows']] == [1, 2, 3, 4, 5, 6]
+    push.flush()
+    assert emitted == []
+    return push
+
+def test_climb_sends_one_row_and_the_order(push):
+    # u5 climbs from the bottom to the top: every rank moves, one row changed
+    push.engine.entries[5]['score'] = 500
+    push.mark_dirty(*KEY)
+    assert push.flush() == 1
+    event, payload, room = push.emitted[-1]
+    assert event == 'leaderboard:delta' and room == 'leaderboard:4242:1'
+    assert [row['id'] for row in payload['rows']] == ['u5']
+    assert 'rank' not in payload['rows'][0]
+    assert payload['order'] == ['u5', 'u0', 'u1', 'u2', 'u3', 'u4']
+    assert payload['removed'] == [] and payload['seq'] == 1
+
+    # A late joiner's snapshot matches what the room derived
+    snapshot = push.subscribe('sid-b', *KEY)
+    assert [(row['rank'], row['id']) for row in snapshot['rows']][:2] == [(1, 'u5'), (2, 'u0')]
+
+def test_change_without_reorder_has_no_order(push):
+    push.engine.entries[0]['score'] = 95
+    push.mark_dirty(*KEY)
+    push.flush()
+    payload = push.emitted[-1][1]
+    assert [row['id'] for row in payload['rows']] == ['u0']
+    assert payload['order'] is None
+
+def test_removed_participant(push):
+    del push.engine.entries[2]
+    push.mark_dirty(*KEY)
+    push.flush()
+    payload = push.emitted[-1][1]
+    assert payload['rows'] == [] and payload['removed'] == ['u2']
+    assert payload['order'] == ['u0', 'u1', 'u3', 'u4', 'u5']
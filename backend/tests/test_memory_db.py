@@ -0,0 +1,26 @@
+# In-memory manager (db_memory.py, DB_MODE=memory).
+
+import sqlite3
+import pytest
+
+@pytest.fixture
+def memory_db(tmp_path, monkeypatch):
+    # db_memory builds its singleton on import: point it at tmp_path first
+    monkeypatch.setenv('DB_MEMORY_SNAPSHOT', str(tmp_path / 'memory.snapshot.db'))
+    monkeypatch.setenv('DB_MEMORY_JOURNAL', str(tmp_path / 'memory.journal'))
+    from db_memory import memory_manager as manager
+
+    assert manager.journal_path.startswith(str(tmp_path))
+    manager.execute_update("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)")
+    manager.execute_update("INSERT INTO notes (body) VALUES (%s)", ('kept',))
+    yield manager
+    manager.close()
+
+def test_get_connection_copy_rejects_writes(memory_db):
+    conn = memory_db.get_connection()
+    assert [row['body'] for row in conn.execute("SELECT body FROM notes")] == ['kept']
+    # A write to the copy would be silently lost: it must fail instead
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO notes (body) VALUES ('lost')")
+    conn.close()
+    assert memory_db.execute_query("SELECT COUNT(*) AS n FROM notes")[0]['n'] == 1
@@ -0,0 +1,69 @@
+
+# Participant state push (utils/participant_push.py): a contest-wide change is
+# re-derived from the rows kept per subscriber, without reading them again.
+
+import pytest
+from check_participant_state import QueryCounter
+
+@pytest.fixture
+def push(monkeypatch):
+    import utils.participant_push as module
+
+    emitted = []
+    monkeypatch.setattr(module.socketio, 'emit', lambda event, payload, to=None: emitted.append((event, payload, to)))
+    push = module.ParticipantPush(batch=1)
+    # No background tick: the tests call flush() themselves
+    push._started = True
+    push.emitted = emitted
+    return push
+
+@pytest.fixture
+def subscribed(db, push, contest_id):
+    users = []
+    for sid in ('sid-a', 'sid-b'):
+        name = f"push-{sid}-{id(push)}"
+        db.execute_update(
+            "INSERT INTO users (username, email, password_hash, full_name, role, status) VALUES (%s, %s, 'x', %s, 'participant', 'active')",
+            (name, f"{name}@example.com", name))
+        uid = db.execute_query("SELECT user_id FROM users WHERE username=%s", (name,))[0]['user_id']
+        push.subscribe(sid, contest_id, uid)
+        users.append(uid)
+    # The diff scheduled by subscribe()
+    push.flush()
+    push.flush()
+    push.emitted.clear()
+    return users
+
+def test_contest_bump_reads_no_participant_rows(db, push, subscribed, contest_id):
+    from utils.cache import invalidate_admin_state
+
+    read_before = push.snapshot_stats()['rows_read']
+    key = f"contest_{contest_id}_level_1_released"
+    db.execute_update("INSERT INTO admin_state (key_name, value) VALUES (%s, 'true')", (key,))
+    invalidate_admin_state(key)
+    push.on_version_bump('contests')
+
+    with QueryCounter() as counter:
+        push.flush()
+    # One admin_state reload for the whole contest, none per participant
+    assert counter.count <= 1
+    pushed = {payload['user_id']: payload['changes'] for event, payload, _ in push.emitted if event == 'participant:state'}
+    assert set(pushed) == set(subscribed)
+    assert all(changes['results_released'] is True for changes in pushed.values())
+    assert push.snapshot_stats()['rows_read'] == read_before
+
+def test_user_bumps_are_spread_over_ticks(db, push, subscribed, contest_id):
+    read_before = push.snapshot_stats()['rows_read']
+    for uid in subscribed:
+        push.on_version_bump('user', uid)
+
+    with QueryCounter() as counter:
+        push.flush()
+    assert counter.count == 2
+    assert push.snapshot_stats()['pending_users'] == 1
+
+    with QueryCounter() as counter:
+        push.flush()
+    assert counter.count == 2
+    assert push.snapshot_stats()['pending_users'] == 0
+    assert push.snapshot_stats()['rows_read'] == read_before + 2
@@ -0,0 +1,37 @@
+
+# Query budget of the participant-state build (the endpoint every participant
+# polls). The latency target stays in check_participant_state.py.
+
+import pytest
+from check_participant_state import QueryCounter, MAX_QUERIES
+
+@pytest.fixture
+def solved_participant(db, participant, contest_id, level_questions):
+    q = level_questions[0]
+    db.execute_update(
+        "INSERT INTO participant_level_stats (user_id, contest_id, level, status, questions_solved, level_score) VALUES (%s, %s, 1, 'IN_PROGRESS', 1, %s)",
+        (participant, contest_id, q['points']))
+    db.execute_update(
+        "INSERT INTO submissions (user_id, contest_id, round_id, question_id, submitted_code, status, is_correct, score_awarded) "
+        "VALUES (%s, %s, %s, %s, 'print(1)', 'evaluated', 1, %s)",
+        (participant, contest_id, q['round_id'], q['question_id'], q['points']))
+    return participant
+
+def build_counted(contest_id, user_id):
+    from utils.contest_service import participant_state_logic
+
+    # First build warms the contest-wide caches (rounds, admin state, config)
+    participant_state_logic(contest_id, user_id)
+    with QueryCounter() as counter:
+        state = participant_state_logic(contest_id, user_id)
+    return state, counter.count
+
+def test_new_participant_within_query_budget(db, participant, contest_id):
+    state, queries = build_counted(contest_id, participant)
+    assert 0 < queries <= MAX_QUERIES
+    assert state['is_eliminated'] is False
+
+def test_participant_with_progress_within_query_budget(db, solved_participant, contest_id, level_questions):
+    state, queries = build_counted(contest_id, solved_participant)
+    assert 0 < queries <= MAX_QUERIES
+    assert str(level_questions[0]['question_id']) in state['solved_ids']
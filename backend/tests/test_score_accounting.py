@@ -0,0 +1,98 @@
+
+# Incremental score accounting: the journal write hook of routes/contest.py
+# (_submission_statements) and the ScoreReconciler repair path.
+
+import uuid
+import json
+import datetime
+import pytest
+
+@pytest.fixture(scope='module')
+def journal(db):
+    # Importing routes.contest registers its write hooks on the singleton
+    import routes.contest  # noqa: F401
+    from utils.submission_journal import submission_journal
+    return submission_journal
+
+def make_entry(user_id, contest_id, question, correct):
+    score = question['points'] if correct else 0
+    return {
+        'journal_id': str(uuid.uuid4()),
+        'row': {
+            'user_id': user_id, 'contest_id': contest_id, 'round_id': question['round_id'],
+            'question_id': question['question_id'], 'submitted_code': 'print(1)',
+            'status': 'evaluated', 'is_correct': 1 if correct else 0, 'test_results': json.dumps([]),
+            'score_awarded': score, 'time_taken_seconds': 0.1,
+            'submission_timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'meta': {'level': 1},
+    }
+
+def level_stats(db, user_id, contest_id):
+    res = db.execute_query(
+        "SELECT questions_solved, level_score FROM participant_level_stats WHERE user_id=%s AND contest_id=%s AND level=1",
+        (user_id, contest_id))
+    return (res[0]['questions_solved'], float(res[0]['level_score'])) if res else None
+
+def submission_count(db, user_id):
+    return db.execute_query("SELECT COUNT(*) AS n FROM submissions WHERE user_id=%s", (user_id,))[0]['n']
+
+def test_correct_submission_is_counted(db, journal, participant, contest_id, level_questions):
+    q = level_questions[0]
+    journal.persist(make_entry(participant, contest_id, q, True))
+    assert level_stats(db, participant, contest_id) == (1, float(q['points']))
+
+def test_repeated_correct_submission_counted_once(db, journal, participant, contest_id, level_questions):
+    q = level_questions[0]
+    journal.persist(make_entry(participant, contest_id, q, True))
+    journal.persist(make_entry(participant, contest_id, q, True))
+    assert submission_count(db, participant) == 2
+    assert level_stats(db, participant, contest_id) == (1, float(q['points']))
+
+    # A different question still adds up
+    other = level_questions[1]
+    journal.persist(make_entry(participant, contest_id, other, True))
+    assert level_stats(db, participant, contest_id) == (2, float(q['points'] + other['points']))
+
+def test_incorrect_submission_changes_nothing(db, journal, participant, contest_id, level_questions):
+    q = level_questions[0]
+    journal.persist(make_entry(participant, contest_id, q, False))
+    assert submission_count(db, participant) == 1
+    assert level_stats(db, participant, contest_id) is None
+
+    journal.persist(make_entry(participant, contest_id, q, True))
+    before = level_stats(db, participant, contest_id)
+    journal.persist(make_entry(participant, contest_id, level_questions[1], False))
+    assert level_stats(db, participant, contest_id) == before
+
+def test_replay_of_inserted_entry_does_not_double_count(db, journal, participant, contest_id, level_questions):
+    q = level_questions[0]
+    entry = make_entry(participant, contest_id, q, True)
+    journal.persist(entry)
+
+    # Crash before the ack: the same line is replayed on startup
+    journal.persist(dict(entry, replayed=True))
+    # ...or retried after an insert that committed but reported an error
+    journal.persist(dict(entry, retried=True))
+
+    assert submission_count(db, participant) == 1
+    assert level_stats(db, participant, contest_id) == (1, float(q['points']))
+
+def test_reconciler_repairs_tampered_row(db, journal, participant, contest_id, level_questions):
+    from utils.reconciler import ScoreReconciler
+
+    q = level_questions[0]
+    journal.persist(make_entry(participant, contest_id, q, True))
+    expected = level_stats(db, participant, contest_id)
+
+    db.execute_update(
+        "UPDATE participant_level_stats SET questions_solved = 3, level_score = 999 WHERE user_id=%s AND contest_id=%s AND level=1",
+        (participant, contest_id))
+    assert level_stats(db, participant, contest_id) == (3, 999.0)
+
+    reconciler = ScoreReconciler(interval=0)
+    assert reconciler.run_once(contest_id) >= 1
+    assert level_stats(db, participant, contest_id) == expected
+    # Nothing left to repair for this participant
+    reconciler.run_once(contest_id)
+    assert level_stats(db, participant, contest_id) == expected
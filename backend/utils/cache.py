@@ -0,0 +1,319 @@
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from db_connection import db_manager
+from utils.versions import bump_contests
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Small thread-safe read-through cache. Entries expire after their TTL and can be
+    dropped explicitly when the admin routes mutate the underlying rows. Cached
+    values are shared between requests and must be treated as read-only.
+    Loaders read with stale_ok=True, so they keep answering while the primary
+    is down (see db_breaker.py).
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, namespace, field):
+        ns = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        ns[field] += 1
+
+    def get_or_load(self, namespace, key, ttl, loader):
+        full_key = (namespace, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(full_key)
+            if entry and entry[0] > now:
+                self._count(namespace, 'hits')
+                return entry[1]
+            self._count(namespace, 'misses')
+
+        value = loader()
+        # execute_query returns None on DB errors: never cache a failure
+        if value is not None:
+            with self._lock:
+                self._data[full_key] = (now + ttl, value)
+        return value
+
+    def invalidate(self, namespace, key=None):
+        """Drop one key, or the whole namespace when key is None."""
+        with self._lock:
+            if key is None:
+                doomed = [k for k in self._data if k[0] == namespace]
+            else:
+                doomed = [(namespace, key)] if (namespace, key) in self._data else []
+            for k in doomed:
+                del self._data[k]
+            self._count(namespace, 'invalidations')
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for namespace, s in self._stats.items():
+                total = s['hits'] + s['misses']
+                out[namespace] = dict(s, hit_rate=round(s['hits'] / total, 3) if total else 0.0)
+            return out
+
+metadata_cache = TTLCache()
+
+class LRUCache:
+    """
+    Bounded thread-safe LRU map. Least recently used entries are dropped once
+    `maxsize` is reached; entries also expire after `ttl` seconds so a delete in
+    another worker process is picked up eventually.
+    """
+
+    def __init__(self, maxsize=5000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                self._data.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            if entry:
+                del self._data[key]
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            total = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, size=len(self._data), maxsize=self.maxsize,
+                        hit_rate=round(self._stats['hits'] / total, 3) if total else 0.0)
+
+# username -> user_id, ('id', user_id) -> user_id for numeric ids known to exist
+user_id_cache = LRUCache(maxsize=5000, ttl=300)
+# Numeric ids with no users row: short TTL, a new user may get the id later
+missing_user_ids = LRUCache(maxsize=5000, ttl=30)
+
+# Seconds. Admin mutations invalidate explicitly, the TTL only bounds staleness
+# across worker processes.
+CONTEST_TTL = 10
+ROUNDS_TTL = 5
+PROCTORING_TTL = 30
+ADMIN_STATE_TTL = 5
+QUESTION_COUNT_TTL = 30
+
+def _cid(contest_id):
+    # Route params arrive as strings, JSON bodies as ints: normalise the cache key
+    try:
+        return int(contest_id)
+    except (TypeError, ValueError):
+        return contest_id
+
+# --- CONTESTS ---
+
+def get_live_contest_id():
+    """contest_id of the live contest, or None."""
+    def load():
+        res = db_manager.execute_query("SELECT contest_id FROM contests WHERE status='live' LIMIT 1", stale_ok=True)
+        if res is None: return None
+        return [res[0]['contest_id']] if res else []
+    cached = metadata_cache.get_or_load('contests', 'live', CONTEST_TTL, load)
+    return cached[0] if cached else None
+
+def get_current_contest_id():
+    """Live contest, else the most recent one, else 1."""
+    live = get_live_contest_id()
+    if live is not None:
+        return live
+    def load():
+        res = db_manager.execute_query("SELECT contest_id FROM contests ORDER BY contest_id DESC LIMIT 1", stale_ok=True)
+        if res is None: return None
+        return [res[0]['contest_id']] if res else []
+    cached = metadata_cache.get_or_load('contests', 'latest', CONTEST_TTL, load)
+    return cached[0] if cached else 1
+
+def get_contest_ids():
+    """Set of every contest_id; lets public args be checked without a cache entry per made-up id."""
+    def load():
+        res = db_manager.execute_query("SELECT contest_id FROM contests", stale_ok=True)
+        if res is None: return None
+        return {r['contest_id'] for r in res}
+    return metadata_cache.get_or_load('contests', 'ids', CONTEST_TTL, load) or set()
+
+def invalidate_contests():
+    metadata_cache.invalidate('contests')
+    bump_contests()
+
+# --- ROUNDS ---
+
+def get_rounds(contest_id):
+    """All rounds of a contest ordered by round_number."""
+    query = """
+        SELECT round_id, round_number, round_name, status, is_locked, time_limit_minutes, allowed_language
+        FROM rounds WHERE contest_id=%s ORDER BY round_number ASC
+    """
+    cid = _cid(contest_id)
+    return metadata_cache.get_or_load('rounds', cid, ROUNDS_TTL, lambda: db_manager.execute_query(query, (cid,), stale_ok=True)) or []
+
+def get_round(contest_id, round_number):
+    try:
+        round_number = int(round_number)
+    except (TypeError, ValueError):
+        return None
+    for r in get_rounds(contest_id):
+        if r['round_number'] == round_number:
+            return r
+    return None
+
+def get_active_level(contest_id, highest=False):
+    """Lowest (or highest) active round_number, None if no round is active."""
+    active = [r['round_number'] for r in get_rounds(contest_id) if r['status'] == 'active']
+    if not active:
+        return None
+    return max(active) if highest else min(active)
+
+def invalidate_rounds(contest_id=None):
+    metadata_cache.invalidate('rounds', None if contest_id is None else _cid(contest_id))
+    bump_contests()
+
+# --- QUESTIONS ---
+
+def get_question_count(contest_id, level):
+    """Number of questions in one level of a contest."""
+    query = """
+        SELECT COUNT(*) as count
+        FROM questions q
+        JOIN rounds r ON q.round_id = r.round_id
+        WHERE r.contest_id = %s AND r.round_number = %s
+    """
+    key = (_cid(contest_id), int(level))
+    def load():
+        res = db_manager.execute_query(query, key, stale_ok=True)
+        if res is None: return None
+        return [res[0]['count']] if res else [0]
+    cached = metadata_cache.get_or_load('question_count', key, QUESTION_COUNT_TTL, load)
+    return cached[0] if cached else 0
+
+def invalidate_question_counts():
+    metadata_cache.invalidate('question_count')
+    bump_contests()
+
+# --- PROCTORING CONFIG ---
+
+def get_proctoring_config(contest_id):
+    """proctoring_config row, or None when the contest has no config."""
+    cid = _cid(contest_id)
+    def load():
+        res = db_manager.execute_query("SELECT * FROM proctoring_config WHERE contest_id = %s", (cid,), stale_ok=True)
+        if res is None: return None
+        return [res[0]] if res else []
+    cached = metadata_cache.get_or_load('proctoring_config', cid, PROCTORING_TTL, load)
+    return cached[0] if cached else None
+
+def invalidate_proctoring_config(contest_id):
+    metadata_cache.invalidate('proctoring_config', _cid(contest_id))
+    bump_contests()
+
+# --- ADMIN STATE ---
+
+def get_admin_state(key_name):
+    """Raw admin_state value (string), or None."""
+    def load():
+        res = db_manager.execute_query("SELECT value FROM admin_state WHERE key_name=%s", (key_name,), stale_ok=True)
+        if res is None: return None
+        return [res[0]['value']] if res else []
+    cached = metadata_cache.get_or_load('admin_state', key_name, ADMIN_STATE_TTL, load)
+    return cached[0] if cached else None
+
+def invalidate_admin_state(key_name):
+    metadata_cache.invalidate('admin_state', key_name)
+    bump_contests()
+
+# --- USER IDENTITY ---
+
+def remember_user_id(username, user_id):
+    if username and user_id:
+        user_id_cache.put(username, user_id)
+        user_id_cache.put(('id', int(user_id)), int(user_id))
+
+def resolve_user_id(identifier):
+    """
+    Numeric user_id for a username or user_id sent by the client, or None if the
+    user does not exist. Participant tokens carry the numeric id in their `uid`
+    claim, so the common case costs no query at all; numeric ids are checked
+    against `users` once and cached.
+    """
+    if identifier is None or identifier == '':
+        return None
+    if isinstance(identifier, int) or str(identifier).isdigit():
+        return _existing_user_id(int(identifier))
+    identifier = str(identifier)
+
+    # Only trust the claim when the token belongs to the user named in the request
+    from auth_middleware import get_token_claims
+    claims = get_token_claims()
+    if claims and claims.get('sub') == identifier and claims.get('uid'):
+        return claims['uid']
+
+    uid = user_id_cache.get(identifier)
+    if uid is not None:
+        return uid
+
+    res = db_manager.execute_query("SELECT user_id FROM users WHERE username=%s", (identifier,))
+    if not res:
+        return None
+    uid = res[0]['user_id']
+    user_id_cache.put(identifier, uid)
+    return uid
+
+def _existing_user_id(user_id):
+    """user_id if a users row has it, else None. Both answers are cached."""
+    if user_id_cache.get(('id', user_id)) is not None:
+        return user_id
+    if missing_user_ids.get(user_id) is not None:
+        return None
+    res = db_manager.execute_query("SELECT user_id FROM users WHERE user_id=%s", (user_id,))
+    if res is None:
+        # Lookup failed (database unavailable): trust the id rather than reject the request
+        return user_id
+    if not res:
+        missing_user_ids.put(user_id, True)
+        return None
+    user_id_cache.put(('id', user_id), user_id)
+    return user_id
+
+def invalidate_user(username=None, user_id=None):
+    """Drop one user's mappings (or all of them) after users rows change."""
+    if username is None and user_id is None:
+        user_id_cache.invalidate()
+        missing_user_ids.invalidate()
+        return
+    if username is not None:
+        user_id_cache.invalidate(username)
+    if user_id is not None:
+        user_id_cache.invalidate(('id', int(user_id)))
+        missing_user_ids.invalidate(int(user_id))
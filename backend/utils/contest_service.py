@@ -3,6 +3,8 @@ import logging
 import json
 from datetime import datetime, timedelta
 from db_connection import db_manager
+from utils.cache import invalidate_rounds, invalidate_question_counts, get_rounds, get_round, get_active_level, get_admin_state
+from utils.snapshots import freeze_level
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +45,7 @@ def create_question_logic(contest_id, round_number, data):
                 "UPDATE rounds SET time_limit_minutes=%s WHERE round_id=%s",
                 (int(time_limit), round_id)
             )
+            invalidate_rounds(contest_id)
         
         count_query = "SELECT MAX(question_number) as max_num FROM questions WHERE round_id=%s"
         count_res = db_manager.execute_query(count_query, (round_id,))
@@ -69,6 +72,7 @@ def create_question_logic(contest_id, round_number, data):
         if not res:
             logger.error(f"DB Insert Failed for Question: {title}")
             raise Exception("Failed to insert question into database.")
+        invalidate_question_counts()
             
         return {'success': True, 'question_number': next_num, 'id': res.get('last_id')}
 
@@ -83,6 +87,7 @@ def activate_level_logic(contest_id, level, wait_time=0):
         
     u_q = "UPDATE rounds SET status='active', start_time=%s WHERE contest_id=%s AND round_number=%s"
     db_manager.execute_update(u_q, (start_time, contest_id, level))
+    invalidate_rounds(contest_id)
     
     # Notify via SocketIO (Return info to caller or emit here if we import extensions)
     # Ideally service returns state, caller emits. But to centralized logic, we can emit here if extensions is safe.
@@ -93,7 +98,9 @@ def activate_level_logic(contest_id, level, wait_time=0):
 def complete_level_logic(contest_id, level):
     u_q = "UPDATE rounds SET status='completed' WHERE contest_id=%s AND round_number=%s"
     db_manager.execute_update(u_q, (contest_id, level))
-    return {'level': level}
+    invalidate_rounds(contest_id)
+    # Standings of a completed level are final: freeze them for results.html
+    return {'level': level, 'snapshot_version': freeze_level(contest_id, level, 'level_completed')}
 
 def advance_level_logic(contest_id, wait_time=0):
     # Find next pending round
@@ -105,3 +112,136 @@ def advance_level_logic(contest_id, wait_time=0):
          
     r_num = res[0]['round_number']
     return activate_level_logic(contest_id, r_num, wait_time)
+
+# --- PARTICIPANT STATE ---
+# Served by POST /contest/participant-state and pushed to the user:<id> /
+# contest:<id> Socket.IO rooms (utils/participant_push.py).
+
+# Everything participant-state needs from the user's own rows, in one round trip:
+# latest level stats, proctoring status and the levels they are shortlisted for.
+# Contest-wide inputs (rounds, countdown, release flags) come from utils/cache.py.
+PARTICIPANT_STATE_QUERY = """
+    SELECT pls.level, pls.questions_solved, pls.start_time, pls.status,
+           pp.total_violations, pp.is_disqualified, pp.disqualification_reason,
+           (SELECT GROUP_CONCAT(sp.level) FROM shortlisted_participants sp
+             WHERE sp.contest_id = %s AND sp.user_id = u.user_id AND sp.is_allowed = 1) AS shortlisted_levels
+    FROM (SELECT %s AS user_id) u
+    LEFT JOIN participant_level_stats pls ON pls.user_id = u.user_id AND pls.contest_id = %s
+         AND pls.level = (SELECT MAX(level) FROM participant_level_stats WHERE user_id = u.user_id AND contest_id = %s)
+    LEFT JOIN participant_proctoring pp ON pp.id = (
+         SELECT id FROM participant_proctoring WHERE user_id = u.user_id AND contest_id = %s LIMIT 1)
+"""
+# Kept out of the query above: the list is unbounded and GROUP_CONCAT truncates on MySQL
+SOLVED_IDS_QUERY = "SELECT question_id FROM submissions WHERE user_id=%s AND contest_id=%s AND is_correct=1"
+
+# Keys of the participant state that are the same for everyone in the contest
+CONTEST_STATE_KEYS = ('global_level', 'global_level_status', 'rounds_map', 'countdown')
+
+def _default_duration(level):
+    if level <= 3: return 20
+    if level == 4: return 30
+    return 45
+
+def contest_state_logic(contest_id):
+    """Contest-wide part of the participant state, from the metadata cache only."""
+    # ALL Round Statuses (Single Source of Truth)
+    rounds_map = {r['round_number']: r['status'] for r in get_rounds(contest_id)}
+    if rounds_map.get(1) == 'pending' or 1 not in rounds_map:
+        rounds_map[1] = 'active'
+
+    # Decode Countdown State
+    countdown_data = {'active': False}
+    cd_value = get_admin_state(f"contest_{contest_id}_countdown")
+    if cd_value:
+        try:
+            countdown_data = json.loads(cd_value)
+        except: pass
+
+    return {
+        'global_level': get_active_level(contest_id) or 1,
+        'global_level_status': 'active',
+        'rounds_map': rounds_map,
+        'countdown': countdown_data
+    }
+
+def participant_state_logic(contest_id, uid, contest_state=None):
+    """
+    Full participant state of one user (two queries). contest_state: a
+    contest_state_logic() result to reuse when building many users at once.
+    """
+    return participant_state_from_rows(contest_id, participant_rows(contest_id, uid), contest_state)
+
+def participant_rows(contest_id, uid):
+    """The user's own inputs of the participant state, (row, solved_ids): the two queries."""
+    res = db_manager.execute_query(PARTICIPANT_STATE_QUERY, (contest_id, uid, contest_id, contest_id, contest_id))
+    row = res[0] if res else {}
+    s_res = db_manager.execute_query(SOLVED_IDS_QUERY, (uid, contest_id))
+    solved_ids = [str(r['question_id']) for r in s_res] if s_res else []
+    return row, solved_ids
+
+def participant_state_from_rows(contest_id, rows, contest_state=None):
+    """
+    Participant state from participant_rows() plus the contest-wide metadata
+    cache; runs no query once the cache is warm. Used on its own to re-derive
+    the state after a contest-wide change (utils/participant_push.py).
+    """
+    row, solved_ids = rows
+    contest = contest_state or contest_state_logic(contest_id)
+    global_active_level = contest['global_level']
+
+    current_state = None
+    if row.get('level') is not None:
+        current_state = {k: row[k] for k in ('level', 'questions_solved', 'start_time', 'status')}
+
+    # CLAMP: Ensure user cannot be ahead of the global active round
+    if current_state and current_state['level'] > global_active_level:
+        current_state['level'] = global_active_level
+        # Reset status for this view to avoid confusion
+        current_state['status'] = 'NOT_STARTED' # Force them to 'enter' again if needed
+
+    # Elimination comes from participant_proctoring only (source of truth set in
+    # proctoring.py). Not being shortlisted for the active level is enforced at
+    # login (auth.py), not reported here.
+    total_violations = row.get('total_violations') or 0
+    is_disqualified_state = bool(row.get('is_disqualified'))
+    disq_reason = row.get('disqualification_reason')
+
+    # Levels the user is allowed INTO (shortlisted_participants.level)
+    shortlisted = {int(l) for l in str(row.get('shortlisted_levels') or '').split(',') if l}
+
+    # Duration (With Strict Defaults + Admin Override)
+    level_duration = _default_duration(current_state['level'] if current_state else 1)
+    if current_state:
+        round_cfg = get_round(contest_id, current_state['level'])
+        if round_cfg and round_cfg['time_limit_minutes'] and round_cfg['time_limit_minutes'] > 0:
+            level_duration = round_cfg['time_limit_minutes']
+
+    # Format Start Time (Strict UTC with Z to prevent browser drift)
+    def format_utc(dt):
+        if not dt: return None
+        # Ensure it's treated as UTC. 
+        # If the DB returned a naive object, we just add Z.
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    # Results Released State
+    # Logic: If I am in Level 1, and Level 1 Results are released, I need to know if I am in Level 2 Shortlist.
+    current_level_num = current_state['level'] if current_state else 1
+    results_released = get_admin_state(f"contest_{contest_id}_level_{current_level_num}_released") == 'true'
+    is_shortlisted_next = results_released and (current_level_num + 1) in shortlisted
+
+    state = {
+        'success': True,
+        'level': current_level_num,
+        'level_duration_minutes': level_duration,
+        'violations': total_violations,
+        'solved': current_state['questions_solved'] if current_state else 0,
+        'solved_ids': solved_ids,
+        'status': current_state['status'] or 'NOT_STARTED' if current_state else 'NOT_STARTED',
+        'start_time': format_utc(current_state['start_time']) if current_state else None,
+        'is_eliminated': is_disqualified_state,
+        'disqualification_reason': disq_reason,
+        'results_released': results_released,
+        'is_shortlisted_next': is_shortlisted_next
+    }
+    state.update(contest)
+    return state
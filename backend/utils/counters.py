@@ -0,0 +1,136 @@
+
+import atexit
+import threading
+import logging
+from db_connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Seconds between bulk flushes of the in-memory deltas
+FLUSH_INTERVAL = 3
+# Rows per multi-row upsert statement
+FLUSH_CHUNK = 500
+
+class WriteBehindCounters:
+    """
+    Accumulates hot increments (e.g. run_count per click) in memory and writes
+    them to `table` in bulk upserts every FLUSH_INTERVAL seconds and at exit.
+    Readers add pending() / pending_by() on top of what the database returns, so
+    totals stay exact between flushes (per worker process).
+    """
+
+    def __init__(self, table, key_columns, fields, flush_interval=FLUSH_INTERVAL):
+        self.table = table
+        self.key_columns = list(key_columns)
+        self.fields = list(fields)
+        self.flush_interval = flush_interval
+        self._pending = {}
+        # Batch currently being written; still counted by readers until committed
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.stats = {'increments': 0, 'flushes': 0, 'rows_flushed': 0, 'failures': 0}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.table}-counters", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def incr(self, key, field, amount=1):
+        self._ensure_started()
+        with self._lock:
+            deltas = self._pending.setdefault(tuple(key), dict.fromkeys(self.fields, 0))
+            deltas[field] += amount
+            self.stats['increments'] += 1
+
+    def pending(self, key):
+        """Unflushed deltas for one exact key."""
+        totals = dict.fromkeys(self.fields, 0)
+        with self._lock:
+            for source in (self._pending, self._inflight):
+                for f, v in source.get(tuple(key), {}).items():
+                    totals[f] += v
+        return totals
+
+    def pending_by(self, column):
+        """Unflushed deltas summed per value of one key column, e.g. per user_id."""
+        idx = self.key_columns.index(column)
+        out = {}
+        with self._lock:
+            for key, deltas in list(self._pending.items()) + list(self._inflight.items()):
+                totals = out.setdefault(key[idx], dict.fromkeys(self.fields, 0))
+                for f, v in deltas.items():
+                    totals[f] += v
+        return out
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.flush_interval):
+            self.flush()
+
+    def _upsert_sql(self, n_rows):
+        cols = self.key_columns + self.fields
+        row = '(' + ', '.join(['%s'] * len(cols)) + ')'
+        values = ', '.join([row] * n_rows)
+        if db_manager.dialect == 'sqlite':
+            updates = ', '.join(f"{f} = COALESCE({f}, 0) + excluded.{f}" for f in self.fields)
+            return (f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES {values} "
+                    f"ON CONFLICT({', '.join(self.key_columns)}) DO UPDATE SET {updates}")
+        updates = ', '.join(f"{f} = COALESCE({f}, 0) + VALUES({f})" for f in self.fields)
+        return f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES {values} ON DUPLICATE KEY UPDATE {updates}"
+
+    def flush(self):
+        """Write all pending deltas. Failed chunks are put back for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+
+            items = list(batch.items())
+            written = 0
+            failed = []
+            for start in range(0, len(items), FLUSH_CHUNK):
+                chunk = items[start:start + FLUSH_CHUNK]
+                params = []
+                for key, deltas in chunk:
+                    params.extend(key)
+                    params.extend(deltas[f] for f in self.fields)
+                try:
+                    res = db_manager.execute_update(self._upsert_sql(len(chunk)), tuple(params))
+                    if not res:
+                        raise RuntimeError("bulk upsert returned no result")
+                    written += len(chunk)
+                except Exception as e:
+                    self.stats['failures'] += 1
+                    logger.error(f"Counter flush to {self.table} failed ({len(chunk)} rows), retrying later: {e}")
+                    failed.extend(chunk)
+
+            # Put failed rows back and drop the in-flight view atomically
+            with self._lock:
+                for key, deltas in failed:
+                    current = self._pending.setdefault(key, dict.fromkeys(self.fields, 0))
+                    for f, v in deltas.items():
+                        current[f] += v
+                self._inflight = {}
+
+            self.stats['flushes'] += 1
+            self.stats['rows_flushed'] += written
+            return written
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, pending_rows=len(self._pending))
+
+# Per (user, contest, level) execution counters behind /contest/run
+level_counters = WriteBehindCounters(
+    'participant_level_stats',
+    ('user_id', 'contest_id', 'level'),
+    ('run_count',)
+)
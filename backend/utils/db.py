@@ -11,19 +11,35 @@ class MySQLBridge:
     def table(self, table_name):
         return MySQLTable(table_name)
     
-    def execute_query(self, query, params=None):
-        return db_manager.execute_query(query, params)
+    def execute_query(self, query, params=None, primary=False, stale_ok=False):
+        return db_manager.execute_query(query, params, primary=primary, stale_ok=stale_ok)
 
-    def execute_update(self, query, params=None):
-        return db_manager.execute_update(query, params)
+    def execute_update(self, query, params=None, defer=False):
+        return db_manager.execute_update(query, params, defer=defer)
+
+    def stream_query(self, query, params=None):
+        return db_manager.stream_query(query, params)
 
 class MySQLTable:
+    # Frontend-facing aliases for the users table (alias -> native column)
+    USER_ALIASES = {'participant_id': 'username', 'name': 'full_name'}
+
     def __init__(self, table_name):
         self.table_name = table_name
-        self.filters = {}
+        self.pk_col = f"{table_name.rstrip('s')}_id"
+        self.columns = []
+        self.filters = []  # (column, operator, value)
+        self.order_by = []
+        self.limit_count = None
+        self.offset_count = None
         self.update_data = {}
 
     def select(self, *args):
+        """Supabase style projection: select('id, title') or select('id', 'title'). Default '*'."""
+        cols = []
+        for arg in args:
+            cols.extend(c.strip() for c in arg.split(',') if c.strip())
+        self.columns = [] if cols == ['*'] else cols
         return self
 
     def insert(self, data):
@@ -38,67 +54,145 @@ class MySQLTable:
         self.update_data = data
         return self
 
+    def _filter(self, column, operator, value):
+        self.filters.append((column, operator, value))
+        return self
+
     def eq(self, column, value):
-        self.filters[column] = value
+        return self._filter(column, '=', value)
+
+    def neq(self, column, value):
+        return self._filter(column, '<>', value)
+
+    def gt(self, column, value):
+        return self._filter(column, '>', value)
+
+    def gte(self, column, value):
+        return self._filter(column, '>=', value)
+
+    def lt(self, column, value):
+        return self._filter(column, '<', value)
+
+    def lte(self, column, value):
+        return self._filter(column, '<=', value)
+
+    def in_(self, column, values):
+        return self._filter(column, 'IN', list(values))
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.limit_count = int(count)
+        return self
+
+    def range(self, start, end):
+        """Supabase style inclusive row range, e.g. range(0, 9) -> first 10 rows."""
+        self.offset_count = int(start)
+        self.limit_count = int(end) - int(start) + 1
         return self
 
     def delete(self):
         self.is_delete = True
         return self
 
+    def _native(self, column):
+        # Translate 'id' (and users aliases) to the native column
+        if column == 'id':
+            return self.pk_col
+        if self.table_name == 'users':
+            return self.USER_ALIASES.get(column, column)
+        return column
+
+    def _where(self):
+        clauses = []
+        values = []
+        for column, operator, value in self.filters:
+            col = self._native(column)
+            if operator == 'IN':
+                if not value:
+                    clauses.append("1=0")
+                    continue
+                clauses.append(f"{col} IN ({', '.join(['%s'] * len(value))})")
+                values.extend(value)
+            else:
+                clauses.append(f"{col} {operator} %s")
+                values.append(value)
+        where_clause = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where_clause, tuple(values)
+
+    def _projection(self):
+        if not self.columns:
+            return "*"
+        # Always fetch the native column behind an alias so the row mapper can fill it in
+        cols = []
+        for c in self.columns:
+            native = self._native(c)
+            if native not in cols:
+                cols.append(native)
+        return ", ".join(cols)
+
+    def _map_row(self, row):
+        # Single pass, in place: rows are fresh dicts from the cursor
+        if self.pk_col in row and 'id' not in row:
+            row['id'] = row[self.pk_col]
+
+        # Special mapping for users table to match frontend expectations
+        if self.table_name == 'users':
+            for alias, native in self.USER_ALIASES.items():
+                if native in row:
+                    row[alias] = row[native]
+        return row
+
+    def _reset(self):
+        self.columns = []
+        self.filters = []
+        self.order_by = []
+        self.limit_count = None
+        self.offset_count = None
+        self.update_data = {}
+        self.is_delete = False
+
     def execute(self):
-        pk_col = f"{self.table_name.rstrip('s')}_id"
         is_delete = getattr(self, 'is_delete', False)
-        
-        # Translate 'id' in filters to native PK column
-        mapped_filters = {}
-        for k, v in self.filters.items():
-            if k == 'id':
-                mapped_filters[pk_col] = v
-            else:
-                mapped_filters[k] = v
+        where_clause, where_values = self._where()
+
+        if (is_delete or self.update_data) and not where_clause:
+            # Never touch the whole table by accident: a filter is required
+            self._reset()
+            raise ValueError(f"{'DELETE' if is_delete else 'UPDATE'} on {self.table_name} without filters")
 
         if is_delete:
-            where_clause = " AND ".join([f"{k} = %s" for k in mapped_filters.keys()])
-            values = tuple(mapped_filters.values())
-            query = f"DELETE FROM {self.table_name} WHERE {where_clause}"
-            db_manager.execute_update(query, values)
-            self.is_delete = False
+            query = f"DELETE FROM {self.table_name}{where_clause}"
+            db_manager.execute_update(query, where_values)
+            self._reset()
             return type('obj', (object,), {'success': True})
         elif self.update_data:
             # Handle UPDATE
             set_clause = ", ".join([f"{k} = %s" for k in self.update_data.keys()])
-            where_clause = " AND ".join([f"{k} = %s" for k in mapped_filters.keys()])
-            values = tuple(list(self.update_data.values()) + list(mapped_filters.values()))
-            query = f"UPDATE {self.table_name} SET {set_clause} WHERE {where_clause}"
+            values = tuple(self.update_data.values()) + where_values
+            query = f"UPDATE {self.table_name} SET {set_clause}{where_clause}"
             db_manager.execute_update(query, values)
-            self.update_data = {} # Reset
+            self._reset()
             return type('obj', (object,), {'success': True})
         else:
             # Handle SELECT
-            where_clause = ""
-            values = ()
-            if mapped_filters:
-                where_clause = " WHERE " + " AND ".join([f"{k} = %s" for k in mapped_filters.keys()])
-                values = tuple(mapped_filters.values())
-            
-            query = f"SELECT * FROM {self.table_name}{where_clause}"
-            res = db_manager.execute_query(query, values)
-            
+            query = f"SELECT {self._projection()} FROM {self.table_name}{where_clause}"
+            if self.order_by:
+                query += " ORDER BY " + ", ".join(
+                    f"{self._native(c)} {'DESC' if desc else 'ASC'}" for c, desc in self.order_by
+                )
+            if self.limit_count is not None:
+                query += f" LIMIT {self.limit_count}"
+                if self.offset_count:
+                    query += f" OFFSET {self.offset_count}"
+
+            res = db_manager.execute_query(query, where_values)
+            self._reset()
+
             # Map primary keys like contest_id to 'id' for frontend compatibility
-            transformed = []
-            if res:
-                for item in res:
-                    new_item = item.copy()
-                    if pk_col in item and 'id' not in item:
-                        new_item['id'] = item[pk_col]
-                    
-                    # Special mapping for users table to match frontend expectations
-                    if self.table_name == 'users':
-                        if 'username' in item: new_item['participant_id'] = item['username']
-                        if 'full_name' in item: new_item['name'] = item['full_name']
-                        
-                    transformed.append(new_item)
+            transformed = [self._map_row(item) for item in res] if res else []
             return type('obj', (object,), {'data': transformed})
 
 
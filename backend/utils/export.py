@@ -0,0 +1,34 @@
+
+import io
+import csv
+from flask import Response
+
+# Flush the CSV buffer to the client once it grows past this many characters
+CHUNK_SIZE = 16 * 1024
+
+def iter_csv(header, rows):
+    """
+    Encode rows as CSV lazily. `rows` can be any iterable (e.g. db_manager.stream_query
+    mapped through a formatter), only one chunk is ever held in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def csv_response(filename, header, rows):
+    """Streaming CSV download, rows are written as they are fetched."""
+    return Response(
+        iter_csv(header, rows),
+        mimetype="text/csv",
+        headers={"Content-disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,210 @@
+
+import os
+import json
+import time
+import datetime
+import threading
+import logging
+from db_connection import db_manager
+from utils.leaderboard import leaderboard_engine, LevelBoard
+from utils.versions import BOOT_ID
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard history for replays: an append-only log per (contest, level) in
+# `leaderboard_history`, written by a background recorder.
+#
+#   kind 'K' keyframe: every entry of the board
+#   kind 'D' delta:    only entries that changed since the previous record,
+#                      [user_id] alone for a participant that left the board
+# Entries are absolute states, [user_id, username, full_name, score, solved,
+# status, time_taken_sec]; ranks are derived with the engine's rank_key when
+# replaying. recorded_at is epoch milliseconds (UTC).
+#
+# Every worker records its own boards, so rows carry the recording process's
+# BOOT_ID in `source`. A delta only applies on top of a record of its own source:
+# replay follows the source of the latest keyframe and skips other sources'
+# deltas, switching source only at a keyframe (a full state).
+#
+# Board changes only mark the board dirty; every HISTORY_TICK seconds each dirty
+# board is diffed against the last record and one delta row is appended. A
+# keyframe is written on the first record of a process and then every
+# HISTORY_KEYFRAME_EVERY deltas or HISTORY_KEYFRAME_SECONDS, so reading the
+# standings at time T replays at most one keyframe plus the deltas after it.
+HISTORY_TICK = float(os.getenv('HISTORY_TICK', 5))
+HISTORY_KEYFRAME_EVERY = int(os.getenv('HISTORY_KEYFRAME_EVERY', 100))
+HISTORY_KEYFRAME_SECONDS = int(os.getenv('HISTORY_KEYFRAME_SECONDS', 600))
+MAX_SERIES_POINTS = 200
+
+INSERT_EVENT = "INSERT INTO leaderboard_history (contest_id, level, recorded_at, kind, payload, source) VALUES (%s, %s, %s, %s, %s, %s)"
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+def _encode(entry):
+    return [entry['user_id'], entry['username'], entry['full_name'], entry['score'],
+            entry['solved'], entry['status'], entry['time_taken_sec']]
+
+def _decode(row):
+    user_id, username, full_name, score, solved, status, time_taken = row
+    return {'user_id': user_id, 'username': username, 'full_name': full_name, 'department': None, 'college': None,
+            'score': score, 'solved': solved, 'status': status, 'time_taken_sec': time_taken}
+
+class HistoryRecorder:
+    def __init__(self, tick=HISTORY_TICK):
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._state = {}       # (contest, level) -> {user_id: encoded entry} as last recorded
+        self._keyframe = {}    # (contest, level) -> (deltas since keyframe, monotonic time of keyframe)
+        self._thread = None
+        self.stats = {'keyframes': 0, 'deltas': 0, 'entries': 0, 'write_failures': 0, 'skipped': 0}
+
+    def start(self):
+        if self.tick <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="leaderboard-history", daemon=True)
+            self._thread.start()
+
+    def mark_dirty(self, contest_id, level):
+        with self._lock:
+            self._dirty.add((contest_id, level))
+
+    def flush(self):
+        """Append one record per dirty board. Returns the number of rows written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        written = 0
+        for key in sorted(dirty):
+            if not leaderboard_engine.has_level(*key):
+                # Only real rounds get a history, whatever marked the key dirty
+                self.stats['skipped'] += 1
+                continue
+            standings, _ = leaderboard_engine.standings(*key)
+            current = {entry['user_id']: _encode(entry) for _, entry in standings}
+            previous = self._state.get(key)
+            if not current and not previous:
+                # Nothing to replay yet: no empty keyframe per idle or unseen board
+                self.stats['skipped'] += 1
+                continue
+            count, since = self._keyframe.get(key, (0, 0))
+
+            if previous is None or count >= HISTORY_KEYFRAME_EVERY or time.monotonic() - since >= HISTORY_KEYFRAME_SECONDS:
+                kind, payload = 'K', list(current.values())
+            else:
+                payload = [row for user_id, row in current.items() if previous.get(user_id) != row]
+                payload += [[user_id] for user_id in previous if user_id not in current]
+                if not payload:
+                    continue
+                kind = 'D'
+
+            try:
+                # defer=True: while the primary is down the row is queued with its original timestamp
+                db_manager.execute_update(INSERT_EVENT, (key[0], key[1], _now_ms(), kind, json.dumps(payload, separators=(',', ':')), BOOT_ID), defer=True)
+            except Exception as e:
+                self.stats['write_failures'] += 1
+                logger.error(f"Leaderboard history write failed for {key}: {e}")
+                with self._lock:
+                    self._dirty.add(key)
+                continue
+
+            self._state[key] = current
+            self._keyframe[key] = (0, time.monotonic()) if kind == 'K' else (count + 1, since)
+            self.stats['keyframes' if kind == 'K' else 'deltas'] += 1
+            self.stats['entries'] += len(payload)
+            written += 1
+        return written
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Leaderboard history tick failed: {e}")
+
+    def snapshot_stats(self):
+        return dict(self.stats, tick=self.tick, boards=len(self._state))
+
+history_recorder = HistoryRecorder()
+leaderboard_engine.add_listener(history_recorder.mark_dirty)
+
+# --- REPLAY ---
+
+def parse_timestamp(value):
+    """Epoch ms from epoch seconds/ms or an ISO-8601 UTC string. None if empty or invalid."""
+    if value in (None, ''):
+        return None
+    try:
+        number = float(value)
+        # Anything before ~1973 in ms is taken as seconds
+        return int(number * 1000) if number < 1e11 else int(number)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.datetime.fromisoformat(str(value).replace('Z', ''))
+    except ValueError:
+        return None
+    return int(dt.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+def format_timestamp(ms):
+    return datetime.datetime.utcfromtimestamp(ms / 1000).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def history_bounds(contest_id, level):
+    """(first, last) recorded_at of a board's history, (None, None) when empty."""
+    res = db_manager.execute_query(
+        "SELECT MIN(recorded_at) AS first, MAX(recorded_at) AS last FROM leaderboard_history WHERE contest_id = %s AND level = %s",
+        (contest_id, level), stale_ok=True)
+    if not res or res[0]['first'] is None:
+        return None, None
+    return res[0]['first'], res[0]['last']
+
+def replay(contest_id, level, sample_times, top=None):
+    """
+    Standings at each of the (ascending) sample_times, as [(t, [(rank, entry)])].
+    Reads the last keyframe at or before the first sample, then every record up
+    to the last sample, in two indexed queries. One board is kept across the
+    samples: records move its entries, each sample reads its first `top` ranks.
+    """
+    if not sample_times:
+        return []
+    first, last = sample_times[0], sample_times[-1]
+    keyframe = db_manager.execute_query(
+        "SELECT recorded_at FROM leaderboard_history WHERE contest_id = %s AND level = %s AND kind = 'K' AND recorded_at <= %s "
+        "ORDER BY recorded_at DESC LIMIT 1", (contest_id, level, first), stale_ok=True)
+    start = keyframe[0]['recorded_at'] if keyframe else 0
+    events = db_manager.execute_query(
+        "SELECT recorded_at, kind, payload, source FROM leaderboard_history WHERE contest_id = %s AND level = %s "
+        "AND recorded_at >= %s AND recorded_at <= %s ORDER BY recorded_at, event_id",
+        (contest_id, level, start, last), stale_ok=True) or []
+
+    board, source, out, idx = LevelBoard(contest_id, level), None, [], 0
+    for event in events:
+        while idx < len(sample_times) and event['recorded_at'] > sample_times[idx]:
+            out.append((sample_times[idx], board.page(0, top)))
+            idx += 1
+        if event['kind'] == 'K':
+            board, source = LevelBoard(contest_id, level), event['source']
+        elif event['source'] != source:
+            # Delta of another worker's log, relative to a state this board never had
+            continue
+        for row in json.loads(event['payload']):
+            if len(row) == 1:
+                board.remove(row[0])
+            else:
+                board.upsert(_decode(row))
+    while idx < len(sample_times):
+        out.append((sample_times[idx], board.page(0, top)))
+        idx += 1
+    return out
+
+def series_times(start, end, points):
+    """points evenly spaced timestamps from start to end inclusive."""
+    points = max(1, min(points, MAX_SERIES_POINTS))
+    if points == 1 or end <= start:
+        return [end]
+    step = (end - start) / (points - 1)
+    return [int(start + i * step) for i in range(points)]
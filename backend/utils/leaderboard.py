@@ -0,0 +1,407 @@
+
+import os
+import time
+import datetime
+import threading
+import logging
+from bisect import bisect_left, bisect_right, insort
+from db_connection import db_manager
+from utils.versions import bump_board
+from utils.cache import get_round, get_contest_ids
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a board is reloaded from the database. Events keep the board
+# exact inside this process; the reload picks up writes made by other workers.
+RESYNC_SECONDS = int(os.getenv('LEADERBOARD_RESYNC', 60))
+
+BOARD_QUERY = """
+    SELECT pls.user_id, u.username, u.full_name, u.department, u.college,
+           pls.level_score, pls.questions_solved, pls.status, pls.start_time, pls.completed_at
+    FROM participant_level_stats pls
+    JOIN users u ON pls.user_id = u.user_id
+    WHERE u.role = 'participant' AND pls.contest_id = %s AND pls.level = %s
+"""
+
+ROW_QUERY = BOARD_QUERY + " AND pls.user_id = %s"
+
+# Largest page a client can ask for with ?limit= / ?top=
+MAX_PAGE_SIZE = 500
+
+class _BisectList:
+    """Plain sorted list, used when sortedcontainers is not installed."""
+
+    def __init__(self):
+        self._items = []
+
+    def add(self, item):
+        insort(self._items, item)
+
+    def remove(self, item):
+        del self._items[bisect_left(self._items, item)]
+
+    def index(self, item):
+        return bisect_left(self._items, item)
+
+    def bisect_right(self, item):
+        return bisect_right(self._items, item)
+
+    def __getitem__(self, idx):
+        return self._items[idx]
+
+    def __len__(self):
+        return len(self._items)
+
+def _to_datetime(value):
+    # MySQL returns datetimes, SQLite returns ISO text
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace('Z', ''))
+    except ValueError:
+        return None
+
+def normalize_row(row):
+    """Board entry from a BOARD_QUERY row: typed values plus time_taken_sec."""
+    start, done = _to_datetime(row.get('start_time')), _to_datetime(row.get('completed_at'))
+    time_taken = int((done - start).total_seconds()) if start and done else None
+    return {
+        'user_id': row['user_id'],
+        'username': row['username'],
+        'full_name': row.get('full_name'),
+        'department': row.get('department'),
+        'college': row.get('college'),
+        'score': float(row.get('level_score') or 0),
+        'solved': row.get('questions_solved') or 0,
+        'status': row.get('status'),
+        'start_time': start,
+        'completed_at': done,
+        'time_taken_sec': time_taken,
+    }
+
+def rank_key(entry):
+    # score desc, completed first, fastest first; user_id keeps the order total
+    time_taken = entry['time_taken_sec']
+    return (
+        -entry['score'],
+        0 if entry['status'] == 'COMPLETED' else 1,
+        time_taken if time_taken is not None else float('inf'),
+        entry['user_id'],
+    )
+
+class LevelBoard:
+    """Participants of one (contest, level), kept sorted by rank_key."""
+
+    def __init__(self, contest_id, level, rows=()):
+        self.contest_id = contest_id
+        self.level = level
+        self._order = SortedList() if SortedList is not None else _BisectList()
+        self._entries = {}
+        self.loaded_at = time.monotonic()
+        for row in rows:
+            self.upsert(normalize_row(row))
+
+    def upsert(self, entry):
+        """Insert or move one participant. Returns (old_rank, new_rank), 1-based."""
+        old = self._entries.get(entry['user_id'])
+        old_rank = None
+        if old is not None:
+            old_key = rank_key(old)
+            old_rank = self._order.index(old_key) + 1
+            self._order.remove(old_key)
+        key = rank_key(entry)
+        self._order.add(key)
+        self._entries[entry['user_id']] = entry
+        return old_rank, self._order.index(key) + 1
+
+    def remove(self, user_id):
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            self._order.remove(rank_key(old))
+
+    def rank(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return self._order.index(rank_key(entry)) + 1
+
+    def entry(self, user_id):
+        return self._entries.get(user_id)
+
+    def offset_after(self, key):
+        """Number of entries ranked at or before rank_key `key` (a page cursor), by bisection."""
+        return self._order.bisect_right(key)
+
+    def page(self, offset=0, limit=None):
+        """[(rank, entry)] for ranks offset+1 .. offset+limit."""
+        stop = len(self._order) if limit is None else min(len(self._order), offset + limit)
+        return [(i + 1, self._entries[self._order[i][3]]) for i in range(max(offset, 0), stop)]
+
+    def __len__(self):
+        return len(self._order)
+
+class LeaderboardEngine:
+    """
+    In-memory leaderboards per (contest, level). A board is loaded from the
+    database on first use (or warm() at startup) and then kept current by
+    refresh_user() calls from the submission/level routes, so reads never
+    query the database. Boards older than RESYNC_SECONDS are reloaded.
+    Returned entries are shared and must be treated as read-only.
+    """
+
+    def __init__(self, resync_seconds=RESYNC_SECONDS):
+        self.resync_seconds = resync_seconds
+        self._boards = {}
+        self._lock = threading.RLock()
+        # (contest, level) -> user_ids refreshed while that board was loading
+        self._loading = {}
+        self.stats = {'loads': 0, 'load_failures': 0, 'updates': 0, 'reads': 0, 'unknown_levels': 0}
+        self._listeners = []
+
+    @staticmethod
+    def _key(contest_id, level):
+        return (int(contest_id), int(level))
+
+    def add_listener(self, fn):
+        """fn(contest_id, level) runs after a board changed, was reloaded or dropped (outside the lock)."""
+        self._listeners.append(fn)
+
+    def _changed(self, key):
+        bump_board(*key)
+        for fn in self._listeners:
+            try:
+                fn(*key)
+            except Exception as e:
+                logger.error(f"Leaderboard listener failed: {e}")
+
+    def _load(self, key):
+        with self._lock:
+            if key in self._loading:
+                # Another thread is loading it: serve what we have meanwhile
+                return self._boards.get(key)
+            self._loading[key] = set()
+        try:
+            rows = db_manager.execute_query(BOARD_QUERY, key, stale_ok=True)
+            with self._lock:
+                dirty = self._loading.pop(key)
+                if rows is None:
+                    self.stats['load_failures'] += 1
+                    board = self._boards.get(key)
+                    if board is not None:
+                        # Keep the old board, retry on the next resync
+                        board.loaded_at = time.monotonic()
+                    return board
+                board = LevelBoard(key[0], key[1], rows)
+                self._boards[key] = board
+                self.stats['loads'] += 1
+            self._changed(key)
+        except Exception:
+            with self._lock:
+                self._loading.pop(key, None)
+            raise
+        # Updates that raced with the load may be missing from its rows
+        for user_id in dirty:
+            self.refresh_user(key[0], key[1], user_id)
+        return board
+
+    @staticmethod
+    def has_level(contest_id, level):
+        """True when (contest, level) is a round of the contest (metadata cache, no query when warm)."""
+        try:
+            contest_id, level = int(contest_id), int(level)
+        except (TypeError, ValueError):
+            return False
+        return contest_id in get_contest_ids() and get_round(contest_id, level) is not None
+
+    def board(self, contest_id, level):
+        """
+        LevelBoard for (contest, level), loading it if needed. None if the DB is
+        down and nothing is cached, or if the pair is not a round of the contest:
+        boards are never evicted, so request args alone must not create one.
+        """
+        key = self._key(contest_id, level)
+        with self._lock:
+            board = self._boards.get(key)
+            self.stats['reads'] += 1
+        if board is None and not self.has_level(*key):
+            self.stats['unknown_levels'] += 1
+            return None
+        if board is None or time.monotonic() - board.loaded_at > self.resync_seconds:
+            board = self._load(key) or board
+        return board
+
+    def standings(self, contest_id, level, offset=0, limit=None, after=None):
+        """
+        ([(rank, entry)], total) for one page of the board. after: rank_key of
+        the last row already seen (page cursor), replaces offset.
+        """
+        board = self.board(contest_id, level)
+        if board is None:
+            return [], 0
+        with self._lock:
+            if after is not None:
+                offset = board.offset_after(after)
+            return board.page(offset, limit), len(board)
+
+    def top(self, contest_id, level, k):
+        return self.standings(contest_id, level, 0, k)[0]
+
+    def around(self, contest_id, level, user_id, n):
+        """(rows, rank, total): up to n participants above and below user_id, inclusive."""
+        board = self.board(contest_id, level)
+        if board is None:
+            return [], None, 0
+        with self._lock:
+            rank = board.rank(user_id)
+            if rank is None:
+                return [], None, len(board)
+            return board.page(max(rank - 1 - n, 0), 2 * n + 1), rank, len(board)
+
+    def rank_of(self, contest_id, level, user_id):
+        """(rank, entry) of one participant, (None, None) if not on the board."""
+        board = self.board(contest_id, level)
+        if board is None:
+            return None, None
+        with self._lock:
+            return board.rank(user_id), board.entry(user_id)
+
+    def warm(self, contest_id, levels):
+        """Load the boards of a contest up front (called at startup)."""
+        for level in levels:
+            self.board(contest_id, level)
+
+    def refresh_user(self, contest_id, level, user_id):
+        """Re-read one participant's stats row and move them on the board. O(log n)."""
+        key = self._key(contest_id, level)
+        with self._lock:
+            if key in self._loading:
+                self._loading[key].add(user_id)
+            loaded = key in self._boards
+        if not loaded:
+            # The first read loads it with this change included; ETags still move
+            bump_board(*key)
+            return None
+        rows = db_manager.execute_query(ROW_QUERY, key + (user_id,), primary=True)
+        if rows is None:
+            return None
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                return None
+            self.stats['updates'] += 1
+            if not rows:
+                if board.entry(user_id) is None:
+                    return None
+                board.remove(user_id)
+                moved = None
+            else:
+                entry = normalize_row(rows[0])
+                if entry == board.entry(user_id):
+                    # Nothing visible changed: keep the board's ETag, push nothing
+                    rank = board.rank(user_id)
+                    return rank, rank
+                moved = board.upsert(entry)
+        self._changed(key)
+        return moved
+
+    def invalidate(self, contest_id=None, level=None):
+        """Drop boards so the next read reloads them (admin deletes/resets)."""
+        with self._lock:
+            if contest_id is None:
+                doomed = list(self._boards)
+            elif level is None:
+                doomed = [k for k in self._boards if k[0] == int(contest_id)]
+            else:
+                doomed = [self._key(contest_id, level)]
+            for key in doomed:
+                self._boards.pop(key, None)
+        for key in doomed:
+            self._changed(key)
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, boards={f"{c}:{l}": len(b) for (c, l), b in self._boards.items()},
+                        backend='sortedcontainers' if SortedList is not None else 'bisect')
+
+leaderboard_engine = LeaderboardEngine()
+
+def format_board_row(rank, entry):
+    """Row shape of /api/leaderboard/ (also used by the Socket.IO push)."""
+    # Format time
+    seconds = entry['time_taken_sec']
+    if seconds is not None:
+        m, s = divmod(int(seconds), 60)
+        h, m = divmod(m, 60)
+        time_str = "{:02d}:{:02d}:{:02d}".format(h, m, s)
+    else:
+        # If not completed or calculated, show -- or duration so far?
+        # Usually leaderboard shows finalized time.
+        time_str = "--:--:--"
+
+    return {
+        'id': entry['username'],
+        'rank': rank,
+        'name': entry['full_name'],
+        'department': entry['department'],
+        'college': entry['college'],
+        'score': entry['score'],
+        'time': time_str,
+        'solved': entry['solved'],
+        'status': entry['status']
+    }
+
+# --- PAGINATION ---
+
+def page_window(args):
+    """
+    (offset, limit, after) from request args. ?top=K returns the first K rows;
+    ?offset=&limit= pages by position (rows before the offset are skipped);
+    ?after=<cursor>&limit= is keyset paging: the cursor is page.next of the
+    previous page, i.e. the (rank_key, user_id) of its last row, and the page
+    starts right after that key (bisection in memory, an index range in SQL).
+    ?after_rank= alone is the same as ?offset=. No paging args means the whole
+    board. after is the raw cursor string, see decode_cursor().
+    """
+    top = args.get('top', type=int)
+    if top:
+        return 0, max(1, min(top, MAX_PAGE_SIZE)), None
+    limit = args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after_rank = args.get('after_rank', type=int)
+    offset = after_rank if after_rank is not None else args.get('offset', 0, type=int)
+    return max(offset or 0, 0), limit, args.get('after') or None
+
+def encode_cursor(key):
+    return ','.join(str(v) for v in key)
+
+def decode_cursor(text, size):
+    """Tuple of `size` numbers from encode_cursor() output, None if malformed."""
+    try:
+        values = [float(v) for v in str(text).split(',')]
+    except ValueError:
+        return None
+    if len(values) != size:
+        return None
+    return tuple(int(v) if v.is_integer() else v for v in values)
+
+def board_cursor(entry):
+    """Cursor of a board entry: its rank_key (user_id last, so it is unique)."""
+    return encode_cursor(rank_key(entry))
+
+def page_info(offset, limit, returned, total, next_cursor=None):
+    last_rank = offset + returned
+    more = last_rank < total
+    return {
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'next_after_rank': last_rank if more else None,
+        # ?after= value of the next page (keyset paging)
+        'next': next_cursor if more and returned else None
+    }
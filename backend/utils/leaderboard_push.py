@@ -0,0 +1,189 @@
+
+import os
+import threading
+import logging
+from flask import request
+from flask_socketio import join_room, leave_room, emit
+from extensions import socketio
+from utils.cache import get_current_contest_id, get_question_count
+from utils.leaderboard import leaderboard_engine, format_board_row
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard push over Socket.IO.
+#
+# Screens join the room `leaderboard:<contest>:<level>` with a 'leaderboard:join'
+# event and get a full 'leaderboard:snapshot' (rows + seq) back. Board changes
+# from the engine only mark the board dirty; once per tick a background task
+# diffs each dirty board against what the room was last sent and emits one
+# 'leaderboard:delta' {seq, rows, removed, order, total} to the room. Rows are
+# diffed and sent without their rank: one participant climbing N places is one
+# changed row, not N+1. When the order moved, `order` is the full list of ids
+# in rank order and the client re-derives every rank from it (rank = index + 1);
+# it is null when the order did not change. Applying a delta twice is harmless;
+# a client that sees a gap in seq joins again for a fresh snapshot.
+PUSH_TICK_MS = int(os.getenv('LEADERBOARD_PUSH_TICK_MS', 500))
+
+def room_name(contest_id, level):
+    return f"leaderboard:{contest_id}:{level}"
+
+class LeaderboardPush:
+    def __init__(self, tick_ms=PUSH_TICK_MS):
+        self.tick = tick_ms / 1000.0
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._sent = {}          # (contest, level) -> ({username: row without rank}, [username in rank order])
+        self._seq = {}           # (contest, level) -> seq of the last delta
+        self._subscribers = {}   # (contest, level) -> set of socket ids
+        self._started = False
+        self.stats = {'ticks': 0, 'deltas': 0, 'snapshots': 0, 'rows_pushed': 0, 'reorders': 0}
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        socketio.start_background_task(self._run)
+
+    def mark_dirty(self, contest_id, level):
+        # Engine listener: boards nobody watches are never diffed
+        key = (contest_id, level)
+        with self._lock:
+            if key in self._subscribers:
+                self._dirty.add(key)
+
+    @staticmethod
+    def _rows(key):
+        """({username: row without rank}, [username in rank order]) of the board."""
+        standings, _ = leaderboard_engine.standings(*key)
+        rows, order = {}, []
+        for rank, entry in standings:
+            row = format_board_row(rank, entry)
+            del row['rank']
+            rows[row['id']] = row
+            order.append(row['id'])
+        return rows, order
+
+    def subscribe(self, sid, contest_id, level):
+        """Register sid on a board and return its snapshot {contest_id, level, seq, rows, total}."""
+        key = (int(contest_id), int(level))
+        with self._lock:
+            baseline_needed = key not in self._sent
+        # Built outside the lock: the engine may have to load the board
+        baseline = self._rows(key) if baseline_needed else None
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(sid)
+            if key not in self._sent:
+                self._sent[key] = baseline
+                self._seq.setdefault(key, 0)
+                # Changes made while the baseline was built were not marked: diff once
+                self._dirty.add(key)
+            # Snapshot and seq taken together: the next delta applies on top of it
+            sent_rows, order = self._sent[key]
+            rows = [dict(sent_rows[username], rank=i + 1) for i, username in enumerate(order)]
+            seq = self._seq[key]
+            self.stats['snapshots'] += 1
+        self.start()
+        return {'contest_id': key[0], 'level': key[1], 'seq': seq, 'rows': rows, 'total': len(rows)}
+
+    def unsubscribe(self, sid):
+        """Drop sid from every board; returns the keys it was on."""
+        left = []
+        with self._lock:
+            for key, sids in list(self._subscribers.items()):
+                if sid in sids:
+                    sids.discard(sid)
+                    left.append(key)
+                    if not sids:
+                        # Nobody watching: stop diffing, rebuild the baseline on the next join
+                        del self._subscribers[key]
+                        self._sent.pop(key, None)
+                        self._dirty.discard(key)
+        return left
+
+    def flush(self):
+        """Diff every dirty board once and emit its delta. Returns the number of deltas sent."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self.stats['ticks'] += 1
+        sent = 0
+        for key in dirty:
+            rows, order = self._rows(key)
+            with self._lock:
+                previous = self._sent.get(key)
+                if previous is None:
+                    continue
+                previous_rows, previous_order = previous
+                changed = [row for username, row in rows.items() if previous_rows.get(username) != row]
+                removed = [username for username in previous_rows if username not in rows]
+                reordered = order != previous_order
+                if not changed and not removed and not reordered:
+                    continue
+                self._sent[key] = (rows, order)
+                self._seq[key] += 1
+                payload = {
+                    'contest_id': key[0], 'level': key[1], 'seq': self._seq[key],
+                    'rows': changed, 'removed': removed,
+                    'order': order if reordered else None, 'total': len(rows)
+                }
+                self.stats['deltas'] += 1
+                self.stats['rows_pushed'] += len(changed)
+                self.stats['reorders'] += reordered
+            socketio.emit('leaderboard:delta', payload, to=room_name(*key))
+            sent += 1
+        return sent
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Leaderboard push tick failed: {e}")
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, tick_ms=int(self.tick * 1000),
+                        rooms={room_name(*k): len(s) for k, s in self._subscribers.items()})
+
+leaderboard_push = LeaderboardPush()
+leaderboard_engine.add_listener(leaderboard_push.mark_dirty)
+
+# --- SOCKET.IO EVENTS ---
+
+@socketio.on('leaderboard:join')
+def on_leaderboard_join(data):
+    data = data or {}
+    try:
+        level = int(data.get('level') or 1)
+        contest_id = int(data.get('contest_id') or get_current_contest_id())
+    except (TypeError, ValueError):
+        emit('leaderboard:error', {'error': 'Invalid contest_id or level'})
+        return
+    if not leaderboard_engine.has_level(contest_id, level):
+        emit('leaderboard:error', {'error': 'Unknown contest level'})
+        return
+    # One board per screen: switching levels leaves the previous room
+    for key in leaderboard_push.unsubscribe(request.sid):
+        leave_room(room_name(*key))
+    join_room(room_name(contest_id, level))
+    snapshot = leaderboard_push.subscribe(request.sid, contest_id, level)
+    snapshot['total_questions'] = get_question_count(contest_id, level)
+    emit('leaderboard:snapshot', snapshot)
+
+@socketio.on('leaderboard:leave')
+def on_leaderboard_leave(data=None):
+    for key in leaderboard_push.unsubscribe(request.sid):
+        leave_room(room_name(*key))
+
+# Socket.IO keeps one handler per event: other push modules add their cleanup
+# here (fn(sid)) instead of registering another 'disconnect' handler
+disconnect_handlers = [leaderboard_push.unsubscribe]
+
+@socketio.on('disconnect')
+def on_disconnect(*args):
+    for fn in disconnect_handlers:
+        try:
+            fn(request.sid)
+        except Exception as e:
+            logger.error(f"Disconnect cleanup failed: {e}")
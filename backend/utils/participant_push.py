@@ -0,0 +1,246 @@
+
+import os
+import threading
+import logging
+from itertools import islice
+from flask import request
+from flask_socketio import join_room, leave_room, emit
+from extensions import socketio
+from utils.cache import get_current_contest_id, resolve_user_id
+from utils.contest_service import participant_rows, participant_state_from_rows, contest_state_logic, CONTEST_STATE_KEYS
+from utils.versions import versions
+from utils.leaderboard_push import disconnect_handlers
+
+logger = logging.getLogger(__name__)
+
+# Participant state push over Socket.IO.
+#
+# participant.html emits 'participant:join' {user_id, contest_id} on connect and
+# joins two rooms:
+#   contest:<contest>  'contest:state' {contest_id, seq, changes}: rounds, active
+#                      level, countdown; one diff for the whole contest
+#   user:<user>        'participant:state' {user_id, contest_id, seq, changes}:
+#                      level, status, violations, elimination, release/shortlist
+# The join is answered with a full 'participant:snapshot' {seq, contest_seq, state}.
+# Changes values are absolute, a client that sees a gap in a seq joins again.
+#
+# The version counters of utils/versions.py are the change feed, checked once per
+# tick and diffed against what each room was last sent:
+#   ('user', id)    that participant's own rows are read again (two queries),
+#                   at most PUSH_BATCH participants per tick, the rest next tick
+#   ('contests',)   the contest part is rebuilt from the metadata cache, and every
+#                   subscriber's derived fields (clamp, duration, release) are
+#                   recomputed from the rows kept from its last read: no query
+# Writes that change a participant's own rows bump ('user', id) for it, a
+# contest-wide bump alone never re-reads them. Polling participant-state is only
+# the fallback (participant.html, 30s while live).
+PUSH_TICK_MS = int(os.getenv('PARTICIPANT_PUSH_TICK_MS', 500))
+PUSH_BATCH = int(os.getenv('PARTICIPANT_PUSH_BATCH', 200))
+
+def user_room(user_id):
+    return f"user:{user_id}"
+
+def contest_room(contest_id):
+    return f"contest:{contest_id}"
+
+def _diff(previous, current):
+    return {k: v for k, v in current.items() if previous.get(k) != v}
+
+class ParticipantPush:
+    def __init__(self, tick_ms=PUSH_TICK_MS, batch=PUSH_BATCH):
+        self.tick = tick_ms / 1000.0
+        self.batch = max(1, batch)
+        self._lock = threading.Lock()
+        self._sids = {}            # socket id -> (contest, user)
+        self._subscribers = {}     # (contest, user) -> set of socket ids
+        self._rows = {}            # (contest, user) -> participant_rows() of the last read
+        self._sent = {}            # (contest, user) -> user part of the state last pushed
+        self._seq = {}             # (contest, user) -> seq of the last participant:state
+        self._contest_sent = {}    # contest -> contest part last pushed
+        self._contest_seq = {}     # contest -> seq of the last contest:state
+        self._dirty_users = set()
+        self._dirty_contests = set()
+        self._started = False
+        self.stats = {'ticks': 0, 'user_diffs': 0, 'contest_diffs': 0, 'snapshots': 0, 'build_failures': 0,
+                      'rows_read': 0, 'rederived': 0}
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        socketio.start_background_task(self._run)
+
+    def on_version_bump(self, *scope):
+        # Version listener: only scopes participant-state is built from
+        if scope == ('contests',):
+            with self._lock:
+                self._dirty_contests.update(self._contest_sent)
+        elif scope[0] == 'user':
+            with self._lock:
+                self._dirty_users.update(key for key in self._subscribers if key[1] == scope[1])
+
+    @staticmethod
+    def _split(state):
+        contest = {k: state[k] for k in CONTEST_STATE_KEYS}
+        user = {k: v for k, v in state.items() if k not in CONTEST_STATE_KEYS}
+        return contest, user
+
+    def subscribe(self, sid, contest_id, user_id):
+        """Register sid for a participant and return its snapshot {contest_id, user_id, seq, contest_seq, state}."""
+        key = (int(contest_id), int(user_id))
+        # Built outside the lock (queries)
+        rows = participant_rows(key[0], key[1])
+        contest, user = self._split(participant_state_from_rows(key[0], rows))
+        with self._lock:
+            self._sids[sid] = key
+            self._subscribers.setdefault(key, set()).add(sid)
+            if key not in self._sent:
+                self._rows[key] = rows
+                self._sent[key] = user
+                self._seq.setdefault(key, 0)
+            if key[0] not in self._contest_sent:
+                self._contest_sent[key[0]] = contest
+                self._contest_seq.setdefault(key[0], 0)
+            # Changes made while the state was built were not marked: diff once
+            self._dirty_users.add(key)
+            # Snapshot and seqs taken together: the next diffs apply on top of it
+            state = dict(self._sent[key], **self._contest_sent[key[0]])
+            snapshot = {'contest_id': key[0], 'user_id': key[1], 'seq': self._seq[key],
+                        'contest_seq': self._contest_seq[key[0]], 'state': state}
+            self.stats['snapshots'] += 1
+        self.start()
+        return snapshot
+
+    def unsubscribe(self, sid):
+        """Drop sid; returns the rooms it was in."""
+        with self._lock:
+            key = self._sids.pop(sid, None)
+            if key is None:
+                return []
+            sids = self._subscribers.get(key, set())
+            sids.discard(sid)
+            if not sids:
+                # Nobody connected as this participant: stop diffing, rebuild on the next join
+                self._subscribers.pop(key, None)
+                self._rows.pop(key, None)
+                self._sent.pop(key, None)
+                self._dirty_users.discard(key)
+                if not any(k[0] == key[0] for k in self._subscribers):
+                    self._contest_sent.pop(key[0], None)
+                    self._dirty_contests.discard(key[0])
+        return [contest_room(key[0]), user_room(key[1])]
+
+    def flush(self):
+        """Diff dirty contests and up to `batch` dirty participants and emit. Returns the number of diffs sent."""
+        with self._lock:
+            contests, self._dirty_contests = self._dirty_contests, set()
+            # Own rows changed: read again, the rest stay dirty for the next tick
+            users = set(islice(self._dirty_users, self.batch))
+            self._dirty_users -= users
+            # A contest-wide change can move every participant's derived fields
+            # (clamp, release, duration): recompute them from the kept rows
+            rederive = {key: self._rows[key] for key in self._subscribers
+                        if key[0] in contests and key not in users and key in self._rows}
+            self.stats['ticks'] += 1
+        sent = 0
+
+        contest_states = {}
+        for contest_id in contests:
+            contest_states[contest_id] = current = contest_state_logic(contest_id)
+            with self._lock:
+                previous = self._contest_sent.get(contest_id)
+                if previous is None:
+                    continue
+                changes = _diff(previous, current)
+                if not changes:
+                    continue
+                self._contest_sent[contest_id] = current
+                self._contest_seq[contest_id] += 1
+                payload = {'contest_id': contest_id, 'seq': self._contest_seq[contest_id], 'changes': changes}
+                self.stats['contest_diffs'] += 1
+            socketio.emit('contest:state', payload, to=contest_room(contest_id))
+            sent += 1
+
+        for key in users:
+            try:
+                rows = participant_rows(key[0], key[1])
+                self.stats['rows_read'] += 1
+            except Exception as e:
+                self.stats['build_failures'] += 1
+                logger.error(f"Participant state read failed for {key}: {e}")
+                continue
+            sent += self._push_user(key, rows, contest_states.get(key[0]))
+
+        for key, rows in rederive.items():
+            self.stats['rederived'] += 1
+            sent += self._push_user(key, rows, contest_states.get(key[0]))
+        return sent
+
+    def _push_user(self, key, rows, contest_state):
+        """Build the user part from rows, emit its diff. Returns 1 if a diff was sent."""
+        try:
+            _, current = self._split(participant_state_from_rows(key[0], rows, contest_state))
+        except Exception as e:
+            self.stats['build_failures'] += 1
+            logger.error(f"Participant state build failed for {key}: {e}")
+            return 0
+        with self._lock:
+            previous = self._sent.get(key)
+            if previous is None:
+                return 0
+            self._rows[key] = rows
+            changes = _diff(previous, current)
+            if not changes:
+                return 0
+            self._sent[key] = current
+            self._seq[key] += 1
+            payload = {'contest_id': key[0], 'user_id': key[1], 'seq': self._seq[key], 'changes': changes}
+            self.stats['user_diffs'] += 1
+        socketio.emit('participant:state', payload, to=user_room(key[1]))
+        return 1
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Participant push tick failed: {e}")
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, tick_ms=int(self.tick * 1000), batch=self.batch, sockets=len(self._sids),
+                        pending_users=len(self._dirty_users),
+                        participants=len(self._subscribers), contests=len(self._contest_sent))
+
+participant_push = ParticipantPush()
+versions.add_listener(participant_push.on_version_bump)
+disconnect_handlers.append(participant_push.unsubscribe)
+
+# --- SOCKET.IO EVENTS ---
+
+@socketio.on('participant:join')
+def on_participant_join(data):
+    data = data or {}
+    uid = resolve_user_id(data.get('user_id'))
+    if not uid:
+        emit('participant:error', {'error': 'User not found'})
+        return
+    try:
+        contest_id = int(data.get('contest_id') or get_current_contest_id())
+    except (TypeError, ValueError):
+        emit('participant:error', {'error': 'Invalid contest_id'})
+        return
+    # One participant per socket: a re-join replaces the previous rooms
+    for room in participant_push.unsubscribe(request.sid):
+        leave_room(room)
+    try:
+        snapshot = participant_push.subscribe(request.sid, contest_id, uid)
+    except Exception as e:
+        logger.error(f"Participant join failed for user {uid}: {e}")
+        emit('participant:error', {'error': 'State unavailable'})
+        return
+    join_room(contest_room(contest_id))
+    join_room(user_room(uid))
+    emit('participant:snapshot', snapshot)
@@ -0,0 +1,71 @@
+
+import os
+import time
+import threading
+import logging
+from utils.cache import get_current_contest_id
+from utils.standings import find_level_stats_drift, repair_level_stats
+from utils.leaderboard import leaderboard_engine
+from utils.versions import bump_user
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the current contest; 0 disables the job
+RECONCILE_INTERVAL = int(os.getenv('SCORE_RECONCILE_INTERVAL', 300))
+
+class ScoreReconciler:
+    """
+    Background check of the incrementally maintained participant_level_stats
+    counters (utils/standings.level_stats_increment_sql) against `submissions`.
+    Rows that drifted (manual edits, a double count racing across workers,
+    deleted submissions) are recomputed together with their leaderboard row.
+    """
+
+    def __init__(self, interval=RECONCILE_INTERVAL):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'runs': 0, 'rows_repaired': 0, 'last_run': None, 'last_drift': 0, 'last_error': None}
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="score-reconciler", daemon=True)
+            self._thread.start()
+
+    def run_once(self, contest_id):
+        """Verify one contest and repair what drifted. Returns the number of rows repaired."""
+        drifted = find_level_stats_drift(contest_id)
+        if drifted:
+            for r in drifted:
+                logger.warning(
+                    f"Level stats drift contest={contest_id} user={r['user_id']} level={r['level']}: "
+                    f"solved {r['questions_solved']} -> {r['expected_solved']}, score {r['level_score']} -> {r['expected_score']}")
+            repair_level_stats(contest_id, drifted)
+            for r in drifted:
+                leaderboard_engine.refresh_user(contest_id, r['level'], r['user_id'])
+                bump_user(r['user_id'])
+        with self._lock:
+            self.stats['runs'] += 1
+            self.stats['rows_repaired'] += len(drifted)
+            self.stats['last_drift'] = len(drifted)
+            self.stats['last_run'] = time.time()
+        return len(drifted)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once(get_current_contest_id())
+            except Exception as e:
+                self.stats['last_error'] = str(e)
+                logger.error(f"Score reconciliation failed: {e}")
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, interval=self.interval)
+
+score_reconciler = ScoreReconciler()
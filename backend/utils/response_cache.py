@@ -0,0 +1,96 @@
+
+import os
+import gzip
+import threading
+from collections import OrderedDict
+
+# Encoded response bodies shared by every request with the same ETag.
+#
+# The key is the ETag computed by utils/versions.py, i.e. (endpoint + params,
+# data versions), so an entry is valid exactly as long as the ETag is. The body
+# is stored as sent plus a gzipped copy, so a hit costs no dict building, time
+# formatting, JSON encoding or compression. Concurrent misses on one key are
+# single-flighted: the first request builds, the others wait for its result.
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256))
+# Bodies smaller than this are not worth a Content-Encoding
+GZIP_MIN_BYTES = 512
+# Seconds a waiter gives the building request before building itself
+BUILD_WAIT = 10
+
+class CachedBody:
+    __slots__ = ('body', 'gzipped', 'mimetype')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+
+class ResponseCache:
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0, 'uncacheable': 0}
+
+    def _get(self, key):
+        # Caller holds the lock
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def get_or_build(self, key, build):
+        """
+        CachedBody for key, calling build() on a miss. build() returns a
+        CachedBody to share, or any other response object, which is returned
+        to this caller only (errors, non-200s).
+        """
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None:
+                self.stats['hits'] += 1
+                return entry
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+                self.stats['misses'] += 1
+            else:
+                self.stats['waits'] += 1
+
+        if not leader:
+            event.wait(BUILD_WAIT)
+            with self._lock:
+                entry = self._get(key)
+            # The leader failed or produced an uncacheable response: build our own
+            return entry if entry is not None else build()
+
+        try:
+            result = build()
+            with self._lock:
+                if isinstance(result, CachedBody):
+                    self._data[key] = result
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                else:
+                    self.stats['uncacheable'] += 1
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def snapshot_stats(self):
+        with self._lock:
+            total = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, size=len(self._data), maxsize=self.maxsize,
+                        bytes=sum(len(e.body) + len(e.gzipped or b'') for e in self._data.values()),
+                        hit_rate=round(self.stats['hits'] / total, 3) if total else 0.0)
+
+response_cache = ResponseCache()
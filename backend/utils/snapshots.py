@@ -0,0 +1,126 @@
+
+import json
+import gzip
+import hashlib
+import datetime
+import logging
+from db_connection import db_manager
+from utils.cache import metadata_cache, LRUCache
+from utils.leaderboard import BOARD_QUERY, LevelBoard
+from utils.submission_journal import submission_journal
+from utils.versions import bump_contests
+
+logger = logging.getLogger(__name__)
+
+# Frozen standings of finalized levels.
+#
+# finalize_round / complete_level_logic / notify_progression call freeze_level():
+# the level's ranking is read once from participant_level_stats and stored as a
+# gzipped JSON row of `leaderboard_snapshots` with the next version number. A
+# snapshot is never updated; freezing again only adds a version when the
+# standings actually changed (checksum). Readers get them from an in-memory LRU,
+# the versioned URL is served with immutable cache headers.
+SNAPSHOT_COLUMNS = ['rank', 'username', 'full_name', 'department', 'college', 'score', 'solved', 'status', 'time_taken_sec']
+SNAPSHOT_VERSIONS_TTL = 60
+# Submissions still in the journal are waited for (seconds) before freezing
+FREEZE_DRAIN_TIMEOUT = 5
+
+snapshot_cache = LRUCache(maxsize=64, ttl=24 * 3600)
+
+def _compact_rows(contest_id, level):
+    rows = db_manager.execute_query(BOARD_QUERY, (contest_id, level), primary=True)
+    if rows is None:
+        raise RuntimeError(f"Could not read standings of contest {contest_id} level {level}")
+    board = LevelBoard(contest_id, level, rows)
+    return [[rank] + [entry[c] for c in SNAPSHOT_COLUMNS[1:]] for rank, entry in board.page()]
+
+def snapshot_versions(contest_id):
+    """{level: latest snapshot version} of a contest."""
+    def load():
+        return db_manager.execute_query(
+            "SELECT level, MAX(version) AS version FROM leaderboard_snapshots WHERE contest_id = %s GROUP BY level",
+            (contest_id,), stale_ok=True)
+    rows = metadata_cache.get_or_load('snapshots', int(contest_id), SNAPSHOT_VERSIONS_TTL, load) or []
+    return {r['level']: r['version'] for r in rows}
+
+def freeze_level(contest_id, level, reason):
+    """
+    Store the level's current standings as a new snapshot version. Returns the
+    version (the existing one when nothing changed), None if it failed; a
+    failed freeze never blocks the admin action that triggered it.
+    """
+    contest_id, level = int(contest_id), int(level)
+    try:
+        if not submission_journal.drain(timeout=FREEZE_DRAIN_TIMEOUT):
+            logger.warning(f"Freezing contest {contest_id} level {level} with submissions still queued")
+        rows = _compact_rows(contest_id, level)
+        checksum = hashlib.sha1(json.dumps(rows, separators=(',', ':'), default=str).encode()).hexdigest()
+
+        latest = db_manager.execute_query(
+            "SELECT version, checksum FROM leaderboard_snapshots WHERE contest_id = %s AND level = %s ORDER BY version DESC LIMIT 1",
+            (contest_id, level), primary=True)
+        if latest and latest[0]['checksum'] == checksum:
+            return latest[0]['version']
+        version = latest[0]['version'] + 1 if latest else 1
+
+        payload = {
+            'contest_id': contest_id,
+            'level': level,
+            'version': version,
+            'reason': reason,
+            'frozen_at': datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'columns': SNAPSHOT_COLUMNS,
+            'rows': rows
+        }
+        blob = gzip.compress(json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8'))
+        try:
+            written = db_manager.execute_update(
+                "INSERT INTO leaderboard_snapshots (contest_id, level, version, reason, row_count, checksum, payload) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (contest_id, level, version, reason, len(rows), checksum, blob))
+        except Exception as e:
+            # SQLite raises where MySQL returns False
+            logger.warning(f"Snapshot insert failed for contest {contest_id} level {level} v{version}: {e}")
+            written = False
+        metadata_cache.invalidate('snapshots', contest_id)
+        # /rankings/levels lists snapshot versions
+        bump_contests()
+        if not written:
+            # Usually a concurrent freeze that took this version (UNIQUE key):
+            # hand out the version that is actually stored, never an unwritten one
+            stored = db_manager.execute_query(
+                "SELECT version FROM leaderboard_snapshots WHERE contest_id = %s AND level = %s ORDER BY version DESC LIMIT 1",
+                (contest_id, level), primary=True)
+            if not stored:
+                logger.error(f"Leaderboard snapshot not stored for contest {contest_id} level {level}")
+                return None
+            return stored[0]['version']
+        logger.info(f"Froze contest {contest_id} level {level} standings as v{version} ({len(rows)} rows, {len(blob)} bytes)")
+        return version
+    except Exception as e:
+        logger.error(f"Leaderboard snapshot failed for contest {contest_id} level {level}: {e}")
+        return None
+
+def get_snapshot(contest_id, level, version=None):
+    """Snapshot payload dict ({..., columns, rows}), latest version when version is None. None if absent."""
+    if version is None:
+        version = snapshot_versions(contest_id).get(int(level))
+        if version is None:
+            return None
+    key = (int(contest_id), int(level), int(version))
+    payload = snapshot_cache.get(key)
+    if payload is not None:
+        return payload
+    res = db_manager.execute_query(
+        "SELECT payload FROM leaderboard_snapshots WHERE contest_id = %s AND level = %s AND version = %s", key, stale_ok=True)
+    if not res:
+        return None
+    payload = json.loads(gzip.decompress(bytes(res[0]['payload'])).decode('utf-8'))
+    snapshot_cache.put(key, payload)
+    return payload
+
+def snapshot_entries(payload):
+    """(rank, entry) pairs of a snapshot, entries shaped like the leaderboard engine's."""
+    columns = payload['columns']
+    for row in payload['rows']:
+        entry = dict(zip(columns, row))
+        yield entry['rank'], entry
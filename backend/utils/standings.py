@@ -0,0 +1,236 @@
+
+import logging
+from db_connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Contest-wide standings kept in the `leaderboard` table, one row per (user, contest).
+#
+# rank_key orders the table with a single ascending index scan:
+#   score desc, levels completed desc, total completion time asc
+# packed into one integer (score in cents < 10^7, levels < 100, seconds capped at
+# 999999) so it stays exact even as a SQLite REAL (< 2^53). user_id breaks ties.
+RANK_SCORE_CENTS = 10 ** 7
+RANK_MAX_SECONDS = 999999
+
+def _level_seconds_sql():
+    # Completion time of one participant_level_stats row
+    if db_manager.dialect == 'sqlite':
+        return "CAST((julianday(pls.completed_at) - julianday(pls.start_time)) * 86400 AS INTEGER)"
+    return "TIMESTAMPDIFF(SECOND, pls.start_time, pls.completed_at)"
+
+def leaderboard_upsert_sql(contest_id, user_id=None):
+    """
+    (sql, params) recomputing the leaderboard row(s) of one user, or of every
+    user of the contest, from participant_level_stats and submissions.
+    """
+    where, params = "pls.contest_id = %s", [contest_id]
+    if user_id is not None:
+        where += " AND pls.user_id = %s"
+        params.append(user_id)
+
+    least = "MIN" if db_manager.dialect == 'sqlite' else "LEAST"
+    select = f"""
+        SELECT user_id, contest_id, score, solved, attempted, seconds, completed, violations, current_round,
+               (({RANK_SCORE_CENTS} - ROUND(score * 100)) * 100 + (99 - completed)) * {RANK_MAX_SECONDS + 1}
+                   + {least}(seconds, {RANK_MAX_SECONDS}) AS rank_key
+        FROM (
+            SELECT pls.user_id, pls.contest_id,
+                   COALESCE(SUM(pls.level_score), 0) AS score,
+                   COALESCE(SUM(pls.questions_solved), 0) AS solved,
+                   (SELECT COUNT(DISTINCT s.question_id) FROM submissions s
+                    WHERE s.user_id = pls.user_id AND s.contest_id = pls.contest_id) AS attempted,
+                   COALESCE(SUM(CASE WHEN pls.status = 'COMPLETED' THEN {_level_seconds_sql()} END), 0) AS seconds,
+                   SUM(CASE WHEN pls.status = 'COMPLETED' THEN 1 ELSE 0 END) AS completed,
+                   COALESCE((SELECT MAX(pp.total_violations) FROM participant_proctoring pp
+                             WHERE pp.user_id = pls.user_id AND pp.contest_id = pls.contest_id),
+                            SUM(pls.violation_count), 0) AS violations,
+                   MAX(pls.level) AS current_round
+            FROM participant_level_stats pls
+            WHERE {where}
+            GROUP BY pls.user_id, pls.contest_id
+        ) agg
+    """
+    columns = "(user_id, contest_id, total_score, questions_correct, questions_attempted, total_time_taken_seconds, levels_completed, violations_count, current_round, rank_key)"
+    updated = ['total_score', 'questions_correct', 'questions_attempted', 'total_time_taken_seconds',
+               'levels_completed', 'violations_count', 'current_round', 'rank_key']
+    if db_manager.dialect == 'sqlite':
+        # WHERE true: SQLite needs it to parse ON CONFLICT after INSERT ... SELECT
+        sql = (f"INSERT INTO leaderboard {columns} {select} WHERE true "
+               f"ON CONFLICT(user_id, contest_id) DO UPDATE SET "
+               + ", ".join(f"{c} = excluded.{c}" for c in updated)
+               + ", last_updated = CURRENT_TIMESTAMP")
+    else:
+        sql = (f"INSERT INTO leaderboard {columns} {select} "
+               f"ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in updated))
+    return sql, tuple(params)
+
+def refresh_leaderboard(contest_id, user_id=None, defer=False):
+    """
+    Run leaderboard_upsert_sql on its own, for writes that are not part of a
+    submission or level transaction (proctoring counters, shortlists).
+    """
+    sql, params = leaderboard_upsert_sql(contest_id, user_id)
+    return db_manager.execute_update(sql, params, defer=defer)
+
+# Per-level score and solved count straight from `submissions`: each question
+# counts once (best correct submission), scoped to the row's contest and level.
+LEVEL_STATS_RECALC_SQL = """
+    UPDATE participant_level_stats
+    SET questions_solved = (
+            SELECT COUNT(*) FROM questions q JOIN rounds r ON r.round_id = q.round_id
+            WHERE r.contest_id = participant_level_stats.contest_id AND r.round_number = participant_level_stats.level
+              AND EXISTS (SELECT 1 FROM submissions s
+                          WHERE s.user_id = participant_level_stats.user_id AND s.question_id = q.question_id AND s.is_correct = 1)
+        ),
+        level_score = COALESCE((
+            SELECT SUM((SELECT MAX(s.score_awarded) FROM submissions s
+                        WHERE s.user_id = participant_level_stats.user_id AND s.question_id = q.question_id AND s.is_correct = 1))
+            FROM questions q JOIN rounds r ON r.round_id = q.round_id
+            WHERE r.contest_id = participant_level_stats.contest_id AND r.round_number = participant_level_stats.level
+        ), 0)
+    WHERE contest_id = %s
+"""
+
+def level_stats_increment_sql(row, level, journal_id):
+    """
+    (sql, params) adding one correct submission to its participant_level_stats
+    row: +1 solved, +score_awarded. Runs in the submission's own transaction,
+    after its INSERT; the NOT EXISTS guard skips it when the user already had a
+    correct submission for the question, so a question is only counted once.
+    """
+    sql = """
+        UPDATE participant_level_stats
+        SET questions_solved = COALESCE(questions_solved, 0) + 1,
+            level_score = COALESCE(level_score, 0) + %s
+        WHERE user_id = %s AND contest_id = %s AND level = %s
+          AND NOT EXISTS (SELECT 1 FROM submissions s
+                          WHERE s.user_id = %s AND s.question_id = %s AND s.is_correct = 1
+                            AND (s.journal_id IS NULL OR s.journal_id <> %s))
+    """
+    return sql, (float(row['score_awarded'] or 0), row['user_id'], row['contest_id'], level,
+                 row['user_id'], row['question_id'], journal_id)
+
+# Stored vs. recomputed per-level counters (same rules as LEVEL_STATS_RECALC_SQL)
+LEVEL_STATS_CHECK_SQL = """
+    SELECT pls.user_id, pls.level, pls.questions_solved, pls.level_score,
+           (SELECT COUNT(*) FROM questions q JOIN rounds r ON r.round_id = q.round_id
+            WHERE r.contest_id = pls.contest_id AND r.round_number = pls.level
+              AND EXISTS (SELECT 1 FROM submissions s
+                          WHERE s.user_id = pls.user_id AND s.question_id = q.question_id AND s.is_correct = 1)
+           ) AS expected_solved,
+           COALESCE((
+            SELECT SUM((SELECT MAX(s.score_awarded) FROM submissions s
+                        WHERE s.user_id = pls.user_id AND s.question_id = q.question_id AND s.is_correct = 1))
+            FROM questions q JOIN rounds r ON r.round_id = q.round_id
+            WHERE r.contest_id = pls.contest_id AND r.round_number = pls.level
+           ), 0) AS expected_score
+    FROM participant_level_stats pls
+    WHERE pls.contest_id = %s
+"""
+
+def find_level_stats_drift(contest_id):
+    """participant_level_stats rows of a contest whose counters disagree with `submissions`."""
+    rows = db_manager.execute_query(LEVEL_STATS_CHECK_SQL, (contest_id,), primary=True)
+    if rows is None:
+        raise RuntimeError(f"Level stats check failed for contest {contest_id}")
+    return [r for r in rows
+            if int(r['questions_solved'] or 0) != int(r['expected_solved'] or 0)
+            or abs(float(r['level_score'] or 0) - float(r['expected_score'] or 0)) > 0.001]
+
+def repair_level_stats(contest_id, drifted):
+    """Recompute the drifted (user, level) rows and their leaderboard rows in one transaction."""
+    statements = []
+    for r in drifted:
+        statements.append((LEVEL_STATS_RECALC_SQL + " AND user_id = %s AND level = %s", (contest_id, r['user_id'], r['level'])))
+    for user_id in sorted({r['user_id'] for r in drifted}):
+        statements.append(leaderboard_upsert_sql(contest_id, user_id))
+    if statements and not db_manager.execute_transaction(statements):
+        raise RuntimeError(f"Level stats repair failed for contest {contest_id}")
+    return len(drifted)
+
+def refresh_leaderboard_row(user_id, contest_id):
+    sql, params = leaderboard_upsert_sql(contest_id, user_id)
+    return db_manager.execute_update(sql, params)
+
+def rebuild_leaderboard(contest_id, recalc_levels=True):
+    """
+    Reconcile the `leaderboard` rows of a contest from `submissions`: optionally
+    recompute participant_level_stats scores first, then every leaderboard row,
+    and drop rows of users that no longer have stats. Returns the row count.
+    """
+    statements = []
+    if recalc_levels:
+        statements.append((LEVEL_STATS_RECALC_SQL, (contest_id,)))
+    statements.append(leaderboard_upsert_sql(contest_id))
+    statements.append((
+        "DELETE FROM leaderboard WHERE contest_id = %s AND user_id NOT IN "
+        "(SELECT user_id FROM participant_level_stats WHERE contest_id = %s)",
+        (contest_id, contest_id)
+    ))
+    if not db_manager.execute_transaction(statements):
+        raise RuntimeError(f"Leaderboard rebuild failed for contest {contest_id}")
+    res = db_manager.execute_query("SELECT COUNT(*) AS n FROM leaderboard WHERE contest_id = %s", (contest_id,), primary=True)
+    return res[0]['n'] if res else 0
+
+# --- READS (idx_lb_rank covers contest_id + rank_key order) ---
+
+def ranked_rows(contest_id, offset=0, limit=100, after=None):
+    """
+    One page of the contest ranking. after: (rank_key, user_id) of the last row
+    already seen; the page then starts right after it along idx_lb_rank and
+    offset is ignored (no rows skipped).
+    """
+    where, params = "lb.contest_id = %s AND lb.rank_key IS NOT NULL", [contest_id]
+    if after is not None:
+        where += " AND (lb.rank_key, lb.user_id) > (%s, %s)"
+        params += [after[0], after[1]]
+        offset = 0
+    query = f"""
+        SELECT lb.user_id, u.username, u.full_name, u.department, u.college,
+               lb.total_score, lb.questions_correct, lb.questions_attempted,
+               lb.total_time_taken_seconds, lb.levels_completed, lb.current_round, lb.rank_key
+        FROM leaderboard lb
+        JOIN users u ON u.user_id = lb.user_id
+        WHERE {where}
+        ORDER BY lb.rank_key ASC, lb.user_id ASC
+        LIMIT %s OFFSET %s
+    """
+    return db_manager.execute_query(query, (*params, int(limit), int(offset)), stale_ok=True) or []
+
+def ranked_before(contest_id, after):
+    """Rows ranked at or before the (rank_key, user_id) cursor: numbers a keyset page when the client gave no after_rank."""
+    res = db_manager.execute_query(
+        "SELECT COUNT(*) AS n FROM leaderboard WHERE contest_id = %s AND rank_key IS NOT NULL AND (rank_key, user_id) <= (%s, %s)",
+        (contest_id, after[0], after[1]), stale_ok=True)
+    return res[0]['n'] if res else 0
+
+def ranked_count(contest_id):
+    res = db_manager.execute_query(
+        "SELECT COUNT(*) AS n FROM leaderboard WHERE contest_id = %s AND rank_key IS NOT NULL", (contest_id,), stale_ok=True)
+    return res[0]['n'] if res else 0
+
+def level_scores(contest_id, user_ids):
+    """{user_id: {level: level_score}} for one page of ranked users."""
+    if not user_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    rows = db_manager.execute_query(
+        f"SELECT user_id, level, level_score FROM participant_level_stats WHERE contest_id = %s AND user_id IN ({placeholders})",
+        (contest_id, *user_ids), stale_ok=True) or []
+    out = {}
+    for r in rows:
+        out.setdefault(r['user_id'], {})[r['level']] = float(r['level_score'] or 0)
+    return out
+
+def rank_in_contest(contest_id, user_id):
+    """1-based contest-wide rank from two index lookups, None if the user has no row."""
+    own = db_manager.execute_query(
+        "SELECT rank_key FROM leaderboard WHERE contest_id = %s AND user_id = %s", (contest_id, user_id))
+    if not own or own[0]['rank_key'] is None:
+        return None
+    key = own[0]['rank_key']
+    ahead = db_manager.execute_query(
+        "SELECT COUNT(*) AS n FROM leaderboard WHERE contest_id = %s AND (rank_key < %s OR (rank_key = %s AND user_id < %s))",
+        (contest_id, key, key, user_id))
+    return ahead[0]['n'] + 1 if ahead else None
@@ -0,0 +1,275 @@
+
+import os
+import json
+import time
+import uuid
+import datetime
+import threading
+import logging
+from collections import deque
+from db_connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+JOURNAL_PATH = os.path.join(BASE_DIR, os.getenv('SUBMISSION_JOURNAL', 'submissions.journal'))
+# Entries the database keeps rejecting end up here instead of blocking the queue
+DEAD_LETTER_PATH = os.path.join(BASE_DIR, os.getenv('SUBMISSION_DEAD_LETTER', 'submissions.deadletter'))
+# Failed attempts, while the database itself answers, before an entry is dead-lettered
+MAX_REJECTIONS = int(os.getenv('SUBMISSION_MAX_REJECTIONS', 3))
+
+# Retry backoff (seconds) while the database rejects inserts
+RETRY_MIN = 0.5
+RETRY_MAX = 30
+# Rewrite the journal once it is fully drained and larger than this
+COMPACT_BYTES = 4 * 1024 * 1024
+
+INSERT_QUERY = """
+    INSERT INTO submissions
+    (user_id, contest_id, round_id, question_id, submitted_code, status, is_correct, test_results, score_awarded, time_taken_seconds, submission_timestamp, journal_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+class SubmissionJournal:
+    """
+    Write-ahead log for judged submissions.
+
+    record() appends the submission to an fsync'd JSONL file and returns; a
+    background thread inserts it into `submissions` (retrying with backoff while
+    the database is unavailable) and then appends an ack line. Unacked entries
+    are replayed on startup. journal_id is unique in `submissions`, so an entry
+    that was inserted but not yet acked is never inserted twice.
+
+    Entries are inserted in order, so one that can never be inserted (a foreign
+    key it violates, a write hook that always fails) would hold back everything
+    queued after it. A failure only counts against the entry when the primary
+    still answers a probe; after MAX_REJECTIONS of those the entry is moved to
+    the dead-letter file (replay_submissions.py --dead), acked, and the queue
+    moves on. While the database is down entries are retried indefinitely.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, dead_letter_path=DEAD_LETTER_PATH):
+        self.path = path
+        self.dead_letter_path = dead_letter_path
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = deque()
+        self._file = None
+        self._thread = None
+        self._listeners = []
+        self._write_hooks = []
+        self.stats = {'recorded': 0, 'persisted': 0, 'retries': 0, 'replayed': 0, 'dead_lettered': 0, 'last_error': None}
+
+    def add_listener(self, fn):
+        """fn(entry) runs on the flusher thread after the row is in `submissions`."""
+        self._listeners.append(fn)
+
+    def add_write_hook(self, fn):
+        """
+        fn(entry) -> [(query, params), ...] executed in the same transaction as
+        the submission insert, so derived rows are written exactly once with it.
+        """
+        self._write_hooks.append(fn)
+
+    # --- WRITE PATH ---
+
+    def _append(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, row, meta=None):
+        """
+        Durably journal one submission row (dict of submissions columns) and
+        queue it for insertion. Returns the journal_id once the line is on disk.
+        """
+        self.start()
+        entry = {
+            'journal_id': str(uuid.uuid4()),
+            'row': dict(row, submission_timestamp=datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')),
+            'meta': meta or {},
+        }
+        with self._lock:
+            self._append(entry)
+            self._queue.append(entry)
+            self.stats['recorded'] += 1
+            self._wakeup.notify()
+        return entry['journal_id']
+
+    def pending(self):
+        with self._lock:
+            return list(self._queue)
+
+    def has_pending_correct(self, user_id, question_id):
+        """Duplicate check for submissions judged correct but not flushed yet."""
+        with self._lock:
+            return any(
+                e['row']['user_id'] == user_id and str(e['row']['question_id']) == str(question_id) and e['row']['is_correct']
+                for e in self._queue
+            )
+
+    # --- REPLAY ---
+
+    def _load_unacked(self):
+        if not os.path.exists(self.path):
+            return []
+        entries, acked = {}, set()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn line from a crash mid-append: the client never got an ack for it
+                    logger.warning("Skipping incomplete line in submission journal.")
+                    continue
+                if 'ack' in record:
+                    acked.add(record['ack'])
+                else:
+                    entries[record['journal_id']] = record
+        return [e for jid, e in entries.items() if jid not in acked]
+
+    def _repair_tail(self):
+        # Cut a torn final line so the next append starts on a fresh line
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'r+b') as f:
+            data = f.read()
+            if data.endswith(b'\n'):
+                return
+            f.truncate(data.rfind(b'\n') + 1)
+
+    def start(self):
+        """Open the journal, queue unacked entries from a previous run and start the flusher."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._repair_tail()
+            unacked = self._load_unacked()
+            for entry in unacked:
+                entry['replayed'] = True
+            self._queue.extend(unacked)
+            self.stats['replayed'] = len(unacked)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._thread = threading.Thread(target=self._run, name="submission-flusher", daemon=True)
+            self._thread.start()
+        if unacked:
+            logger.warning(f"Replaying {len(unacked)} unflushed submission(s) from {self.path}")
+
+    # --- FLUSHER ---
+
+    def _already_inserted(self, journal_id):
+        res = db_manager.execute_query("SELECT 1 FROM submissions WHERE journal_id=%s", (journal_id,), primary=True)
+        if res is None:
+            raise RuntimeError("journal_id lookup failed")
+        return bool(res)
+
+    def persist(self, entry):
+        """Insert one entry. Raises if the database did not take it."""
+        r = entry['row']
+        # A replayed or retried entry may already be in the table (crash before
+        # the ack, or an insert that committed but reported an error)
+        if (entry.get('replayed') or entry.get('retried')) and self._already_inserted(entry['journal_id']):
+            return
+        statements = [(INSERT_QUERY, (
+            r['user_id'], r['contest_id'], r['round_id'], r['question_id'], r['submitted_code'],
+            r['status'], r['is_correct'], r['test_results'], r['score_awarded'], r['time_taken_seconds'],
+            r['submission_timestamp'], entry['journal_id']
+        ))]
+        for fn in self._write_hooks:
+            statements.extend(fn(entry))
+        if not db_manager.execute_transaction(statements):
+            raise RuntimeError("submission transaction rolled back")
+
+    @staticmethod
+    def _database_answers():
+        # execute_transaction() only reports False: tell "database down" from
+        # "database rejected this entry" by asking the primary something trivial
+        return bool(db_manager.execute_query("SELECT 1 AS ok", primary=True))
+
+    def _dead_letter(self, entry, error):
+        """Move an entry the database keeps rejecting out of the queue. Caller holds the lock."""
+        record = dict(entry, error=str(error), dead_at=datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._append({'ack': entry['journal_id']})
+        self._queue.popleft()
+        self.stats['dead_lettered'] += 1
+
+    def dead_letters(self):
+        """Entries moved to the dead-letter file, oldest first."""
+        if not os.path.exists(self.dead_letter_path):
+            return []
+        with open(self.dead_letter_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _run(self):
+        backoff = RETRY_MIN
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wakeup.wait()
+                entry = self._queue[0]
+
+            try:
+                self.persist(entry)
+            except Exception as e:
+                entry['retried'] = True
+                self.stats['retries'] += 1
+                self.stats['last_error'] = str(e)
+                if self._database_answers():
+                    entry['rejections'] = entry.get('rejections', 0) + 1
+                    if entry['rejections'] >= MAX_REJECTIONS:
+                        logger.error(f"Submission {entry['journal_id']} rejected {entry['rejections']} times, dead-lettered to {self.dead_letter_path}: {e}")
+                        with self._lock:
+                            self._dead_letter(entry, e)
+                        backoff = RETRY_MIN
+                        continue
+                logger.error(f"Submission {entry['journal_id']} not persisted yet, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RETRY_MAX)
+                continue
+            backoff = RETRY_MIN
+
+            with self._lock:
+                self._append({'ack': entry['journal_id']})
+                self._queue.popleft()
+                self.stats['persisted'] += 1
+                self._maybe_compact()
+
+            for fn in self._listeners:
+                try:
+                    fn(entry)
+                except Exception as e:
+                    logger.error(f"Submission listener failed for {entry['journal_id']}: {e}")
+
+    def _maybe_compact(self):
+        # Caller holds the lock. Re-read the file too: another worker process
+        # appending to the same journal may still have unacked lines in it.
+        if self._queue or self._file.tell() < COMPACT_BYTES:
+            return
+        if self._load_unacked():
+            return
+        self._file.truncate(0)
+        self._file.seek(0)
+        os.fsync(self._file.fileno())
+
+    def drain(self, timeout=None):
+        """Block until every queued submission is persisted (used by scripts/tests)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, queued=len(self._queue), path=self.path, dead_letter_path=self.dead_letter_path)
+
+submission_journal = SubmissionJournal()
@@ -0,0 +1,153 @@
+
+import os
+import time
+import uuid
+import hashlib
+import threading
+import logging
+from functools import wraps
+from flask import request, make_response
+from utils.response_cache import response_cache, CachedBody
+
+logger = logging.getLogger(__name__)
+
+# Version counters for conditional GETs on the polled endpoints.
+#
+# Every write that changes what a polled endpoint returns bumps the counter of
+# its scope:
+#   ('contests',)             contest rows, rounds, admin_state, proctoring config, shortlists
+#   ('board', contest, level) one level leaderboard (bumped by the leaderboard engine)
+#   ('standings', contest)    any level of the contest or its violation counts, i.e. the
+#                             cumulative `leaderboard` table
+#   ('user', user_id)         one participant's stats, submissions and violations
+# An endpoint's ETag is derived from the counters of the scopes it reads plus its
+# request arguments, so a client holding the current ETag gets 304 Not Modified
+# before any query runs.
+#
+# Counters are per process: BOOT_ID keeps ETags of different workers (or of a
+# restarted one) from ever matching, and ETAG_MAX_AGE rotates every ETag after
+# that many seconds, so a write made by another worker, or one that does not
+# bump a counter, is picked up within that window.
+ETAG_MAX_AGE = int(os.getenv('ETAG_MAX_AGE', 30))
+BOOT_ID = uuid.uuid4().hex[:8]
+
+class VersionCounters:
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.stats = {'bumps': 0, 'not_modified': 0, 'full': 0}
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """fn(*scope) runs after every bump (outside the lock), e.g. to push the change."""
+        self._listeners.append(fn)
+
+    def bump(self, *scope):
+        with self._lock:
+            version = self._versions.get(scope, (0, 0))[0] + 1
+            self._versions[scope] = (version, time.time())
+            self.stats['bumps'] += 1
+        for fn in self._listeners:
+            try:
+                fn(*scope)
+            except Exception as e:
+                logger.error(f"Version listener failed for {scope}: {e}")
+
+    def get(self, *scope):
+        """(version, last_modified_epoch) of one scope."""
+        with self._lock:
+            return self._versions.get(scope, (0, self._started))
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, scopes=len(self._versions), boot_id=BOOT_ID, max_age=ETAG_MAX_AGE)
+
+versions = VersionCounters()
+
+def bump_contests():
+    versions.bump('contests')
+
+def bump_board(contest_id, level):
+    versions.bump('board', int(contest_id), int(level))
+    # Every level change is written to the contest's `leaderboard` row in the same transaction
+    bump_standings(contest_id)
+
+def bump_standings(contest_id):
+    versions.bump('standings', int(contest_id))
+
+def bump_user(user_id):
+    if user_id:
+        versions.bump('user', int(user_id))
+
+def current_etag(scopes, vary=''):
+    """(etag, last_modified_epoch) for a response built from `scopes`."""
+    parts, last_modified = [BOOT_ID, str(int(time.time() // max(ETAG_MAX_AGE, 1))), vary], 0
+    for scope in scopes:
+        version, modified = versions.get(*scope)
+        parts.append(f"{':'.join(map(str, scope))}={version}")
+        last_modified = max(last_modified, modified)
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20], last_modified
+
+def _build_shared(view, args, kwargs):
+    resp = make_response(view(*args, **kwargs))
+    if resp.status_code != 200 or resp.direct_passthrough:
+        return resp
+    return CachedBody(resp.get_data(), resp.mimetype)
+
+def _serve_shared(entry):
+    # One encoded body for every request; gzipped copy when the client takes it
+    if entry.gzipped is not None and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        resp = make_response(entry.gzipped)
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = make_response(entry.body)
+    resp.mimetype = entry.mimetype
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+def conditional(scopes_fn, shared=False):
+    """
+    Conditional GET for a polled view. scopes_fn(*view_args) returns the version
+    scopes the response depends on (None to skip). When the request's
+    If-None-Match holds the current ETag the view is not called at all and an
+    empty 304 goes back; otherwise the view runs and its 200 response carries
+    ETag / Last-Modified. POST polls (participant-state) work the same way; the
+    body is part of the ETag.
+
+    shared=True (public endpoints only): the encoded 200 body is kept in
+    utils/response_cache.py under the ETag, so the view runs once per data
+    version and not once per request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            scopes = scopes_fn(*args, **kwargs)
+            if scopes is None:
+                return view(*args, **kwargs)
+
+            vary = request.full_path
+            if request.method == 'POST':
+                vary += request.get_data(as_text=True)
+            etag, last_modified = current_etag(scopes, vary)
+
+            if request.if_none_match.contains(etag):
+                versions.stats['not_modified'] += 1
+                resp = make_response('', 304)
+            elif shared:
+                entry = response_cache.get_or_build(etag, lambda: _build_shared(view, args, kwargs))
+                if not isinstance(entry, CachedBody):
+                    return entry
+                resp = _serve_shared(entry)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                versions.stats['full'] += 1
+            resp.set_etag(etag)
+            resp.last_modified = int(last_modified)
+            # Cache, but revalidate on every poll
+            resp.headers['Cache-Control'] = 'public, no-cache' if shared else 'private, no-cache'
+            return resp
+        return wrapper
+    return decorator
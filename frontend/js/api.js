@@ -6,6 +6,9 @@
 const API = {
     BASE_URL: '/api',
 
+    // Last ETag + body per polled request: the server answers 304 when nothing changed
+    _etagCache: {},
+
     async request(endpoint, method = 'GET', data = null) {
         const headers = { 'Content-Type': 'application/json' };
 
@@ -35,8 +38,16 @@ const API = {
             const config = { method, headers };
             if (data) config.body = JSON.stringify(data);
 
+            const cacheKey = `${method} ${endpoint} ${config.body || ''}`;
+            const cached = this._etagCache[cacheKey];
+            if (cached) headers['If-None-Match'] = cached.etag;
+
             const response = await fetch(`${this.BASE_URL}${endpoint}`, config);
 
+            if (response.status === 304 && cached) {
+                return cached.result;
+            }
+
             // Handle Unauthorized (401) or Forbidden (403)
             if (response.status === 401 || response.status === 403) {
                 console.warn('Unauthorized/Forbidden request, logging out...');
@@ -51,6 +62,10 @@ const API = {
             }
 
             const result = await response.json();
+            const etag = response.headers.get('ETag');
+            if (etag && response.ok) {
+                this._etagCache[cacheKey] = { etag, result };
+            }
             return result;
         } catch (error) {
             console.error("API Error:", error);
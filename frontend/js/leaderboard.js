@@ -9,13 +9,66 @@ const Leaderboard = {
     selectedLevel: 1,
     totalQuestions: 0,
 
+    // Live push (leaderboard:<contest>:<level> room); polling is only the fallback
+    socket: null,
+    live: false,
+    seq: 0,
+    lastLoad: 0,
+    FALLBACK_POLL_MS: 30000,
+
     async init() {
         this.setupSearch();
         this.setupLevelSelect();
         await this.loadData();
+        this.setupSocket();
+
+        // Auto-refresh: every 5s without a socket, every 30s as a safety net with one
+        setInterval(() => {
+            if (!this.live || Date.now() - this.lastLoad >= this.FALLBACK_POLL_MS) this.loadData();
+        }, 5000);
+    },
+
+    setupSocket() {
+        if (typeof io === 'undefined') return;
+        this.socket = io();
+        this.socket.on('connect', () => this.joinRoom());
+        this.socket.on('disconnect', () => { this.live = false; });
+        this.socket.on('leaderboard:snapshot', (snap) => {
+            if (snap.level !== this.selectedLevel) return;
+            this.data = snap.rows || [];
+            this.totalQuestions = snap.total_questions || this.totalQuestions;
+            this.seq = snap.seq;
+            this.live = true;
+            this.refreshView();
+        });
+        this.socket.on('leaderboard:delta', (delta) => {
+            if (!this.live || delta.level !== this.selectedLevel) return;
+            if (delta.seq !== this.seq + 1) {
+                // Missed a delta: start over from a fresh snapshot
+                this.joinRoom();
+                return;
+            }
+            this.seq = delta.seq;
+            // Delta rows carry no rank: it comes from the position in delta.order
+            const byId = new Map(this.data.map(p => [p.id, p]));
+            (delta.removed || []).forEach(id => byId.delete(id));
+            (delta.rows || []).forEach(p => byId.set(p.id, p));
+            // order is null when nobody moved: keep the current one
+            const order = delta.order || this.data.map(p => p.id);
+            this.data = order.filter(id => byId.has(id)).map((id, i) => ({ ...byId.get(id), rank: i + 1 }));
+            this.refreshView();
+        });
+    },
 
-        // Auto-refresh
-        setInterval(() => this.loadData(), 5000);
+    joinRoom() {
+        if (!this.socket || !this.socket.connected) return;
+        this.live = false;
+        this.socket.emit('leaderboard:join', { level: this.selectedLevel });
+    },
+
+    refreshView() {
+        this.render(document.getElementById('search-input').value);
+        document.getElementById('last-updated').textContent = new Date().toLocaleTimeString();
     },
 
     setupLevelSelect() {
@@ -41,19 +94,17 @@ const Leaderboard = {
             this.selectedLevel = parseInt(e.target.value);
             localStorage.setItem('lb_level', this.selectedLevel);
             this.loadData();
+            this.joinRoom();
         });
     },
 
     async loadData() {
         try {
             const data = await API.request(`/leaderboard/?level=${this.selectedLevel}`);
+            this.lastLoad = Date.now();
             this.data = data.leaderboard || [];
             this.totalQuestions = data.total_questions || 0;
-            this.render(document.getElementById('search-input').value);
-
-            // Update timestamp
-            const now = new Date();
-            document.getElementById('last-updated').textContent = now.toLocaleTimeString();
+            this.refreshView();
         } catch (e) {
             console.error(e);
         }